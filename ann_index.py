@@ -0,0 +1,227 @@
+# /mon_agent_reco_emploi/ann_index.py
+import json
+import os
+import logging
+import numpy as np
+from config import (
+    ANN_IVF_NLIST, ANN_IVF_NPROBE,
+    ANN_HNSW_M, ANN_HNSW_EF_CONSTRUCTION, ANN_HNSW_EF_SEARCH,
+)
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+try:
+    import hnswlib
+except ImportError:
+    hnswlib = None
+
+# Nombre maximum de vecteurs utilisés pour entraîner le k-means de l'index IVF
+IVF_TRAINING_SAMPLE = 100000
+# Plafond de ef_search quand le rappel mesuré de l'index HNSW est insuffisant
+HNSW_MAX_EF_SEARCH = 1024
+
+
+class IVFIndex:
+    """
+    Index IVF (inverted file) en pur NumPy.
+    Les vecteurs (normalisés) sont répartis entre `nlist` centroïdes obtenus par k-means sphérique ;
+    une requête n'explore que les `nprobe` listes dont les centroïdes sont les plus proches.
+    """
+    backend_name = "ivf"
+
+    def __init__(self, nlist: int = ANN_IVF_NLIST, nprobe: int = ANN_IVF_NPROBE, n_iter: int = 10, seed: int = 0):
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.n_iter = n_iter
+        self.seed = seed
+        self.centroids = None
+        self._lists = []  # Identifiants de lignes par liste inversée
+        self._list_arrays = []  # Version numpy des listes (recalculée après ajout)
+        self.count = 0
+
+    @property
+    def is_trained(self) -> bool:
+        return self.centroids is not None
+
+    def train(self, matrix: np.ndarray):
+        """Calcule les centroïdes par k-means sphérique puis indexe toutes les lignes de `matrix`."""
+        n_rows = matrix.shape[0]
+        nlist = self.nlist or max(1, int(4 * np.sqrt(n_rows)))
+        nlist = min(nlist, n_rows)
+        rng = np.random.default_rng(self.seed)
+
+        sample = matrix
+        if n_rows > IVF_TRAINING_SAMPLE:
+            sample = matrix[rng.choice(n_rows, IVF_TRAINING_SAMPLE, replace=False)]
+
+        centroids = sample[rng.choice(sample.shape[0], nlist, replace=False)].copy()
+        for _ in range(self.n_iter):
+            assignments = np.argmax(sample @ centroids.T, axis=1)
+            for c in range(nlist):
+                members = sample[assignments == c]
+                if len(members) == 0:
+                    # Liste vide : réinitialiser sur un point aléatoire
+                    centroids[c] = sample[rng.integers(sample.shape[0])]
+                    continue
+                centroid = members.sum(axis=0)
+                norm = np.linalg.norm(centroid)
+                if norm > 0:
+                    centroids[c] = centroid / norm
+
+        self.centroids = centroids.astype(np.float32)
+        self._lists = [[] for _ in range(nlist)]
+        self._list_arrays = [None] * nlist
+        self.count = 0
+        self.add(np.arange(n_rows), matrix)
+        logging.info(f"Index IVF entraîné : {n_rows} vecteurs, {nlist} listes.")
+
+    def add(self, row_ids, vectors: np.ndarray):
+        """Ajoute des lignes (déjà normalisées) dans la liste de leur centroïde le plus proche."""
+        vectors = np.atleast_2d(vectors)
+        assignments = np.argmax(vectors @ self.centroids.T, axis=1)
+        for row_id, list_id in zip(np.atleast_1d(row_ids), assignments):
+            self._lists[list_id].append(int(row_id))
+            self._list_arrays[list_id] = None
+        self.count += len(assignments)
+
+    def widen_search(self) -> bool:
+        """Double le nombre de listes explorées (meilleur rappel, recherche plus lente). False si déjà maximal."""
+        if self.nprobe >= len(self._lists):
+            return False
+        self.nprobe = min(self.nprobe * 2, len(self._lists))
+        return True
+
+    def _list_array(self, list_id: int) -> np.ndarray:
+        if self._list_arrays[list_id] is None:
+            self._list_arrays[list_id] = np.asarray(self._lists[list_id], dtype=np.int64)
+        return self._list_arrays[list_id]
+
+    def search(self, matrix: np.ndarray, query: np.ndarray, top_n: int):
+        """Retourne (identifiants de lignes candidates, scores cosinus) pour les listes explorées."""
+        nprobe = min(self.nprobe, len(self._lists))
+        centroid_scores = self.centroids @ query
+        probed = np.argpartition(centroid_scores, -nprobe)[-nprobe:]
+        candidates = np.concatenate([self._list_array(list_id) for list_id in probed])
+        if candidates.size == 0:
+            return candidates, np.empty(0, dtype=np.float32)
+        return candidates, matrix[candidates] @ query
+
+    def save(self, base_path: str, urls: list):
+        path = base_path + ".ivf.npz"
+        assignments = np.full(self.count, -1, dtype=np.int32)
+        for list_id, rows in enumerate(self._lists):
+            assignments[rows] = list_id
+        tmp_path = path + ".tmp.npz"
+        np.savez(tmp_path, centroids=self.centroids, assignments=assignments, urls=np.asarray([url or '' for url in urls], dtype=str))
+        os.replace(tmp_path, path)
+        logging.info(f"Index IVF sauvegardé : {path}")
+
+    def load(self, base_path: str, dim: int = None):
+        """
+        Charge un index sauvegardé. Retourne la liste des URLs indexées, ou None si absent ou construit
+        pour une autre dimension d'embedding (changement de modèle) : il est alors reconstruit.
+        """
+        path = base_path + ".ivf.npz"
+        if not os.path.exists(path):
+            return None
+        data = np.load(path)
+        if dim is not None and data["centroids"].shape[1] != dim:
+            logging.warning(f"Index IVF sauvegardé de dimension {data['centroids'].shape[1]} au lieu de {dim} : il sera reconstruit.")
+            return None
+        self.centroids = data["centroids"].astype(np.float32)
+        nlist = self.centroids.shape[0]
+        self._lists = [[] for _ in range(nlist)]
+        self._list_arrays = [None] * nlist
+        for row_id, list_id in enumerate(data["assignments"]):
+            self._lists[list_id].append(row_id)
+        self.count = len(data["assignments"])
+        return data["urls"].tolist()
+
+
+class HNSWIndex:
+    """Index HNSW basé sur hnswlib (dépendance optionnelle), en produit scalaire sur vecteurs normalisés."""
+    backend_name = "hnsw"
+
+    def __init__(self, m: int = ANN_HNSW_M, ef_construction: int = ANN_HNSW_EF_CONSTRUCTION, ef_search: int = ANN_HNSW_EF_SEARCH):
+        if hnswlib is None:
+            raise ImportError("hnswlib n'est pas installé. Installez-le avec : pip install hnswlib")
+        self.m = m
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+        self._index = None
+        self.count = 0
+
+    @property
+    def is_trained(self) -> bool:
+        return self._index is not None
+
+    def _create(self, dim: int, capacity: int):
+        self._index = hnswlib.Index(space='ip', dim=dim)
+        self._index.init_index(max_elements=capacity, ef_construction=self.ef_construction, M=self.m)
+
+    def train(self, matrix: np.ndarray):
+        self._create(matrix.shape[1], max(1024, matrix.shape[0] * 2))
+        self.count = 0
+        self.add(np.arange(matrix.shape[0]), matrix)
+        logging.info(f"Index HNSW construit : {matrix.shape[0]} vecteurs.")
+
+    def add(self, row_ids, vectors: np.ndarray):
+        vectors = np.atleast_2d(vectors)
+        required = self.count + vectors.shape[0]
+        if required > self._index.get_max_elements():
+            self._index.resize_index(required * 2)
+        self._index.add_items(vectors, np.atleast_1d(row_ids))
+        self.count = required
+
+    def widen_search(self) -> bool:
+        """Double ef_search (meilleur rappel, recherche plus lente). False si déjà maximal."""
+        if self.ef_search >= HNSW_MAX_EF_SEARCH:
+            return False
+        self.ef_search = min(self.ef_search * 2, HNSW_MAX_EF_SEARCH)
+        return True
+
+    def search(self, matrix: np.ndarray, query: np.ndarray, top_n: int):
+        k = min(top_n, self.count)
+        if k == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        self._index.set_ef(max(self.ef_search, k))
+        labels, distances = self._index.knn_query(query, k=k)
+        # En espace 'ip', hnswlib retourne 1 - produit scalaire
+        return labels[0].astype(np.int64), 1.0 - distances[0]
+
+    def save(self, base_path: str, urls: list):
+        path = base_path + ".hnsw.bin"
+        self._index.save_index(path)
+        with open(path + ".urls.json", 'w', encoding='utf-8') as f:
+            json.dump({"dim": self._index.dim, "urls": urls}, f)
+        logging.info(f"Index HNSW sauvegardé : {path}")
+
+    def load(self, base_path: str, dim: int = None):
+        """Charge un index sauvegardé (None si absent ou d'une autre dimension d'embedding, comme IVFIndex.load)."""
+        path = base_path + ".hnsw.bin"
+        if not os.path.exists(path) or not os.path.exists(path + ".urls.json"):
+            return None
+        with open(path + ".urls.json", 'r', encoding='utf-8') as f:
+            metadata = json.load(f)
+        if dim is not None and metadata["dim"] != dim:
+            logging.warning(f"Index HNSW sauvegardé de dimension {metadata['dim']} au lieu de {dim} : il sera reconstruit.")
+            return None
+        urls = metadata["urls"]
+        self._index = hnswlib.Index(space='ip', dim=metadata["dim"])
+        self._index.load_index(path, max_elements=max(1024, len(urls) * 2))
+        self.count = len(urls)
+        return urls
+
+
+def create_ann_index(backend: str):
+    """Crée l'index ANN demandé ; retourne None pour la recherche exacte ("brute")."""
+    if backend == "ivf":
+        return IVFIndex()
+    if backend == "hnsw":
+        if hnswlib is None:
+            logging.warning("hnswlib non installé : repli sur l'index IVF NumPy.")
+            return IVFIndex()
+        return HNSWIndex()
+    if backend != "brute":
+        logging.warning(f"Backend ANN inconnu '{backend}' : recherche exacte utilisée.")
+    return None
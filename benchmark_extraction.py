@@ -0,0 +1,107 @@
+# /mon_agent_reco_emploi/benchmark_extraction.py
+"""
+Compare la détection du bloc de texte principal sur des pages sauvegardées :
+  - l'ancienne version de find_longest_text_block (BeautifulSoup, get_text sur chaque div, quadratique),
+  - ParsedPage.longest_text_block (lxml, même critère, longueurs calculées en une passe),
+  - ParsedPage.main_content_block (lxml, une passe, densité de liens : utilisé par l'extraction).
+Seule la détection est chronométrée, sur des arbres analysés avant la mesure.
+
+Usage :
+    python benchmark_extraction.py [dossier_de_pages_html] [--repeat N]
+Sans dossier, des pages synthétiques profondément imbriquées sont générées.
+"""
+import argparse
+import glob
+import os
+import time
+from bs4 import BeautifulSoup
+from html_extractor import ParsedPage, LAYOUT_TAGS
+
+
+def legacy_find_longest_text_block(soup, min_length=100, excluded_tags=None):
+    """Version d'origine (référence du benchmark) : un get_text complet par élément candidat."""
+    if excluded_tags is None:
+        excluded_tags = ['script', 'style', 'header', 'footer', 'nav']
+    for tag in excluded_tags:
+        for element in soup.find_all(tag):
+            element.decompose()
+    text_elements = []
+    for tag in ['div', 'article', 'section', 'main']:
+        for element in soup.find_all(tag):
+            text = element.get_text(strip=True)
+            if len(text) >= min_length:
+                text_elements.append((element, len(text)))
+    text_elements.sort(key=lambda x: x[1], reverse=True)
+    if text_elements:
+        return text_elements[0][0].get_text(separator='\n', strip=True)
+    return None
+
+
+def generate_synthetic_page(depth: int, paragraphs: int) -> bytes:
+    """Page de test : `depth` div imbriqués, une barre de liens et `paragraphs` paragraphes de description."""
+    links = "".join(f'<li><a href="/offre/{i}">Offre similaire numéro {i}</a></li>' for i in range(40))
+    body = "".join(
+        f"<p>Paragraphe {i} : nous recherchons un profil Python/Django motivé pour des missions variées.</p>"
+        for i in range(paragraphs)
+    )
+    content = f'<div class="job-content">{body}</div><aside><ul>{links}</ul></aside>'
+    for level in range(depth):
+        content = f'<div class="level-{level}">{content}</div>'
+    return f"<html><head><title>Offre</title></head><body><nav>Menu</nav>{content}</body></html>".encode('utf-8')
+
+
+def load_pages(pages_dir: str) -> list:
+    if pages_dir:
+        paths = sorted(glob.glob(os.path.join(pages_dir, '*.htm*')))
+        pages = []
+        for path in paths:
+            with open(path, 'rb') as f:
+                pages.append((os.path.basename(path), f.read()))
+        return pages
+    return [
+        (f"synthetique_profondeur_{depth}", generate_synthetic_page(depth, 60))
+        for depth in (5, 20, 50, 100)
+    ]
+
+
+def time_detection(parse, detect, repeat: int) -> float:
+    """
+    Durée moyenne (ms) de `detect(arbre)`, l'arbre étant analysé par `parse()` avant la mesure.
+    Un arbre neuf par répétition : l'ancienne version modifie l'arbre et ParsedPage garde ses longueurs en cache.
+    """
+    trees = [parse() for _ in range(repeat)]
+    start = time.perf_counter()
+    for tree in trees:
+        detect(tree)
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def lxml_longest_block_text(page: ParsedPage):
+    """Texte du plus grand bloc, mis en forme comme l'ancienne version (get_text(separator='\\n', strip=True))."""
+    element = page.longest_text_block(excluded_tags=LAYOUT_TAGS)
+    return page.element_text(element, '\n', LAYOUT_TAGS) if element is not None else None
+
+
+def run_benchmark(pages_dir: str = None, repeat: int = 5):
+    pages = load_pages(pages_dir)
+    if not pages:
+        print(f"Aucune page HTML trouvée dans {pages_dir}.")
+        return
+
+    print(f"{'page':40} {'ancienne (ms)':>14} {'lxml 1 passe (ms)':>18} {'lxml densité (ms)':>18} {'même bloc':>10}")
+    for name, html in pages:
+        legacy_ms = time_detection(lambda: BeautifulSoup(html, 'html.parser'), legacy_find_longest_text_block, repeat)
+        linear_ms = time_detection(lambda: ParsedPage(html), lxml_longest_block_text, repeat)
+        density_ms = time_detection(lambda: ParsedPage(html), ParsedPage.main_content_block, repeat)
+
+        same_block = legacy_find_longest_text_block(BeautifulSoup(html, 'html.parser')) == \
+            lxml_longest_block_text(ParsedPage(html))
+        print(f"{name[:40]:40} {legacy_ms:14.2f} {linear_ms:18.2f} {density_ms:18.2f} {str(same_block):>10}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark de la détection du bloc de texte principal.")
+    parser.add_argument('pages_dir', nargs='?', default=None, help="Dossier contenant des pages .html sauvegardées")
+    parser.add_argument('--repeat', type=int, default=5, help="Nombre de répétitions par mesure")
+    args = parser.parse_args()
+    run_benchmark(args.pages_dir, args.repeat)
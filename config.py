@@ -7,17 +7,126 @@ GROQ_API_KEY = "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"  # IMP
 # Modèle Groq à utiliser
 GROQ_MODEL_NAME = "llama3-8b-8192" # ou "mixtral-8x7b-32768", "llama3-70b-8192" etc.
 
+# Cache des présentations Groq : une même requête (même prompt, même modèle) est servie sans appel à l'API
+GROQ_CACHE_ENABLED = True
+GROQ_CACHE_PATH = "data/groq_cache.sqlite3"
+GROQ_CACHE_TTL_SECONDS = 24 * 3600  # Durée de validité d'une présentation en cache
+GROQ_CACHE_MAX_ITEMS = 1000  # Entrées conservées (les moins récemment utilisées sont évincées)
+# Client Groq local (réponses déterministes, sans réseau) pour tester hors ligne
+GROQ_USE_STUB = False
+# Recommandations calculées par /api/recommend, conservées en mémoire pour le flux de présentation
+RECOMMENDATION_STREAM_TTL_SECONDS = 10 * 60  # Délai laissé au frontend pour ouvrir le flux
+RECOMMENDATION_STREAM_MAX_ITEMS = 256  # Résultats conservés (les plus anciens sont évincés)
+
 # Chemin vers la base de données des offres d'emploi
 DATABASE_PATH = "data/offres_db.jsonl"
 
+# Connexions SQLite de la base des offres (journal WAL, une connexion réutilisée par thread)
+DB_BUSY_TIMEOUT_SECONDS = 30  # Attente maximale d'un verrou d'écriture avant "database is locked"
+DB_MMAP_SIZE_BYTES = 256 * 1024 * 1024  # Lecture de la base par mmap (évite les copies en lecture)
+DB_CACHE_SIZE_KIB = 64 * 1024  # Cache de pages par connexion
+
 # Modèle Sentence Transformer à utiliser
 # Pour le français et d'autres langues : 'paraphrase-multilingual-MiniLM-L12-v2'
 # Pour l'anglais seulement, 'all-MiniLM-L6-v2' est plus léger et rapide.
 SENTENCE_TRANSFORMER_MODEL = 'paraphrase-multilingual-MiniLM-L12-v2'
 
+# Cache persistant des embeddings (indexé par texte nettoyé et versionné par modèle)
+EMBEDDING_CACHE_ENABLED = True
+EMBEDDING_CACHE_PATH = "data/embedding_cache.sqlite3"
+# Nombre d'embeddings conservés dans le LRU en mémoire
+EMBEDDING_CACHE_MEMORY_ITEMS = 10000
+
+# Nombre de titres encodés par passe du modèle Sentence Transformer lors de l'ingestion en masse
+EMBEDDING_BATCH_SIZE = 64
+
+# Type des embeddings stockés en binaire (BLOB) dans SQLite : "float32" ou "float16"
+# float16 divise la taille par deux avec une perte de précision négligeable pour la similarité cosinus.
+EMBEDDING_STORAGE_DTYPE = "float32"
+# Matrice d'embeddings des offres partagée entre processus via un fichier memmap à côté de la base
+# (data/job_offers.embeddings.*) : les workers du serveur lisent la même copie au lieu d'une chacun
+EMBEDDING_MEMMAP_ENABLED = True
+# Intervalle minimal (secondes) entre deux vérifications du manifeste de la matrice partagée par un lecteur :
+# nouvelles lignes ajoutées par un autre processus, ou nouvelle génération après un compactage
+EMBEDDING_STORE_REFRESH_SECONDS = 2.0
+
+# Index de plus proches voisins approché (ANN) utilisé par le moteur de recommandation
+# "brute" : similarité exacte sur toutes les offres (suffisant pour quelques milliers d'offres)
+# "ivf"   : index IVF en pur NumPy (k-means + listes inversées)
+# "hnsw"  : index HNSW via le paquet optionnel hnswlib (pip install hnswlib)
+ANN_BACKEND = "ivf"
+# En dessous de ce nombre d'offres, la recherche exacte est utilisée quel que soit le backend
+ANN_MIN_OFFERS = 5000
+# Nombre de listes IVF (None : environ 4 * racine carrée du nombre d'offres)
+ANN_IVF_NLIST = None
+# Compromis rappel/latence : nombre de listes IVF explorées par requête (plus grand = plus précis, plus lent)
+ANN_IVF_NPROBE = 8
+# Paramètres HNSW (ef_search joue le même rôle que nprobe pour IVF)
+ANN_HNSW_M = 16
+ANN_HNSW_EF_CONSTRUCTION = 200
+ANN_HNSW_EF_SEARCH = 64
+# Sauvegarde de l'index sur disque toutes les N insertions incrémentales
+ANN_SAVE_EVERY = 100
+# Contrôle du rappel à la construction de l'index approché : recall@ANN_RECALL_K mesuré contre la recherche
+# exacte sur ANN_RECALL_SAMPLE requêtes. En dessous de ANN_MIN_RECALL, l'exploration est élargie (nprobe,
+# ef_search) ; si le rappel reste insuffisant, la recherche exacte est conservée.
+ANN_MIN_RECALL = 0.95
+ANN_RECALL_K = 10
+ANN_RECALL_SAMPLE = 200
+
 # Nombre maximum de résultats de recherche DuckDuckGo
 DDG_MAX_RESULTS = 5
 
+# Scraping concurrent : nombre maximum de pages téléchargées en parallèle (domaines différents)
+SCRAPE_MAX_WORKERS = 4
+# Offres scrapées insérées en base par lots (un encodage et un commit par lot)
+SCRAPE_DB_BATCH_SIZE = 20
+# Détection des doublons avant l'encodage : URL canonique (sans paramètres de suivi) et SimHash de la description.
+# Distance de Hamming maximale entre deux SimHash 64 bits d'offres considérées comme identiques (<= 5 :
+# garantie de la recherche par 6 bandes), et nombre minimal de mots d'une description pour la comparer.
+DEDUP_SIMHASH_MAX_DISTANCE = 5
+DEDUP_MIN_TOKENS = 30
+# Extraction (analyse HTML) dans un pool de processus, découplée des téléchargements :
+# None : un processus par cœur ; 0 : extraction dans le thread du pipeline (sans processus)
+SCRAPE_EXTRACT_WORKERS = None
+# Démarrage des processus d'extraction : "forkserver" (ou "spawn") et non "fork", qui copierait les verrous
+# tenus par les autres threads du serveur (logging, SQLite, pools HTTP) et pourrait bloquer les processus fils
+SCRAPE_EXTRACT_START_METHOD = "forkserver"
+# Capacité des files entre étapes du pipeline (téléchargement -> extraction -> écriture) : contre-pression
+SCRAPE_PIPELINE_QUEUE_SIZE = 32
+
+# Sessions HTTP partagées : pools de connexions keep-alive et tentatives avec backoff exponentiel
+HTTP_POOL_CONNECTIONS = 20  # Nombre d'hôtes dont le pool est conservé
+HTTP_POOL_MAXSIZE = 10  # Connexions conservées par hôte
+HTTP_MAX_RETRIES = 3
+HTTP_BACKOFF_FACTOR = 0.5
+# Validateurs ETag / Last-Modified par URL (GET conditionnels lors des re-crawls)
+HTTP_VALIDATORS_PATH = "data/http_validators.sqlite3"
+
+# Tâches de scraping en arrière-plan (POST /api/scrape) : file persistée en SQLite et threads dédiés
+SCRAPE_JOBS_DB_PATH = "data/scrape_jobs.sqlite3"
+SCRAPE_JOB_WORKERS = 1  # Tâches de scraping exécutées simultanément (chacune parallélise déjà ses domaines)
+
+# Règles d'extraction par domaine apprises (domain_rules_manager), fusionnées avec scraper_utils.DOMAIN_RULES.
+# Le fichier est surveillé : une modification est prise en compte au plus tard après ce délai (secondes).
+DOMAIN_RULES_FILE = "domain_rules.json"
+DOMAIN_RULES_RELOAD_SECONDS = 1.0
+
+# HTML brut des pages scrapées (compressé, adressé par son contenu) pour la ré-extraction sans re-crawl :
+#   python reextract.py [--domain indeed.com] [--workers 8] [--dry-run]
+RAW_PAGE_STORE_ENABLED = True
+RAW_PAGES_DB_PATH = "data/raw_pages.sqlite3"
+RAW_PAGES_DIR = "data/raw_pages"
+REEXTRACT_WORKERS = None  # Processus de ré-extraction (None : nombre de cœurs)
+
+# Politesse par domaine (seau à jetons) : requêtes par seconde et rafale autorisée pour un même domaine
+CRAWL_RATE_PER_DOMAIN = 0.3
+CRAWL_BURST_PER_DOMAIN = 1
+# Pause appliquée à un domaine après un 429/503 sans en-tête Retry-After exploitable (secondes)
+CRAWL_DEFAULT_BACKOFF = 30
+# Pause maximale acceptée depuis un en-tête Retry-After (secondes)
+CRAWL_MAX_RETRY_AFTER = 600
+
 # Nombre de recommandations à retourner
 TOP_N_RECOMMENDATIONS = 3
 
@@ -32,6 +141,6 @@ SKILLS_KEYWORDS = [
     "gestion de projet", "analyse de données", "cybersécurité"
 ]
 
-# Langue pour spaCy (utilisé pour le POS tagging ou NER si implémenté plus tard)
+# Langue pour spaCy (utilisé pour le POS tagging ou NER si implémenté plus tard ; spaCy n'est pas chargé actuellement)
 # Ex: "fr_core_news_sm" pour le français, "en_core_web_sm" pour l'anglais
 SPACY_MODEL_LANG = "fr_core_news_sm"
\ No newline at end of file
@@ -0,0 +1,130 @@
+# /mon_agent_reco_emploi/crawl_scheduler.py
+import logging
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from config import (
+    CRAWL_RATE_PER_DOMAIN, CRAWL_BURST_PER_DOMAIN,
+    CRAWL_DEFAULT_BACKOFF, CRAWL_MAX_RETRY_AFTER,
+)
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Codes HTTP signifiant que le serveur demande de ralentir
+THROTTLE_STATUS_CODES = (429, 503)
+
+
+def parse_retry_after(value, default: float = CRAWL_DEFAULT_BACKOFF) -> float:
+    """Convertit un en-tête Retry-After (secondes ou date HTTP) en nombre de secondes d'attente."""
+    if not value:
+        return default
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_at = parsedate_to_datetime(value)
+        return max(0.0, retry_at.timestamp() - time.time())
+    except (TypeError, ValueError):
+        return default
+
+
+class TokenBucket:
+    """Seau à jetons : `rate` requêtes par seconde en moyenne, avec des rafales jusqu'à `capacity`."""
+
+    def __init__(self, rate: float, capacity: float, now: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = now
+        self.blocked_until = 0.0  # Fixé par un Retry-After / 429
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def next_eligible_time(self, now: float) -> float:
+        self._refill(now)
+        if self.tokens >= 1:
+            eligible_at = now
+        else:
+            eligible_at = now + (1 - self.tokens) / self.rate
+        return max(eligible_at, self.blocked_until)
+
+    def try_consume(self, now: float) -> bool:
+        if self.next_eligible_time(now) > now:
+            return False
+        self.tokens -= 1
+        return True
+
+
+class DomainScheduler:
+    """
+    Ordonnanceur de politesse partagé : un seau à jetons par domaine.
+    Au lieu de dormir, le crawler peut demander quand un domaine redevient éligible
+    (next_eligible_time) et traiter d'autres domaines en attendant (try_acquire).
+    """
+
+    def __init__(self, rate: float = CRAWL_RATE_PER_DOMAIN, burst: float = CRAWL_BURST_PER_DOMAIN,
+                 max_retry_after: float = CRAWL_MAX_RETRY_AFTER):
+        self.rate = rate
+        self.burst = burst
+        self.max_retry_after = max_retry_after
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def _bucket(self, domain: str, now: float) -> TokenBucket:
+        bucket = self._buckets.get(domain)
+        if bucket is None:
+            bucket = TokenBucket(self.rate, self.burst, now)
+            self._buckets[domain] = bucket
+        return bucket
+
+    def next_eligible_time(self, domain: str) -> float:
+        """Instant (horloge time.monotonic) à partir duquel une requête vers `domain` est autorisée."""
+        now = time.monotonic()
+        with self._lock:
+            return self._bucket(domain, now).next_eligible_time(now)
+
+    def try_acquire(self, domain: str) -> bool:
+        """Consomme un jeton si le domaine est éligible maintenant ; ne bloque jamais."""
+        now = time.monotonic()
+        with self._lock:
+            return self._bucket(domain, now).try_consume(now)
+
+    def acquire(self, domain: str, timeout: float = None) -> bool:
+        """Attend que le domaine soit éligible puis consomme un jeton. Retourne False si `timeout` expire."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            if self.try_acquire(domain):
+                return True
+            wait = self.next_eligible_time(domain) - time.monotonic()
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                wait = min(wait, remaining)
+            time.sleep(max(wait, 0.01))
+
+    def penalize(self, domain: str, retry_after_seconds: float):
+        """Bloque le domaine pendant `retry_after_seconds` (plafonné par max_retry_after)."""
+        delay = min(max(retry_after_seconds, 0.0), self.max_retry_after)
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._bucket(domain, now)
+            bucket.blocked_until = max(bucket.blocked_until, now + delay)
+            bucket.tokens = 0
+        logging.warning(f"Domaine {domain} ralenti par le serveur : pause de {delay:.0f}s.")
+
+    def record_response(self, domain: str, status_code: int, headers=None):
+        """Tient compte d'une réponse HTTP : 429/503 (avec Retry-After éventuel) suspendent le domaine."""
+        if status_code in THROTTLE_STATUS_CODES:
+            retry_after = (headers or {}).get('Retry-After')
+            self.penalize(domain, parse_retry_after(retry_after))
+
+
+# Ordonnanceur partagé par tout le processus (scraper, crawler, outils de règles)
+_shared_scheduler = DomainScheduler()
+
+
+def get_scheduler() -> DomainScheduler:
+    return _shared_scheduler
@@ -3,25 +3,71 @@ import json
 import os
 import logging
 import sqlite3 # Vous utilisez déjà sqlite3
+import sys
+import glob
+import numpy as np
+from config import (
+    EMBEDDING_STORAGE_DTYPE, EMBEDDING_BATCH_SIZE, EMBEDDING_MEMMAP_ENABLED,
+    DEDUP_SIMHASH_MAX_DISTANCE, DEDUP_MIN_TOKENS,
+)
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 # Utilisation des constantes que vous avez définies
 DATA_DIR = "data"
 DATABASE_PATH = os.path.join(DATA_DIR, "job_offers.sqlite3") # Assurez-vous que c'est le bon nom de fichier
+# Nombre maximum de paramètres par requête SQL (limite prudente pour les anciennes versions de SQLite)
+SQLITE_MAX_PARAMS = 900
+# L'index ANN est sauvegardé à côté de la base (ex: data/job_offers.ivf.npz)
+ANN_INDEX_BASE_PATH = os.path.splitext(DATABASE_PATH)[0]
 
 # Importation de text_processor pour la signature de add_job_offer_to_db si besoin,
 # mais il est déjà importé globalement dans le fichier que vous avez montré.
-from text_processor import process_job_offer_text
+from text_processor import process_job_offer_text, process_job_offers_batch, clean_text
+from embedding_index import add_offer_to_shared_index, get_shared_index, normalize_embedding, reset_shared_index
+from embedding_store import EmbeddingMatrixStore
+from db_connection import ConnectionManager
+from offer_record import OfferRecord, OFFER_COLUMNS, INDEX_COLUMNS
+from offer_fingerprint import (
+    canonicalize_url, simhash, simhash_bands, hamming_distance, to_signed64, from_signed64, SIMHASH_BANDS,
+)
+
+# Une colonne indexée par bande de la SimHash (recherche des quasi-doublons)
+SIMHASH_BAND_COLUMNS = [f"simhash_band{band}" for band in range(SIMHASH_BANDS)]
 
 def ensure_data_dir_exists():
     os.makedirs(DATA_DIR, exist_ok=True)
 
-def initialize_db():
-    """Create the SQLite database and table if they don't exist."""
-    ensure_data_dir_exists()
-    conn = sqlite3.connect(DATABASE_PATH)
-    cursor = conn.cursor()
+def encode_embedding(embedding, dtype_name: str = EMBEDDING_STORAGE_DTYPE) -> bytes:
+    """Sérialise un embedding en octets bruts (float32 ou float16) pour la colonne BLOB."""
+    return np.asarray(embedding, dtype=np.dtype(dtype_name)).tobytes()
+
+def decode_embedding(blob, dtype_name: str) -> np.ndarray:
+    """Désérialise un embedding BLOB sans copie (vue en lecture seule sur les octets)."""
+    return np.frombuffer(blob, dtype=np.dtype(dtype_name or "float32"))
+
+def _ensure_embedding_blob_columns(cursor):
+    """Ajoute les colonnes binaires aux bases créées avant leur introduction."""
+    cursor.execute("PRAGMA table_info(job_offers)")
+    existing_columns = {row[1] for row in cursor.fetchall()}
+    if 'embedding_blob' not in existing_columns:
+        cursor.execute("ALTER TABLE job_offers ADD COLUMN embedding_blob BLOB")
+    if 'embedding_dtype' not in existing_columns:
+        cursor.execute("ALTER TABLE job_offers ADD COLUMN embedding_dtype TEXT")
+
+def _ensure_fingerprint_columns(cursor):
+    """Colonnes de détection des doublons (URL canonique, SimHash et ses bandes LSH) et leurs index."""
+    cursor.execute("PRAGMA table_info(job_offers)")
+    existing_columns = {row[1] for row in cursor.fetchall()}
+    for column in ['canonical_url', 'simhash'] + SIMHASH_BAND_COLUMNS:
+        if column not in existing_columns:
+            column_type = "TEXT" if column == 'canonical_url' else "INTEGER"
+            cursor.execute(f"ALTER TABLE job_offers ADD COLUMN {column} {column_type}")
+    for column in ['canonical_url'] + SIMHASH_BAND_COLUMNS:
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_job_offers_{column} ON job_offers ({column})")
+
+def _create_schema(cursor):
+    """Crée la table des offres si besoin et ajoute les colonnes introduites depuis."""
     # Le schéma que vous avez fourni
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS job_offers (
@@ -34,116 +80,607 @@ def initialize_db():
             cleaned_description TEXT,
             combined_text_for_embedding TEXT,
             skills TEXT, -- Stocké comme JSON string
-            embedding TEXT -- Stocké comme JSON string
+            embedding TEXT, -- Ancien format (JSON string), conservé pour les bases non migrées
+            embedding_blob BLOB, -- Vecteur brut (float32/float16)
+            embedding_dtype TEXT -- Type numpy du vecteur stocké dans embedding_blob
         )
     ''')
-    conn.commit()
-    conn.close()
+    _ensure_embedding_blob_columns(cursor)
+    _ensure_fingerprint_columns(cursor)
 
-def load_job_offers_from_db() -> list:
-    """Load all job offers from the SQLite database and parse JSON fields."""
-    initialize_db() # S'assure que la table existe
-    conn = sqlite3.connect(DATABASE_PATH)
-    conn.row_factory = sqlite3.Row # Permet d'accéder aux colonnes par leur nom
+# Connexions réutilisées (une par thread, en mode WAL) ; le schéma n'est initialisé qu'une fois par processus
+_connection_manager = ConnectionManager(DATABASE_PATH, schema_initializer=_create_schema)
+
+# Matrice d'embeddings partagée entre processus (data/job_offers.embeddings.*), None si désactivée
+embedding_store = EmbeddingMatrixStore(ANN_INDEX_BASE_PATH) if EMBEDDING_MEMMAP_ENABLED else None
+
+def get_connection() -> sqlite3.Connection:
+    """Connexion SQLite du thread courant vers la base des offres (à ne pas fermer)."""
+    return _connection_manager.get_connection()
+
+def initialize_db():
+    """Create the SQLite database and table if they don't exist (une seule fois par processus)."""
+    ensure_data_dir_exists()
+    _connection_manager.ensure_schema()
+
+def migrate_embeddings_to_blob(db_path: str = DATABASE_PATH, dtype_name: str = EMBEDDING_STORAGE_DTYPE, vacuum: bool = True) -> int:
+    """
+    Convertit les embeddings JSON (colonne `embedding`) d'une base existante en BLOB binaire.
+    La colonne texte est vidée après conversion, puis la base est compactée (VACUUM).
+    Retourne le nombre d'offres converties.
+    """
+    if not os.path.exists(db_path):
+        logging.error(f"Base de données introuvable : {db_path}")
+        return 0
+
+    conn = sqlite3.connect(db_path)
     cursor = conn.cursor()
+    migrated_count = 0
+    try:
+        _ensure_embedding_blob_columns(cursor)
+        cursor.execute("SELECT url, embedding FROM job_offers WHERE embedding_blob IS NULL AND embedding IS NOT NULL")
+        rows = cursor.fetchall()
+        for url, embedding_json in rows:
+            try:
+                embedding = json.loads(embedding_json)
+            except (json.JSONDecodeError, TypeError) as e:
+                logging.error(f"Embedding JSON invalide pour l'offre {url}, non migré : {e}")
+                continue
+            cursor.execute(
+                "UPDATE job_offers SET embedding_blob = ?, embedding_dtype = ?, embedding = NULL WHERE url = ?",
+                (encode_embedding(embedding, dtype_name), dtype_name, url)
+            )
+            migrated_count += 1
+        conn.commit()
+        if vacuum:
+            conn.execute("VACUUM")
+        logging.info(f"{migrated_count} embeddings migrés en BLOB ({dtype_name}) dans {db_path}")
+    except sqlite3.Error as e:
+        conn.rollback()
+        logging.error(f"Erreur SQLite lors de la migration de {db_path}: {e}")
+    finally:
+        conn.close()
+    return migrated_count
+
+def _decode_offer_embedding(url, embedding_blob, embedding_dtype, embedding_json):
+    """Désérialise l'embedding : BLOB binaire en priorité, JSON pour les bases non migrées (None si absent ou invalide)."""
+    try:
+        if embedding_blob is not None:
+            return decode_embedding(embedding_blob, embedding_dtype)
+        if embedding_json is not None: # Vérifier si la chaîne n'est pas None
+            return json.loads(embedding_json)
+        # Gérer le cas où l'embedding est explicitement NULL dans la BD
+        # ou si la colonne n'a pas été remplie pour une raison quelconque.
+        return None
+    except (json.JSONDecodeError, TypeError, ValueError) as e:
+        logging.error(f"Erreur de désérialisation de l'embedding de l'offre {url or 'URL inconnue'}: {e}")
+        return None # None en cas d'erreur pour que le filtrage le rejette proprement
+
+def _decode_offer_skills(url, skills_json) -> list:
+    try:
+        if skills_json is not None: # Vérifier si la chaîne n'est pas None
+            return json.loads(skills_json)
+        return [] # Les compétences peuvent être une liste vide par défaut
+    except (json.JSONDecodeError, TypeError) as e:
+        logging.error(f"Erreur de désérialisation JSON pour les skills de l'offre {url or 'URL inconnue'}: {e}. Valeur brute: '{skills_json}'")
+        return [] # Fallback à une liste vide
+
+def load_job_offers_from_db() -> list:
+    """
+    Load all job offers from the SQLite database and parse JSON fields.
+    L'embedding est retourné sous forme de tableau numpy (vue sans copie sur le BLOB).
+    Charge TOUTES les colonnes en mémoire : pour parcourir le catalogue, préférer iter_offers.
+    """
+    cursor = get_connection().cursor()
+    cursor.row_factory = sqlite3.Row # Permet d'accéder aux colonnes par leur nom (sans modifier la connexion partagée)
     cursor.execute("SELECT * FROM job_offers")
     rows = cursor.fetchall()
-    conn.close()
     
     offers_list = []
     for row in rows:
         offer_dict = dict(row) # Convertit sqlite3.Row en dictionnaire Python
-        
-        # Désérialiser les champs JSON (embedding et skills)
-        try:
-            if offer_dict.get('embedding') is not None: # Vérifier si la chaîne n'est pas None
-                offer_dict['embedding'] = json.loads(offer_dict['embedding'])
-            else:
-                # Gérer le cas où l'embedding est explicitement NULL dans la BD
-                # ou si la colonne n'a pas été remplie pour une raison quelconque.
-                offer_dict['embedding'] = None # ou une liste vide: [] si c'est plus logique en aval
-        except (json.JSONDecodeError, TypeError) as e:
-            logging.error(f"Erreur de désérialisation JSON pour l'embedding de l'offre {offer_dict.get('url', 'URL inconnue')}: {e}. Valeur brute: '{offer_dict.get('embedding')}'")
-            offer_dict['embedding'] = None # Mettre à None en cas d'erreur pour que le filtrage le rejette proprement
-
-        try:
-            if offer_dict.get('skills') is not None: # Vérifier si la chaîne n'est pas None
-                offer_dict['skills'] = json.loads(offer_dict['skills'])
-            else:
-                offer_dict['skills'] = [] # Les compétences peuvent être une liste vide par défaut
-        except (json.JSONDecodeError, TypeError) as e:
-            logging.error(f"Erreur de désérialisation JSON pour les skills de l'offre {offer_dict.get('url', 'URL inconnue')}: {e}. Valeur brute: '{offer_dict.get('skills')}'")
-            offer_dict['skills'] = [] # Fallback à une liste vide
-            
+        embedding_blob = offer_dict.pop('embedding_blob', None)
+        embedding_dtype = offer_dict.pop('embedding_dtype', None)
+        url = offer_dict.get('url')
+        offer_dict['embedding'] = _decode_offer_embedding(url, embedding_blob, embedding_dtype, offer_dict.get('embedding'))
+        offer_dict['skills'] = _decode_offer_skills(url, offer_dict.get('skills'))
         offers_list.append(offer_dict)
         
     return offers_list
 
-def add_job_offer_to_db(new_offer_data: dict, existing_offers: list = None) -> bool: 
-    # existing_offers n'est plus vraiment utilisé avec SQLite de cette manière,
-    # la vérification de doublon se fait via requête SQL.
-    # On pourrait enlever `existing_offers` de la signature si elle n'est pas utilisée ailleurs.
+def iter_offers(columns=INDEX_COLUMNS, batch_size: int = 1000, urls: list = None):
     """
-    Add a new job offer to the SQLite database if it doesn't already exist.
-    Returns True if added, False if duplicate or invalid.
+    Parcourt les offres de la base sans tout charger : seules les `columns` demandées sont lues
+    (SELECT projeté) et les lignes arrivent par paquets de `batch_size` (fetchmany).
+    `urls` restreint le parcours à ces offres (requêtes IN par paquets sur la clé primaire).
+    Génère des OfferRecord ; 'skills' est décodé en liste et 'embedding' en vecteur numpy.
     """
-    initialize_db() # S'assure que la table existe
-    
-    # Récupérer les infos de base pour le traitement
+    columns = tuple(columns)
+    unknown = [name for name in columns if name not in OFFER_COLUMNS]
+    if unknown:
+        raise ValueError(f"Colonnes inconnues pour iter_offers : {unknown}")
+
+    # L'url est toujours lue (messages d'erreur, déduplication) ; l'embedding occupe trois colonnes SQL
+    sql_columns = ['url'] + [name for name in columns if name not in ('url', 'embedding')]
+    if 'embedding' in columns:
+        sql_columns += ['embedding_blob', 'embedding_dtype', 'embedding']
+
+    select_sql = f"SELECT {', '.join(sql_columns)} FROM job_offers"
+    if urls is None:
+        queries = [(select_sql, ())]
+    else:
+        urls = list(urls)
+        queries = (
+            (f"{select_sql} WHERE url IN ({', '.join('?' * len(chunk))})", chunk)
+            for chunk in (urls[start:start + SQLITE_MAX_PARAMS] for start in range(0, len(urls), SQLITE_MAX_PARAMS))
+        )
+
+    cursor = get_connection().cursor()
+    for sql, params in queries:
+        cursor.execute(sql, params)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            for row in rows:
+                values = dict(zip(sql_columns, row))
+                url = values['url']
+                if 'skills' in values:
+                    values['skills'] = _decode_offer_skills(url, values['skills'])
+                if 'embedding' in columns:
+                    values['embedding'] = _decode_offer_embedding(
+                        url, values.pop('embedding_blob'), values.pop('embedding_dtype'), values['embedding']
+                    )
+                if 'url' not in columns:
+                    del values['url']
+                yield OfferRecord(**values)
+
+def _store_rows(offers):
+    """(urls, matrice) des vecteurs normalisés valides de `offers`, au format de la matrice partagée."""
+    urls, vectors = [], []
+    for offer in offers:
+        vector = normalize_embedding(offer.get('embedding'))
+        if vector is None:
+            logging.warning(f"Offre sans embedding de titre valide ignorée : {offer.get('url') or 'URL inconnue'}")
+            continue
+        urls.append(offer.get('url'))
+        vectors.append(vector)
+    return urls, vectors
+
+def _append_to_embedding_store(urls: list, vectors: list) -> int:
+    """Ajoute les vecteurs à la matrice partagée (un lot de dimension incorrecte est rejeté par le store)."""
+    if not urls:
+        return 0
+    return embedding_store.append(urls, np.vstack(vectors))
+
+def sync_embedding_store(batch_size: int = 1000) -> int:
+    """
+    Aligne la matrice memmap partagée sur la base : les lignes des offres supprimées sont retirées
+    (compactage) et les offres absentes de la matrice (bases existantes, ajouts d'un autre outil)
+    y sont ajoutées par paquets. Retourne le nombre de lignes ajoutées.
+    """
+    cursor = get_connection().cursor()
+    cursor.execute("SELECT url FROM job_offers")
+    db_urls = {row[0] for row in cursor.fetchall()}
+    _, store_urls, _ = embedding_store.open()
+    store_url_set = set(store_urls)
+    if store_url_set - db_urls:
+        embedding_store.compact(db_urls)
+
+    missing_urls = [url for url in db_urls if url not in store_url_set]
+    added = 0
+    batch = []
+    for offer in iter_offers(('url', 'embedding'), batch_size=batch_size, urls=missing_urls):
+        batch.append(offer)
+        if len(batch) >= batch_size:
+            added += _append_to_embedding_store(*_store_rows(batch))
+            batch = []
+    added += _append_to_embedding_store(*_store_rows(batch))
+    if added:
+        logging.info(f"{added} embeddings ajoutés à la matrice partagée {ANN_INDEX_BASE_PATH}.")
+    return added
+
+def _load_index_metadata(urls: list) -> dict:
+    """Métadonnées (sans embedding) des offres des lignes `urls` de la matrice partagée."""
+    metadata_columns = tuple(name for name in INDEX_COLUMNS if name != 'embedding')
+    return {offer.url: offer for offer in iter_offers(metadata_columns, urls=urls)}
+
+def _build_index_from_store(index):
+    sync_embedding_store()
+    index.build_from_store(embedding_store, _load_index_metadata)
+
+def get_offers_index():
+    """
+    Index d'embeddings partagé des offres de la base (construit une seule fois par processus).
+    Il est alimenté par iter_offers : seules les colonnes utiles à la recommandation sont lues,
+    en flux, et aucune description n'est gardée en mémoire.
+    Avec EMBEDDING_MEMMAP_ENABLED, la matrice est un memmap partagé par tous les processus
+    (workers du serveur) au lieu d'une copie par processus.
+    """
+    if embedding_store is not None:
+        return get_shared_index(builder=_build_index_from_store, persist_path=ANN_INDEX_BASE_PATH)
+    return get_shared_index(loader=lambda: iter_offers(INDEX_COLUMNS), persist_path=ANN_INDEX_BASE_PATH)
+
+def _validate_new_offer(new_offer_data: dict):
+    """Retourne (url, titre, description) d'une offre à ajouter, ou None si elle est invalide."""
     url_to_add = new_offer_data.get("url")
     if not url_to_add:
         logging.warning("Tentative d'ajout d'une offre sans URL. Ignorée.")
-        return False
+        return None
 
     title = new_offer_data.get("title", "Titre non fourni")
     description = new_offer_data.get("description_full", "Description non fournie")
 
     if title == "Erreur de scraping" or description == "Erreur de scraping":
         logging.warning(f"Tentative d'ajout d'une offre avec erreur de scraping ignorée: {url_to_add}")
-        return False
+        return None
+    return url_to_add, title, description
+
+def _offer_fingerprint(url: str, description: str):
+    """(URL canonique, SimHash de la description nettoyée ou None si elle est trop courte)."""
+    return canonicalize_url(url), simhash(clean_text(description), min_tokens=DEDUP_MIN_TOKENS)
+
+def _build_offer_row(new_offer_data: dict, url_to_add: str, title: str, description: str, processed: dict,
+                     fingerprint: tuple) -> dict:
+    """Assemble la ligne à insérer (skills en liste, sans l'embedding)."""
+    canonical_url, description_simhash = fingerprint
+    return {
+        "url": url_to_add,
+        "original_title": title, # Titre original du scraping
+        "original_description": description, # Description originale du scraping
+        "company": new_offer_data.get("company", "Inconnue"),
+        "location": new_offer_data.get("location", "Inconnue"),
+        "cleaned_title": processed["cleaned_title"],
+        "cleaned_description": processed["cleaned_description"],
+        "combined_text_for_embedding": processed["combined_text_for_embedding"], # Cette clé doit exister dans `processed`
+        "skills": processed["skills"],
+        "canonical_url": canonical_url,
+        "simhash": description_simhash,
+    }
+
+_INSERT_OFFER_SQL = f"""
+    INSERT INTO job_offers (
+        url, original_title, original_description, company, location,
+        cleaned_title, cleaned_description, combined_text_for_embedding,
+        skills, embedding_blob, embedding_dtype,
+        canonical_url, simhash, {", ".join(SIMHASH_BAND_COLUMNS)}
+    ) VALUES ({", ".join("?" * (13 + SIMHASH_BANDS))})
+    ON CONFLICT(url) DO NOTHING
+"""
+
+def _offer_row_params(offer_row: dict, embedding) -> tuple:
+    return (
+        offer_row["url"],
+        offer_row["original_title"],
+        offer_row["original_description"],
+        offer_row["company"],
+        offer_row["location"],
+        offer_row["cleaned_title"],
+        offer_row["cleaned_description"],
+        offer_row["combined_text_for_embedding"],
+        json.dumps(offer_row["skills"]),  # Sérialiser en chaîne JSON
+        encode_embedding(embedding),      # Vecteur binaire brut
+        EMBEDDING_STORAGE_DTYPE,
+    ) + _fingerprint_params(offer_row.get("canonical_url"), offer_row.get("simhash"))
 
-    conn = sqlite3.connect(DATABASE_PATH)
+def _fingerprint_params(canonical_url, description_simhash) -> tuple:
+    """(canonical_url, simhash, bandes...) au format des colonnes INTEGER signées de SQLite."""
+    if description_simhash is None:
+        return (canonical_url, None) + (None,) * SIMHASH_BANDS
+    return (canonical_url, to_signed64(description_simhash)) + tuple(simhash_bands(description_simhash))
+
+def add_job_offer_to_db(new_offer_data: dict, existing_offers: list = None) -> bool: 
+    # existing_offers n'est plus vraiment utilisé avec SQLite de cette manière,
+    # la vérification de doublon se fait via la clé primaire `url`.
+    # On pourrait enlever `existing_offers` de la signature si elle n'est pas utilisée ailleurs.
+    """
+    Add a new job offer to the SQLite database if it doesn't already exist.
+    Returns True if added, False if duplicate or invalid.
+    Pour plusieurs offres, préférer add_job_offers_to_db (un seul encodage par lot et un seul commit).
+    """
+    return add_job_offers_to_db([new_offer_data]) == 1
+
+def _fetch_existing_urls(cursor, urls: list, column: str = 'url') -> set:
+    """Retourne le sous-ensemble de `urls` déjà présent dans `column` (url ou canonical_url), par paquets IN."""
+    existing = set()
+    for start in range(0, len(urls), SQLITE_MAX_PARAMS):
+        chunk = urls[start:start + SQLITE_MAX_PARAMS]
+        placeholders = ", ".join("?" * len(chunk))
+        cursor.execute(f"SELECT {column} FROM job_offers WHERE {column} IN ({placeholders})", chunk)
+        existing.update(row[0] for row in cursor.fetchall())
+    return existing
+
+def _find_near_duplicate(cursor, description_simhash: int):
+    """
+    URL d'une offre en base dont la description est quasi identique (SimHash à distance <= DEDUP_SIMHASH_MAX_DISTANCE),
+    ou None. Recherche LSH : seules les offres partageant au moins une bande (colonnes indexées) sont comparées.
+    """
+    band_filter = " OR ".join(f"{column} = ?" for column in SIMHASH_BAND_COLUMNS)
+    cursor.execute(f"SELECT url, simhash FROM job_offers WHERE {band_filter}", simhash_bands(description_simhash))
+    for url, stored_simhash in cursor.fetchall():
+        if stored_simhash is not None and hamming_distance(from_signed64(stored_simhash), description_simhash) <= DEDUP_SIMHASH_MAX_DISTANCE:
+            return url
+    return None
+
+def _reject_duplicates(cursor, candidates: dict) -> list:
+    """
+    Écarte, avant tout encodage, les offres déjà connues : même URL, même URL canonique (paramètres de suivi,
+    'www.', ...) ou description quasi identique (offre republiée sur un autre site), en base ou dans le lot.
+    `candidates` : {url: (données, (url, titre, description))}. Retourne [(données, validé, empreinte)].
+    """
+    existing_urls = _fetch_existing_urls(cursor, list(candidates))
+    fingerprints = {
+        url: _offer_fingerprint(url, description)
+        for url, (_, (_, _, description)) in candidates.items() if url not in existing_urls
+    }
+    existing_canonical_urls = _fetch_existing_urls(
+        cursor, list({canonical_url for canonical_url, _ in fingerprints.values()}), column='canonical_url'
+    )
+
+    kept, batch_canonical_urls, batch_simhashes = [], set(), []
+    duplicates = {"url": len(existing_urls), "canonical_url": 0, "simhash": 0}
+    for url, (canonical_url, description_simhash) in fingerprints.items():
+        if canonical_url in existing_canonical_urls or canonical_url in batch_canonical_urls:
+            duplicates["canonical_url"] += 1
+            continue
+        if description_simhash is not None:
+            duplicate_url = next((other_url for other_url, other in batch_simhashes
+                                  if hamming_distance(other, description_simhash) <= DEDUP_SIMHASH_MAX_DISTANCE), None)
+            duplicate_url = duplicate_url or _find_near_duplicate(cursor, description_simhash)
+            if duplicate_url:
+                logging.info(f"Offre quasi identique à {duplicate_url} ignorée : {url}")
+                duplicates["simhash"] += 1
+                continue
+            batch_simhashes.append((url, description_simhash))
+        batch_canonical_urls.add(canonical_url)
+        new_offer_data, validated = candidates[url]
+        kept.append((new_offer_data, validated, (canonical_url, description_simhash)))
+
+    if any(duplicates.values()):
+        logging.info(
+            f"Doublons ignorés : {duplicates['url']} URL déjà en base, {duplicates['canonical_url']} URL canonique "
+            f"déjà connue, {duplicates['simhash']} description quasi identique."
+        )
+    return kept
+
+def filter_new_urls(urls: list) -> list:
+    """
+    Retourne les URLs de `urls` absentes de la base (ordre conservé, doublons retirés),
+    en requêtes IN par paquets sur la clé primaire et l'URL canonique : à utiliser AVANT de scraper.
+    """
+    # Une seule URL par forme canonique (variantes avec paramètres de suivi, 'www.', '/' final...)
+    unique_urls, seen_canonical_urls = [], set()
+    for url in urls:
+        if url and canonicalize_url(url) not in seen_canonical_urls:
+            seen_canonical_urls.add(canonicalize_url(url))
+            unique_urls.append(url)
+    if not unique_urls:
+        return []
+    try:
+        cursor = get_connection().cursor()
+        existing_urls = _fetch_existing_urls(cursor, unique_urls)
+        existing_canonical_urls = _fetch_existing_urls(
+            cursor, [canonicalize_url(url) for url in unique_urls], column='canonical_url'
+        )
+    except sqlite3.Error as e:
+        logging.error(f"Erreur SQLite lors de la recherche des URLs déjà connues : {e}")
+        return unique_urls
+    return [url for url in unique_urls if url not in existing_urls and canonicalize_url(url) not in existing_canonical_urls]
+
+def add_job_offers_to_db(new_offers: list, batch_size: int = EMBEDDING_BATCH_SIZE) -> int:
+    """
+    Ajout en masse d'offres (ingestion, scraping, ré-indexation).
+    Les doublons sont écartés avant tout encodage : URL ou URL canonique déjà en base (requêtes
+    ensemblistes) et descriptions quasi identiques (SimHash, recherche LSH par bandes indexées).
+    Les titres sont encodés par lots de `batch_size`, puis toutes les lignes sont insérées dans UNE transaction.
+    INSERT ... ON CONFLICT(url) DO NOTHING garantit l'absence de doublon même si un autre thread
+    ou processus a inséré la même URL entre-temps : seules les lignes réellement insérées
+    sont ajoutées à l'index.
+    Retourne le nombre d'offres ajoutées.
+    """
+    candidates = {}
+    for new_offer_data in new_offers:
+        validated = _validate_new_offer(new_offer_data)
+        if validated and validated[0] not in candidates:
+            candidates[validated[0]] = (new_offer_data, validated)
+    if not candidates:
+        return 0
+
+    conn = get_connection()
     cursor = conn.cursor()
+    try:
+        to_insert = _reject_duplicates(cursor, candidates)
+        if not to_insert:
+            return 0
 
-    # Check if offer already exists by URL
-    cursor.execute("SELECT 1 FROM job_offers WHERE url = ?", (url_to_add,))
-    if cursor.fetchone():
-        logging.info(f"Offre déjà existante dans la base de données SQLite : {url_to_add}")
-        conn.close()
-        return False
+        processed_offers = process_job_offers_batch(
+            [(title, description) for _, (_, title, description), _ in to_insert],
+            batch_size=batch_size
+        )
+        offer_rows = [
+            _build_offer_row(new_offer_data, url_to_add, title, description, processed, fingerprint)
+            for (new_offer_data, (url_to_add, title, description), fingerprint), processed in zip(to_insert, processed_offers)
+        ]
+
+        inserted = []
+        with conn: # Une seule transaction (un seul commit) pour tout le lot
+            for offer_row, processed in zip(offer_rows, processed_offers):
+                cursor.execute(_INSERT_OFFER_SQL, _offer_row_params(offer_row, processed["embedding"]))
+                if cursor.rowcount == 1: # 0 : URL insérée entre-temps (conflit ignoré)
+                    inserted.append((offer_row, processed["embedding"]))
+        logging.info(f"{len(inserted)} nouvelles offres ajoutées à la base de données SQLite.")
+
+        if embedding_store is not None:
+            # Matrice partagée d'abord : les index des processus (dont celui-ci) y rattrapent les nouvelles lignes
+            _append_to_embedding_store(*_store_rows(
+                {'url': offer_row['url'], 'embedding': embedding} for offer_row, embedding in inserted
+            ))
+        for offer_row, embedding in inserted:
+            add_offer_to_shared_index(OfferRecord.from_mapping(offer_row, INDEX_COLUMNS), embedding)
+        return len(inserted)
+    except sqlite3.Error as e:
+        logging.error(f"Erreur SQLite lors de l'ajout en masse de {len(candidates)} offres : {e}")
+        return 0
+    except KeyError as e: # Au cas où une clé manquerait dans les données traitées
+        logging.error(f"Clé manquante dans les données traitées lors de l'ajout en masse : {e}")
+        return 0
+
+_UPDATE_OFFER_SQL = f"""
+    UPDATE job_offers SET
+        original_title = ?, original_description = ?, company = ?, location = ?,
+        cleaned_title = ?, cleaned_description = ?, combined_text_for_embedding = ?,
+        skills = ?, embedding_blob = ?, embedding_dtype = ?,
+        canonical_url = ?, simhash = ?, {", ".join(f"{column} = ?" for column in SIMHASH_BAND_COLUMNS)},
+        embedding = NULL
+    WHERE url = ?
+"""
 
-    # Si l'offre n'existe pas, la traiter et l'ajouter
-    processed = process_job_offer_text(title, description) # `processed` vient de text_processor.py
+def update_job_offers_in_db(updated_offers: list, batch_size: int = EMBEDDING_BATCH_SIZE,
+                            refresh_embedding_store: bool = True) -> int:
+    """
+    Remplace le contenu d'offres existantes (ex: ré-extraction des pages stockées avec de meilleures règles).
+    Textes nettoyés, compétences et embeddings sont recalculés par lots, puis écrits dans UNE transaction.
+    Les vecteurs des offres modifiées sont remplacés dans la matrice partagée (une nouvelle génération, que
+    les index des workers détectent d'eux-mêmes). Avec `refresh_embedding_store=False`, la matrice n'est
+    pas touchée : l'appelant regroupe les URLs modifiées et appelle replace_embedding_store_rows une fois.
+    Retourne le nombre d'offres mises à jour.
+    """
+    candidates = {}
+    for offer_data in updated_offers:
+        validated = _validate_new_offer(offer_data)
+        if validated:
+            candidates[validated[0]] = (offer_data, validated)
+    if not candidates:
+        return 0
 
+    conn = get_connection()
     try:
-        cursor.execute("""
-            INSERT INTO job_offers (
-                url, original_title, original_description, company, location,
-                cleaned_title, cleaned_description, combined_text_for_embedding,
-                skills, embedding
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
-            url_to_add,
-            title, # Titre original du scraping
-            description, # Description originale du scraping
-            new_offer_data.get("company", "Inconnue"),
-            new_offer_data.get("location", "Inconnue"),
-            processed["cleaned_title"],
-            processed["cleaned_description"],
-            processed["combined_text_for_embedding"], # Cette clé doit exister dans `processed`
-            json.dumps(processed["skills"]),          # Sérialiser en chaîne JSON
-            json.dumps(processed["embedding"]),       # Sérialiser en chaîne JSON
-        ))
-        conn.commit()
-        logging.info(f"Nouvelle offre ajoutée à la base de données SQLite : {url_to_add}")
-        return True
+        processed_offers = process_job_offers_batch(
+            [(title, description) for _, (_, title, description) in candidates.values()],
+            batch_size=batch_size
+        )
+        offer_rows = [
+            (_build_offer_row(offer_data, url, title, description, processed, _offer_fingerprint(url, description)),
+             processed["embedding"])
+            for (offer_data, (url, title, description)), processed in zip(candidates.values(), processed_offers)
+        ]
+        updated = []
+        with conn:
+            cursor = conn.cursor()
+            for offer_row, embedding in offer_rows:
+                params = _offer_row_params(offer_row, embedding)
+                cursor.execute(_UPDATE_OFFER_SQL, params[1:] + params[:1])  # L'url passe en fin (clause WHERE)
+                if cursor.rowcount == 1:
+                    updated.append((offer_row, embedding))
     except sqlite3.Error as e:
-        logging.error(f"Erreur SQLite lors de l'ajout de l'offre {url_to_add}: {e}")
-        return False
-    except KeyError as e: # Au cas où une clé manquerait dans `processed`
-        logging.error(f"Clé manquante dans les données traitées pour l'offre {url_to_add}: {e}")
-        return False
-    finally:
-        conn.close()
+        logging.error(f"Erreur SQLite lors de la mise à jour de {len(candidates)} offres : {e}")
+        return 0
+    except KeyError as e:
+        logging.error(f"Clé manquante dans les données traitées lors de la mise à jour : {e}")
+        return 0
+
+    if updated and embedding_store is None:
+        reset_shared_index()  # Index en mémoire privée : seul un rechargement voit les nouveaux vecteurs
+    elif updated and refresh_embedding_store:
+        _replace_in_embedding_store(*_store_rows(
+            {'url': offer_row['url'], 'embedding': embedding} for offer_row, embedding in updated
+        ))
+    logging.info(f"{len(updated)} offres mises à jour dans la base de données SQLite.")
+    return len(updated)
+
+def _replace_in_embedding_store(urls: list, vectors: list) -> int:
+    if not urls:
+        return 0
+    return embedding_store.replace(urls, np.vstack(vectors))
+
+def replace_embedding_store_rows(urls, batch_size: int = 1000) -> int:
+    """
+    Remplace dans la matrice partagée les vecteurs des offres `urls` par ceux de la base, en une seule
+    génération (après une série d'update_job_offers_in_db(..., refresh_embedding_store=False)).
+    Retourne le nombre de lignes remplacées.
+    """
+    urls = list(urls)
+    if embedding_store is None or not urls:
+        return 0
+    return _replace_in_embedding_store(*_store_rows(iter_offers(('url', 'embedding'), batch_size=batch_size, urls=urls)))
+
+def backfill_offer_fingerprints(batch_size: int = 1000) -> int:
+    """
+    Calcule l'URL canonique et la SimHash des offres enregistrées avant leur introduction
+    (sans elles, ces offres ne sont pas reconnues comme doublons), puis met à jour les URLs canoniques
+    calculées avec d'anciennes règles. Retourne le nombre d'offres complétées ou corrigées.
+    """
+    conn = get_connection()
+    cursor = conn.cursor()
+    updated_count = 0
+    while True:
+        # Relecture par paquets (et non un curseur ouvert) : les lignes lues sont modifiées entre deux paquets
+        cursor.execute("SELECT url, cleaned_description FROM job_offers WHERE canonical_url IS NULL LIMIT ?", (batch_size,))
+        rows = cursor.fetchall()
+        if not rows:
+            break
+        params = [
+            _fingerprint_params(canonicalize_url(url), simhash(cleaned_description, min_tokens=DEDUP_MIN_TOKENS)) + (url,)
+            for url, cleaned_description in rows
+        ]
+        with conn:
+            conn.executemany(
+                "UPDATE job_offers SET canonical_url = ?, simhash = ?, "
+                + ", ".join(f"{column} = ?" for column in SIMHASH_BAND_COLUMNS) + " WHERE url = ?",
+                params
+            )
+        updated_count += len(params)
+    logging.info(f"Empreintes de déduplication calculées pour {updated_count} offres.")
+    updated_count += refresh_canonical_urls(batch_size)
+    return updated_count
+
+def refresh_canonical_urls(batch_size: int = 1000) -> int:
+    """
+    Recalcule l'URL canonique des offres déjà enregistrées quand les règles de canonicalize_url changent
+    (une URL canonique périmée ferait rejeter comme doublons des offres distinctes).
+    Retourne le nombre d'offres corrigées.
+    """
+    conn = get_connection()
+    cursor = conn.cursor()
+    refreshed_count, last_rowid = 0, 0
+    while True:
+        cursor.execute(
+            "SELECT rowid, url, canonical_url FROM job_offers WHERE rowid > ? AND canonical_url IS NOT NULL ORDER BY rowid LIMIT ?",
+            (last_rowid, batch_size)
+        )
+        rows = cursor.fetchall()
+        if not rows:
+            break
+        last_rowid = rows[-1][0]
+        params = [(canonicalize_url(url), url) for _, url, canonical_url in rows if canonicalize_url(url) != canonical_url]
+        if params:
+            with conn:
+                conn.executemany("UPDATE job_offers SET canonical_url = ? WHERE url = ?", params)
+            refreshed_count += len(params)
+    if refreshed_count:
+        logging.info(f"URL canonique recalculée pour {refreshed_count} offres.")
+    return refreshed_count
+
+# Si vous avez d'autres fonctions comme populate_initial_db, elles devront aussi être adaptées à SQLite.
 
-# Si vous avez d'autres fonctions comme populate_initial_db, elles devront aussi être adaptées à SQLite.
\ No newline at end of file
+if __name__ == '__main__':
+    # Migration des bases existantes vers le stockage binaire des embeddings :
+    #   python database_manager.py migrate [chemin1.sqlite3 chemin2.sqlite3 ...]
+    # Sans chemin explicite, toutes les bases data/job_offers*.sqlite3 sont migrées.
+    # Compactage de la matrice d'embeddings partagée (après suppression d'offres) :
+    #   python database_manager.py compact
+    # Empreintes de déduplication (URL canonique, SimHash) des offres enregistrées avant leur introduction,
+    # et URLs canoniques à recalculer après un changement des paramètres de suivi (offer_fingerprint) :
+    #   python database_manager.py fingerprint
+    if len(sys.argv) >= 2 and sys.argv[1] == 'migrate':
+        db_paths = sys.argv[2:] or sorted(glob.glob(os.path.join(DATA_DIR, "job_offers*.sqlite3")))
+        for path in db_paths:
+            migrate_embeddings_to_blob(path)
+    elif len(sys.argv) >= 2 and sys.argv[1] == 'compact' and embedding_store is not None:
+        sync_embedding_store()
+    elif len(sys.argv) >= 2 and sys.argv[1] == 'fingerprint':
+        backfill_offer_fingerprints()
+    else:
+        print("Usage : python database_manager.py migrate [chemins des bases SQLite]")
+        print("        python database_manager.py compact")
+        print("        python database_manager.py fingerprint")
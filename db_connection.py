@@ -0,0 +1,99 @@
+# /mon_agent_reco_emploi/db_connection.py
+import logging
+import os
+import sqlite3
+import threading
+from config import DB_BUSY_TIMEOUT_SECONDS, DB_MMAP_SIZE_BYTES, DB_CACHE_SIZE_KIB
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+def configure_connection(conn: sqlite3.Connection):
+    """
+    Réglages appliqués à chaque connexion :
+    WAL (les lectures ne bloquent plus l'écriture du scraper, et inversement), synchronous=NORMAL
+    (sûr en WAL, bien moins de fsync), cache de pages et lecture par mmap plus grands.
+    """
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(f"PRAGMA mmap_size={int(DB_MMAP_SIZE_BYTES)}")
+    conn.execute(f"PRAGMA cache_size=-{int(DB_CACHE_SIZE_KIB)}")  # Valeur négative : taille en Kio
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute(f"PRAGMA busy_timeout={int(DB_BUSY_TIMEOUT_SECONDS * 1000)}")
+
+
+class ConnectionManager:
+    """
+    Connexions SQLite réutilisées : une connexion par thread et par base, ouverte et configurée
+    au premier accès. Le schéma est initialisé une seule fois par processus (`schema_initializer`).
+    """
+
+    def __init__(self, db_path: str, schema_initializer=None):
+        self.db_path = db_path
+        self._schema_initializer = schema_initializer
+        self._schema_ready = False
+        self._schema_lock = threading.Lock()
+        self._local = threading.local()
+        # Thread -> connexion (pour close_all et le ménage). Clé : l'objet Thread et non threading.get_ident(),
+        # que le système réattribue à un nouveau thread une fois l'ancien terminé
+        self._connections = {}
+        self._connections_lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+        # check_same_thread=False : chaque connexion reste propre à un thread, mais close_all peut la fermer
+        conn = sqlite3.connect(self.db_path, timeout=DB_BUSY_TIMEOUT_SECONDS, check_same_thread=False)
+        configure_connection(conn)
+        return conn
+
+    def ensure_schema(self, force: bool = False):
+        """Exécute l'initialisation du schéma une seule fois (ou à nouveau avec `force=True`)."""
+        if self._schema_ready and not force:
+            return
+        with self._schema_lock:
+            if self._schema_ready and not force:
+                return
+            if self._schema_initializer is not None:
+                conn = self._get_thread_connection()
+                with conn:
+                    self._schema_initializer(conn.cursor())
+            self._schema_ready = True
+
+    def _get_thread_connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._connect()
+            self._local.conn = conn
+            with self._connections_lock:
+                self._close_dead_thread_connections()
+                self._connections[threading.current_thread()] = conn
+        return conn
+
+    def _close_dead_thread_connections(self):
+        """Ferme les connexions des threads terminés (ex: workers d'un pool recyclés)."""
+        for thread in [thread for thread in self._connections if not thread.is_alive()]:
+            self._connections.pop(thread).close()
+
+    def get_connection(self) -> sqlite3.Connection:
+        """Connexion du thread courant (schéma garanti). Ne pas la fermer : elle est réutilisée."""
+        self.ensure_schema()
+        return self._get_thread_connection()
+
+    def close_thread_connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            with self._connections_lock:
+                self._connections.pop(threading.current_thread(), None)
+            conn.close()
+            self._local.conn = None
+
+    def close_all(self):
+        """Ferme toutes les connexions ouvertes (fin de processus, tests, remplacement du fichier)."""
+        with self._connections_lock:
+            for conn in self._connections.values():
+                try:
+                    conn.close()
+                except sqlite3.Error as e:
+                    logging.error(f"Erreur lors de la fermeture d'une connexion SQLite : {e}")
+            self._connections = {}
+            self._local = threading.local()
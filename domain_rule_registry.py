@@ -0,0 +1,121 @@
+# /mon_agent_reco_emploi/domain_rule_registry.py
+import json
+import logging
+import os
+import threading
+import time
+from html_extractor import CompiledSelector
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+def merge_domain_rules(primary: dict, secondary: dict) -> dict:
+    """
+    Fusionne deux jeux de règles {domaine: {champ: [sélecteurs]}} : les sélecteurs de `primary`
+    d'abord, puis ceux de `secondary` qui n'y figurent pas encore.
+    """
+    merged = {domain: {field: list(selectors) for field, selectors in rules.items()} for domain, rules in primary.items()}
+    for domain, rules in secondary.items():
+        domain_rules = merged.setdefault(domain, {})
+        for field, selectors in rules.items():
+            field_selectors = domain_rules.setdefault(field, [])
+            field_selectors.extend(selector for selector in selectors if selector not in field_selectors)
+    return merged
+
+
+class DomainRuleRegistry:
+    """
+    Registre unique des règles d'extraction par domaine : règles apprises (fichier JSON géré par
+    domain_rules_manager) fusionnées avec les règles écrites dans le code (scraper_utils.DOMAIN_RULES).
+    Les sélecteurs sont compilés une fois au chargement (CompiledSelector) ; la date de modification
+    du fichier est surveillée (au plus une fois par `check_interval` secondes) et les règles sont
+    rechargées sans redémarrer le processus, y compris dans les processus d'extraction.
+    """
+
+    def __init__(self, rules_file: str, builtin_rules: dict = None, check_interval: float = 1.0):
+        self.rules_file = rules_file
+        self._builtin_rules = builtin_rules if builtin_rules is not None else {}
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._compiled = None  # {domaine: {champ: [CompiledSelector]}}
+        self._rules = {}
+        self._file_rules = {}  # Dernières règles lues avec succès dans le fichier
+        self._file_signature = None  # (mtime_ns, taille) du fichier chargé
+        self._next_check = 0.0
+
+    def _signature(self):
+        try:
+            stat = os.stat(self.rules_file)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _read_file_rules(self):
+        """Règles du fichier JSON ({} s'il n'existe pas), ou None s'il est illisible (règles actuelles conservées)."""
+        if not os.path.exists(self.rules_file):
+            return {}
+        try:
+            with open(self.rules_file, 'r', encoding='utf-8') as f:
+                rules = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            logging.error(f"Règles de domaine illisibles dans {self.rules_file}, règles précédentes conservées : {e}")
+            return None
+        if not isinstance(rules, dict):
+            logging.error(f"Format de règles inattendu dans {self.rules_file}, règles précédentes conservées.")
+            return None
+        return rules
+
+    @staticmethod
+    def _compile(rules: dict) -> dict:
+        compiled = {}
+        for domain, domain_rules in rules.items():
+            compiled_fields = {}
+            for field, selectors in domain_rules.items():
+                compiled_selectors = []
+                for selector in selectors:
+                    try:
+                        compiled_selectors.append(CompiledSelector(selector))
+                    except Exception as e:
+                        logging.warning(f"Sélecteur invalide ignoré pour {domain} ({field}) : {selector} ({e})")
+                if compiled_selectors:
+                    compiled_fields[field] = compiled_selectors
+            compiled[domain] = compiled_fields
+        return compiled
+
+    def reload(self, force: bool = False) -> bool:
+        """Recharge et recompile les règles si le fichier a changé (ou toujours avec `force`). Retourne True si rechargé."""
+        with self._lock:
+            signature = self._signature()
+            self._next_check = time.monotonic() + self.check_interval
+            if not force and self._compiled is not None and signature == self._file_signature:
+                return False
+            file_rules = self._read_file_rules()
+            if file_rules is None:
+                file_rules = self._file_rules  # Fichier en cours d'écriture ou invalide : dernières règles valides
+            self._file_rules = file_rules
+            rules = merge_domain_rules(file_rules, self._builtin_rules)
+            self._compiled = self._compile(rules)
+            self._rules = rules
+            self._file_signature = signature
+        logging.info(f"Règles de domaine chargées : {len(rules)} domaines ({self.rules_file}).")
+        return True
+
+    def invalidate(self):
+        """Force une recompilation au prochain accès (ex: règles du code modifiées par add_domain_rules)."""
+        with self._lock:
+            self._file_signature = object()  # Ne correspond plus à aucun fichier : rechargement assuré
+            self._next_check = 0.0
+
+    def _ensure_current(self):
+        if self._compiled is None or time.monotonic() >= self._next_check:
+            self.reload()
+
+    def get(self, domain: str):
+        """Règles compilées du domaine ({champ: [CompiledSelector]}), ou None."""
+        self._ensure_current()
+        return self._compiled.get(domain)
+
+    def rules(self) -> dict:
+        """Règles fusionnées (sélecteurs sous forme de chaînes)."""
+        self._ensure_current()
+        return self._rules
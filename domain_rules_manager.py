@@ -3,15 +3,18 @@ import os
 import logging
 from urllib.parse import urlparse
 import re
-from bs4 import BeautifulSoup
-import requests
+from bisect import bisect_left
+from collections import Counter
+import http_client
 import random
 import time
+from config import DOMAIN_RULES_FILE
+from html_extractor import ParsedPage, CompiledSelector
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-# Fichier pour stocker les règles de scraping par domaine
-RULES_FILE = "domain_rules.json"
+# Fichier pour stocker les règles de scraping par domaine (lu par le registre de scraper_utils)
+RULES_FILE = DOMAIN_RULES_FILE
 
 def get_domain(url):
     """Extrait le domaine principal d'une URL"""
@@ -40,79 +43,20 @@ def load_domain_rules():
         return {}
 
 def save_domain_rules(rules):
-    """Sauvegarde les règles de scraping dans le fichier JSON"""
+    """
+    Sauvegarde les règles de scraping dans le fichier JSON.
+    Écriture dans un fichier temporaire puis remplacement atomique : un crawler qui recharge
+    les règles (DomainRuleRegistry) ne lit jamais un fichier à moitié écrit.
+    """
     try:
-        with open(RULES_FILE, 'w', encoding='utf-8') as f:
+        tmp_path = f"{RULES_FILE}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
             json.dump(rules, f, indent=4, ensure_ascii=False)
+        os.replace(tmp_path, RULES_FILE)
         logging.info(f"Règles sauvegardées dans {RULES_FILE}")
     except Exception as e:
         logging.error(f"Erreur lors de la sauvegarde des règles: {e}")
 
-def find_candidate_selectors(soup, element_text, tag_types, max_candidates=3):
-    """
-    Trouve des sélecteurs CSS potentiels pour un élément basé sur son texte.
-    
-    Args:
-        soup: Objet BeautifulSoup de la page
-        element_text: Texte contenu dans l'élément à trouver
-        tag_types: Liste de types de balises à rechercher (ex: ['h1', 'div', 'span'])
-        max_candidates: Nombre maximum de sélecteurs à retourner
-        
-    Returns:
-        Liste de sélecteurs CSS potentiels
-    """
-    if not element_text or not soup or not tag_types:
-        return []
-    
-    # Nettoyer le texte pour la recherche
-    clean_text = re.sub(r'\s+', ' ', element_text).strip()
-    if len(clean_text) < 10:  # Ignorer les textes trop courts
-        return []
-    
-    candidates = []
-    
-    # Chercher des éléments contenant le texte exact ou une partie
-    for tag in tag_types:
-        elements = soup.find_all(tag)
-        for element in elements:
-            element_text = element.get_text(strip=True)
-            if clean_text in element_text or element_text in clean_text:
-                # Créer un sélecteur CSS basé sur les classes et l'ID
-                selector = tag
-                
-                # Ajouter l'ID s'il existe
-                if element.get('id'):
-                    selector += f"#{element['id']}"
-                # Sinon, ajouter les classes s'il y en a
-                elif element.get('class'):
-                    classes = '.'.join(element['class'])
-                    selector += f".{classes}"
-                
-                # Si on a déjà un sélecteur avec ID ou classe, l'ajouter
-                if selector != tag:
-                    candidates.append(selector)
-                
-                # Essayer de créer un sélecteur avec le chemin partiel
-                parent = element.parent
-                if parent and parent.name != 'body':
-                    parent_selector = parent.name
-                    if parent.get('class'):
-                        parent_classes = '.'.join(parent['class'])
-                        parent_selector += f".{parent_classes}"
-                    
-                    selector_with_parent = f"{parent_selector} > {selector}"
-                    candidates.append(selector_with_parent)
-    
-    # Enlever les doublons et limiter le nombre
-    unique_candidates = []
-    for candidate in candidates:
-        if candidate not in unique_candidates:
-            unique_candidates.append(candidate)
-            if len(unique_candidates) >= max_candidates:
-                break
-    
-    return unique_candidates
-
 def fetch_html(url):
     """Récupère le HTML d'une page web"""
     USER_AGENTS = [
@@ -128,74 +72,246 @@ def fetch_html(url):
     }
     
     try:
-        response = requests.get(url, headers=headers, timeout=15)
+        response = http_client.fetch(url, headers=headers, timeout=15)
         response.raise_for_status()
         return response.content
     except Exception as e:
         logging.error(f"Erreur lors de la récupération de {url}: {e}")
         return None
 
-def learn_from_successful_scrape(url, title, description, company=None, location=None):
+# Apprentissage par lot : pour chaque champ, balises candidates et valeurs "non trouvé" à ignorer
+LEARNED_FIELDS = {
+    'title': (('h1', 'h2', 'div', 'span'), "Titre non trouvé"),
+    'description': (('div', 'article', 'section', 'main'), "Description non trouvée"),
+    'company': (('div', 'span', 'p', 'a'), "Entreprise non trouvée"),
+    'location': (('div', 'span', 'p', 'li'), "Localisation non trouvée"),
+}
+# Longueur minimale d'un texte pour servir à l'apprentissage (textes trop courts : correspondances fortuites)
+MIN_LEARNING_TEXT_LENGTH = 10
+# Seule l'amorce de la description est recherchée dans la page (l'extraction peut l'avoir tronquée)
+DESCRIPTION_PREFIX_LENGTH = 200
+# Candidats vérifiés par champ (par support décroissant dans les index) en réappliquant le sélecteur à chaque page
+MAX_VERIFIED_SELECTORS = 10
+_CSS_IDENTIFIER_RE = re.compile(r'^-?[A-Za-z_][\w-]*$')
+
+def _normalize_learning_text(text):
+    # Même normalisation que ParsedPage.text_spans
+    return ' '.join((text or '').split())
+
+def _field_learning_values(sample: dict) -> dict:
+    """Textes extraits de la page à retrouver, par champ de règle ({} pour les champs absents ou trop courts)."""
+    values = {}
+    for field, (_, not_found_value) in LEARNED_FIELDS.items():
+        value = sample.get('description_full', sample.get('description')) if field == 'description' else sample.get(field)
+        if not value or value == not_found_value:
+            continue
+        value = _normalize_learning_text(value)
+        if field == 'description':
+            if len(value) <= 100:
+                continue
+            value = value[:DESCRIPTION_PREFIX_LENGTH]
+        if len(value) >= MIN_LEARNING_TEXT_LENGTH:
+            values[field] = value
+    return values
+
+def _texts_match(element_text: str, value: str) -> bool:
+    """Vrai si l'un des textes contient l'autre, le texte de l'élément n'étant pas trop court pour être significatif."""
+    return len(element_text) >= MIN_LEARNING_TEXT_LENGTH and (value in element_text or element_text in value)
+
+def _css_classes(element) -> list:
+    return [cls for cls in (element.get('class') or '').split() if _CSS_IDENTIFIER_RE.match(cls)]
+
+def _element_selectors(element) -> list:
+    """
+    Sélecteurs propres à l'élément : balise#id, balise.classes et, s'il a plusieurs classes, balise.classe
+    pour chacune (un id ou une classe propre à l'offre ne se retrouve pas d'une page à l'autre, les autres si).
+    """
+    selectors = []
+    element_id = element.get('id')
+    if element_id and _CSS_IDENTIFIER_RE.match(element_id):
+        selectors.append(f"{element.tag}#{element_id}")
+    classes = _css_classes(element)
+    if classes:
+        selectors.append(f"{element.tag}.{'.'.join(classes)}")
+    if len(classes) > 1:
+        selectors.extend(f"{element.tag}.{cls}" for cls in classes)
+    return selectors
+
+def _element_candidate_selectors(element) -> list:
+    """Sélecteurs candidats d'un élément : ses propres sélecteurs, seuls puis précédés de celui de son parent (hors <body>)."""
+    selectors = _element_selectors(element)
+    parent = element.getparent()
+    if parent is None or parent.tag in ('body', 'html'):
+        return selectors
+    classes = _css_classes(parent)
+    parent_selector = f"{parent.tag}.{'.'.join(classes)}" if classes else parent.tag
+    return selectors + [f"{parent_selector} > {selector}" for selector in selectors]
+
+def _occurrences(text: str, value: str) -> list:
+    """Positions (croissantes) de toutes les occurrences de `value` dans `text`."""
+    positions = []
+    position = text.find(value)
+    while position != -1:
+        positions.append(position)
+        position = text.find(value, position + 1)
+    return positions
+
+def build_page_selector_index(page: ParsedPage, field_values: dict) -> dict:
+    """
+    Index des sélecteurs candidats d'une page : {champ: ensemble de sélecteurs des éléments qui contiennent
+    (ou sont contenus dans) le texte extrait pour ce champ}. UN seul parcours de l'arbre pour tous les champs
+    (ParsedPage.text_spans) : chaque élément est une tranche du texte de la page. "L'élément contient la valeur"
+    se lit sur les positions des occurrences de la valeur ; seul le texte des éléments plus courts que la
+    valeur est matérialisé, pour vérifier qu'il y est contenu.
+    Seuls les éléments les plus profonds sont retenus : un conteneur dont un descendant correspond
+    déjà (ex: le <div> qui englobe toute l'offre) ramènerait bien plus que le champ.
+    """
+    fields_by_tag = {}
+    for field in field_values:
+        for tag in LEARNED_FIELDS[field][0]:
+            fields_by_tag.setdefault(tag, []).append(field)
+
+    matches = {field: [] for field in field_values}
+    if fields_by_tag:
+        page_text, spans = page.text_spans()
+        occurrences = {field: _occurrences(page_text, value) for field, value in field_values.items()}
+        for element in page.root.iter(*fields_by_tag):
+            start, end = spans.get(element, (0, 0))
+            if end - start < MIN_LEARNING_TEXT_LENGTH:
+                continue
+            for field in fields_by_tag[element.tag]:
+                value = field_values[field]
+                if end - start >= len(value):
+                    # Première occurrence qui commence dans l'élément : elle doit aussi s'y terminer
+                    positions = occurrences[field]
+                    i = bisect_left(positions, start)
+                    matched = i < len(positions) and positions[i] + len(value) <= end
+                else:
+                    matched = page_text[start:end] in value
+                if matched:
+                    matches[field].append(element)
+
+    index = {}
+    for field, elements in matches.items():
+        # Parcours dans l'ordre du document : les ancêtres d'un élément sont rencontrés avant lui
+        matched = set(elements)
+        containers = {ancestor for element in elements for ancestor in element.iterancestors() if ancestor in matched}
+        index[field] = {selector for element in elements if element not in containers
+                        for selector in _element_candidate_selectors(element)}
+    return index
+
+def _selector_extracts(page: ParsedPage, selector: CompiledSelector, value: str) -> bool:
+    """Vrai si le sélecteur, appliqué comme à l'extraction (ParsedPage.select_text), retrouve bien la valeur."""
+    return _texts_match(_normalize_learning_text(page.select_text([selector])), value)
+
+def rank_domain_selectors(samples: list, min_support: float = 0.5, max_verified: int = MAX_VERIFIED_SELECTORS) -> dict:
+    """
+    Classe, pour chaque champ, les sélecteurs candidats d'un ensemble de pages d'un même domaine.
+    `samples` : dictionnaires {"page": ParsedPage, "title", "description_full", "company", "location"}.
+    Le support d'un sélecteur est le nombre de pages où, appliqué comme à l'extraction (premier élément),
+    il retrouve la valeur du champ. Seuls les `max_verified` candidats les plus fréquents dans les index,
+    présents dans celui d'au moins `min_support` (fraction) des pages où le champ est connu, sont vérifiés.
+    Retourne {champ: [(sélecteur, support, pages avec ce champ)]} du plus au moins fiable.
+    """
+    indexed_pages = []
+    candidate_support = {field: Counter() for field in LEARNED_FIELDS}
+    for sample in samples:
+        field_values = _field_learning_values(sample)
+        if not field_values:
+            continue
+        index = build_page_selector_index(sample["page"], field_values)
+        for field, selectors in index.items():
+            candidate_support[field].update(selectors)
+        indexed_pages.append((sample["page"], field_values))
+
+    ranking = {}
+    for field, support in candidate_support.items():
+        pages_with_field = [(page, values[field]) for page, values in indexed_pages if field in values]
+        required = max(1, min_support * len(pages_with_field))
+        scored = []
+        # Candidats propres à trop peu de pages (id d'offre, classe générée...) : pas de vérification
+        candidates = sorted((item for item in support.items() if item[1] >= required),
+                            key=lambda item: (-item[1], len(item[0])))
+        for selector, _ in candidates[:max_verified]:
+            try:
+                compiled = CompiledSelector(selector)
+            except Exception:
+                continue
+            verified = sum(_selector_extracts(page, compiled, value) for page, value in pages_with_field)
+            if verified >= required:
+                scored.append((selector, verified, len(pages_with_field)))
+        # À support égal : le sélecteur le plus court (le moins dépendant de la structure) d'abord
+        scored.sort(key=lambda item: (-item[1], len(item[0])))
+        if scored:
+            ranking[field] = scored
+    return ranking
+
+def learn_domain_rules_from_pages(samples: list, min_support: float = 0.5, max_candidates: int = 3) -> dict:
+    """
+    Apprend les règles d'un domaine à partir de plusieurs pages déjà analysées (un parcours d'arbre par page).
+    Ne garde, par champ, que les `max_candidates` meilleurs sélecteurs qui fonctionnent sur au moins
+    `min_support` (fraction) des pages où le champ est connu : des règles robustes, pas propres à une page.
+    """
+    return {
+        field: [selector for selector, _, _ in scored[:max_candidates]]
+        for field, scored in rank_domain_selectors(samples, min_support).items()
+    }
+
+def _learning_sample(url, page_or_html, extracted: dict) -> dict:
+    page = page_or_html if isinstance(page_or_html, ParsedPage) else ParsedPage(page_or_html)
+    return dict(extracted, url=url, page=page)
+
+def learn_from_scraped_pages(scraped_pages: list, overwrite: bool = False, min_support: float = 0.5) -> dict:
+    """
+    Apprentissage par lot à partir de pages déjà scrapées (aucun nouveau téléchargement) :
+    `scraped_pages` est une liste de (url, ParsedPage ou HTML brut, offre extraite).
+    Les pages sont regroupées par domaine ; les domaines ayant déjà des règles sont ignorés sauf `overwrite`.
+    Les règles apprises sont sauvegardées en une fois. Retourne {domaine: règles apprises}.
+    """
+    domain_rules = load_domain_rules()
+    samples_by_domain = {}
+    for url, page_or_html, extracted in scraped_pages:
+        domain = get_domain(url)
+        if domain and (overwrite or domain not in domain_rules):
+            samples_by_domain.setdefault(domain, []).append(_learning_sample(url, page_or_html, extracted))
+
+    learned = {}
+    for domain, samples in samples_by_domain.items():
+        new_rules = learn_domain_rules_from_pages(samples, min_support=min_support)
+        if new_rules:
+            learned[domain] = new_rules
+            logging.info(f"Nouvelles règles apprises pour le domaine {domain} ({len(samples)} pages): {new_rules}")
+        else:
+            logging.warning(f"Impossible d'apprendre des règles pour {domain}")
+    if learned:
+        domain_rules.update(learned)
+        save_domain_rules(domain_rules)
+    return learned
+
+def learn_from_successful_scrape(url, title, description, company=None, location=None, html_content=None):
     """
     Analyse une page d'offre d'emploi scrapée avec succès pour apprendre
     les sélecteurs à utiliser pour ce domaine à l'avenir.
+    Le HTML est celui qui vient d'être scrapé (`html_content`, ou la page brute stockée par le scraping) :
+    la page n'est re-téléchargée qu'en dernier recours. Pour plusieurs pages, voir learn_from_scraped_pages.
     """
     domain = get_domain(url)
     if not domain:
         return False
     
-    # Charger les règles existantes
-    domain_rules = load_domain_rules()
-    
     # Vérifier si on a déjà des règles pour ce domaine
-    if domain in domain_rules:
+    if domain in load_domain_rules():
         logging.info(f"Des règles existent déjà pour {domain}, pas d'apprentissage nécessaire.")
         return False
     
-    # Récupérer le HTML de la page
-    html_content = fetch_html(url)
+    if html_content is None:
+        from page_store import raw_page_store
+        html_content = raw_page_store.get(url) or fetch_html(url)
     if not html_content:
         return False
     
-    soup = BeautifulSoup(html_content, 'html.parser')
-    
-    # Créer des règles pour ce domaine
-    new_rules = {}
-    
-    # Trouver des sélecteurs pour le titre
-    if title and title != "Titre non trouvé":
-        title_selectors = find_candidate_selectors(soup, title, ['h1', 'h2', 'div', 'span'], max_candidates=3)
-        if title_selectors:
-            new_rules['title'] = title_selectors
-    
-    # Trouver des sélecteurs pour la description
-    if description and description != "Description non trouvée" and len(description) > 100:
-        # Pour la description, chercher des conteneurs plus larges
-        desc_selectors = find_candidate_selectors(soup, description[:200], ['div', 'article', 'section', 'main'], max_candidates=3)
-        if desc_selectors:
-            new_rules['description'] = desc_selectors
-    
-    # Trouver des sélecteurs pour l'entreprise
-    if company and company != "Entreprise non trouvée":
-        company_selectors = find_candidate_selectors(soup, company, ['div', 'span', 'p', 'a'], max_candidates=3)
-        if company_selectors:
-            new_rules['company'] = company_selectors
-    
-    # Trouver des sélecteurs pour la localisation
-    if location and location != "Localisation non trouvée":
-        location_selectors = find_candidate_selectors(soup, location, ['div', 'span', 'p', 'li'], max_candidates=3)
-        if location_selectors:
-            new_rules['location'] = location_selectors
-    
-    # Si on a trouvé des règles, les ajouter et sauvegarder
-    if new_rules:
-        domain_rules[domain] = new_rules
-        save_domain_rules(domain_rules)
-        logging.info(f"Nouvelles règles apprises pour le domaine {domain}: {new_rules}")
-        return True
-    else:
-        logging.warning(f"Impossible d'apprendre des règles pour {domain}")
-        return False
+    extracted = {"title": title, "description_full": description, "company": company, "location": location}
+    return domain in learn_from_scraped_pages([(url, html_content, extracted)])
 
 def test_domain_rules(url, rules):
     """
@@ -206,7 +322,8 @@ def test_domain_rules(url, rules):
     if not html_content:
         return None
     
-    soup = BeautifulSoup(html_content, 'html.parser')
+    # Même analyse et mêmes sélecteurs compilés que l'extraction en production (html_extractor)
+    page = ParsedPage(html_content)
     results = {}
     
     for field, selectors in rules.items():
@@ -214,27 +331,69 @@ def test_domain_rules(url, rules):
         
         for selector in selectors:
             try:
-                element = soup.select_one(selector)
-                if element:
-                    text = element.get_text(strip=True)
-                    results[field].append({
-                        'selector': selector,
-                        'text': text[:100] + ('...' if len(text) > 100 else '')
-                    })
+                compiled = CompiledSelector(selector)
             except Exception as e:
                 logging.error(f"Erreur avec le sélecteur {selector}: {e}")
+                continue
+            text = page.select_text([compiled])
+            if text:
+                results[field].append({
+                    'selector': selector,
+                    'text': text[:100] + ('...' if len(text) > 100 else '')
+                })
     
     return results
 
-def suggest_domain_rules_improvements(domain):
+def suggest_domain_rules_improvements(domain, max_pages: int = 50, min_support: float = 0.5):
     """
     Suggère des améliorations pour les règles d'un domaine spécifique
-    en utilisant des URL récemment scrapées.
+    en utilisant des URL récemment scrapées : les pages brutes stockées (page_store) sont comparées
+    aux offres enregistrées en base pour ces URLs, et les sélecteurs qui fonctionnent sur le plus
+    de pages sont proposés. Retourne {champ: {"current", "suggested", "support"}} pour les champs
+    dont la suggestion diffère des règles actuelles.
     """
-    # Cette fonction pourrait utiliser des techniques plus avancées
-    # comme comparer plusieurs pages d'offres du même site pour
-    # identifier des patterns communs
-    pass
+    # Imports différés : base des offres et pages brutes ne sont utiles qu'à cette analyse
+    from page_store import raw_page_store
+    from database_manager import iter_offers
+    from scraper_utils import domain_rules
+
+    entries = [entry for entry in raw_page_store.list_entries(f"%{domain}%") if get_domain(entry["url"]) == domain]
+    entries.sort(key=lambda entry: entry["fetched_at"] or 0, reverse=True)
+    entries = entries[:max_pages]
+    if not entries:
+        logging.info(f"Aucune page stockée pour {domain} : pas de suggestion possible.")
+        return {}
+
+    offers = {
+        offer.url: offer
+        for offer in iter_offers(('url', 'original_title', 'original_description', 'company', 'location'),
+                                 urls=[entry["url"] for entry in entries])
+    }
+    samples = []
+    for entry in entries:
+        offer = offers.get(entry["url"])
+        html_content = raw_page_store.get(entry["url"]) if offer is not None else None
+        if html_content:
+            samples.append(_learning_sample(entry["url"], html_content, {
+                "title": offer.get('original_title'),
+                "description_full": offer.get('original_description'),
+                "company": offer.get('company'),
+                "location": offer.get('location'),
+            }))
+
+    current_rules = domain_rules.rules().get(domain, {})
+    suggestions = {}
+    for field, scored in rank_domain_selectors(samples, min_support).items():
+        best = scored[:3]
+        suggested = [selector for selector, _, _ in best]
+        if suggested != current_rules.get(field, [])[:len(suggested)]:
+            suggestions[field] = {
+                "current": current_rules.get(field, []),
+                "suggested": suggested,
+                "support": {selector: f"{verified}/{total}" for selector, verified, total in best},
+            }
+    logging.info(f"Suggestions pour {domain} ({len(samples)} pages analysées) : {suggestions or 'aucune'}")
+    return suggestions
 
 def import_rules_from_scraper_utils():
     """
@@ -274,6 +433,7 @@ def export_rules_to_scraper_utils():
     """
     Exporte les règles du fichier JSON vers un format
     utilisable dans scraper_utils.py.
+    Inutile pour l'extraction : le registre de scraper_utils lit déjà le fichier JSON et le recharge à chaud.
     """
     rules = load_domain_rules()
     if not rules:
@@ -1,12 +1,14 @@
 from duckduckgo_search import DDGS
-from config import DDG_MAX_RESULTS
-from scraper_utils import scrape_job_page, add_domain_rules
-from database_manager import add_job_offer_to_db, load_job_offers_from_db
+from config import DDG_MAX_RESULTS, SCRAPE_MAX_WORKERS
+from scraper_utils import scrape_job_page, fetch_job_page, add_domain_rules
+from scrape_pipeline import ScrapePipeline
+from database_manager import add_job_offers_to_db, filter_new_urls
 import logging
 import re
 import time
-import random
 from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from crawl_scheduler import get_scheduler
 
 # Configuration du logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -103,11 +105,81 @@ def extract_domain(url):
     except:
         return None
 
+def scrape_urls_politely(urls_grouped_by_domain: dict, max_workers: int = SCRAPE_MAX_WORKERS,
+                         page_function=scrape_job_page):
+    """
+    Scrape des URLs regroupées par domaine en entrelaçant les domaines.
+    Au lieu de dormir, la boucle interroge l'ordonnanceur partagé : chaque URL est lancée dès que
+    son domaine a un jeton disponible (une seule requête en vol par domaine), pendant que les
+    autres domaines continuent d'avancer. Génère des couples (url_info, résultat de `page_function`)
+    au fil des pages terminées ; avec page_function=fetch_job_page, les threads ne font que télécharger.
+    Tant que le consommateur n'a pas repris le générateur, aucune nouvelle page n'est lancée.
+    """
+    scheduler = get_scheduler()
+    pending = {domain: list(domain_urls) for domain, domain_urls in urls_grouped_by_domain.items() if domain_urls}
+    in_flight = {}  # future -> (domain, url_info)
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="scraper") as executor:
+        while pending or in_flight:
+            busy_domains = {domain for domain, _ in in_flight.values()}
+            for domain in list(pending):
+                if len(in_flight) >= max_workers:
+                    break
+                if domain in busy_domains or not scheduler.try_acquire(domain):
+                    continue
+                url_info = pending[domain].pop(0)
+                if not pending[domain]:
+                    del pending[domain]
+                future = executor.submit(page_function, url_info['url'], polite_delay=False)
+                in_flight[future] = (domain, url_info)
+                busy_domains.add(domain)
+
+            # Attendre la fin d'une page ou le prochain domaine éligible, sans bloquer les autres
+            timeout = None
+            waiting_domains = [domain for domain in pending if domain not in busy_domains]
+            if waiting_domains and len(in_flight) < max_workers:
+                next_time = min(scheduler.next_eligible_time(domain) for domain in waiting_domains)
+                timeout = max(next_time - time.monotonic(), 0.01)
+            if not in_flight:
+                time.sleep(timeout or 0.01)
+                continue
+
+            done, _ = wait(in_flight, timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                _, url_info = in_flight.pop(future)
+                try:
+                    scraped_data = future.result()
+                except Exception as e:
+                    logging.error(f"Erreur inattendue lors du scraping de {url_info['url']}: {e}")
+                    scraped_data = None
+                yield url_info, scraped_data
+
+def _flush_scraped_offers(scraped_offers: list) -> int:
+    """Insère un lot d'offres scrapées en une transaction. Retourne le nombre d'offres ajoutées."""
+    if not scraped_offers:
+        return 0
+    added_count = add_job_offers_to_db(scraped_offers)
+    if added_count < len(scraped_offers):
+        logging.info(f"{len(scraped_offers) - added_count} offre(s) non ajoutée(s) (doublon ou offre invalide).")
+    return added_count
+
+def _prepare_scraped_offer(url_info: dict, scraped_data: dict):
+    """Offre à insérer pour une page scrapée (complétée par le résultat de recherche), ou None si échec."""
+    if not scraped_data or scraped_data.get("title") == "Erreur de scraping":
+        logging.warning(f"Échec du scraping pour l'URL : {url_info['url']}")
+        return None
+    # Si nous avons des infos de titre/snippet de DuckDuckGo, les utiliser si besoin
+    if scraped_data.get("title") == "Titre non trouvé" and url_info.get('title'):
+        scraped_data["title"] = url_info['title']
+    return scraped_data
+
 def search_and_scrape_jobs(query=None, job_title=None, skills=None, location=None, 
-                          experience=None, region="fr-fr", max_results=None):
+                          experience=None, region="fr-fr", max_results=None, progress_callback=None):
     """
     Recherche des offres d'emploi sur DuckDuckGo, les scrape, et les ajoute à la DB.
     Peut prendre soit une requête directe, soit des composants pour construire la requête.
+    `progress_callback(urls_done, urls_total, offers_added)` est appelé au fil des pages traitées
+    (utilisé par les tâches de scraping en arrière-plan).
     Retourne le nombre de nouvelles offres ajoutées.
     """
     # Si aucune requête directe n'est fournie, en construire une
@@ -166,44 +238,43 @@ def search_and_scrape_jobs(query=None, job_title=None, skills=None, location=Non
         logging.error(f"Erreur durant la recherche DuckDuckGo : {e}")
         return 0
 
-    # Charger les offres existantes pour éviter les doublons
-    current_offers_in_db = load_job_offers_from_db()
+    # Écarter en une seule requête les URLs déjà présentes dans la base (avant tout téléchargement)
+    new_urls = set(filter_new_urls([url_info['url'] for url_info in urls_to_scrape]))
     new_offers_added_count = 0
     
-    # Trier les URLs par domaine pour regrouper les scraping par site
+    # Regrouper les URLs par domaine : les domaines sont entrelacés et scrapés en parallèle,
+    # chaque domaine étant limité par son seau à jetons (crawl_scheduler)
     urls_to_scrape.sort(key=lambda x: x['domain'] if x['domain'] else '')
-    
+    urls_grouped_by_domain = {}
     for i, url_info in enumerate(urls_to_scrape):
         url = url_info['url']
-        domain = url_info['domain']
-        
         logging.info(f"Traitement de l'URL {i+1}/{len(urls_to_scrape)}: {url}")
         
         # Vérifier si l'URL est déjà dans la base
-        if any(offer.get('url') == url for offer in current_offers_in_db):
+        if url not in new_urls:
             logging.info(f"URL déjà présente dans la base de données. Ignorée.")
             continue
-        
-        # Ajouter un délai aléatoire entre les requêtes pour éviter d'être bloqué
-        if i > 0:
-            time.sleep(random.uniform(2, 5))
-        
-        # Scraper l'URL
-        scraped_data = scrape_job_page(url)
-        
-        # Vérifier si le scraping a réussi
-        if scraped_data and scraped_data.get("title") != "Erreur de scraping":
-            # Si nous avons des infos de titre/snippet de DuckDuckGo, les utiliser si besoin
-            if scraped_data.get("title") == "Titre non trouvé" and url_info.get('title'):
-                scraped_data["title"] = url_info['title']
-            
-            if add_job_offer_to_db(scraped_data, current_offers_in_db):
-                new_offers_added_count += 1
-                logging.info(f"Offre ajoutée : {scraped_data.get('title')}")
-            else:
-                logging.info("L'offre n'a pas été ajoutée (peut-être un doublon de contenu).")
-        else:
-            logging.warning(f"Échec du scraping pour l'URL : {url}")
+        new_urls.discard(url)  # Une même URL renvoyée deux fois par la recherche n'est scrapée qu'une fois
+        urls_grouped_by_domain.setdefault(url_info['domain'] or '', []).append(url_info)
+
+    if not urls_grouped_by_domain:
+        logging.info("Aucune nouvelle URL à scraper.")
+        return 0
+
+    urls_total = sum(len(domain_urls) for domain_urls in urls_grouped_by_domain.values())
+    if progress_callback:
+        progress_callback(0, urls_total, new_offers_added_count)
+
+    max_workers = min(SCRAPE_MAX_WORKERS, len(urls_grouped_by_domain))
+    logging.info(f"Scraping de {len(urls_grouped_by_domain)} domaines avec {max_workers} workers en parallèle.")
+    
+    # Téléchargement (threads) -> extraction (processus) -> insertion en base par lots, avec contre-pression
+    pipeline = ScrapePipeline(write_batch=_flush_scraped_offers, prepare_offer=_prepare_scraped_offer)
+    new_offers_added_count = pipeline.run(
+        scrape_urls_politely(urls_grouped_by_domain, max_workers, page_function=fetch_job_page),
+        urls_total=urls_total,
+        progress_callback=progress_callback,
+    )
     
     logging.info(f"{new_offers_added_count} nouvelles offres ajoutées à la base de données.")
     return new_offers_added_count
@@ -0,0 +1,125 @@
+# /mon_agent_reco_emploi/embedding_cache.py
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+import numpy as np
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+def embedding_cache_key(model_name: str, text: str) -> str:
+    """Clé de cache : empreinte SHA-256 du nom du modèle et du texte nettoyé."""
+    return hashlib.sha256(f"{model_name}\0{text}".encode('utf-8')).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Cache des embeddings indexé par le contenu du texte.
+    Un LRU en mémoire évite les accès disque pour les textes fréquents ; les autres sont
+    conservés dans une base SQLite et survivent aux redémarrages. Les entrées sont versionnées
+    par nom de modèle : changer SENTENCE_TRANSFORMER_MODEL invalide naturellement le cache.
+    """
+
+    def __init__(self, db_path: str, model_name: str, max_memory_items: int = 10000):
+        self.db_path = db_path
+        self.model_name = model_name
+        self.max_memory_items = max_memory_items
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _get_conn(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS embeddings (
+                    key TEXT PRIMARY KEY,
+                    model TEXT,
+                    dtype TEXT,
+                    vector BLOB
+                )
+            ''')
+            self._conn.commit()
+        return self._conn
+
+    def _remember(self, key: str, vector: np.ndarray):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_items:
+            self._memory.popitem(last=False)
+
+    def get_many(self, texts: list) -> dict:
+        """Retourne {texte: embedding} pour les textes présents dans le cache."""
+        keys = {embedding_cache_key(self.model_name, text): text for text in texts}
+        found = {}
+        with self._lock:
+            missing_keys = []
+            for key, text in keys.items():
+                if key in self._memory:
+                    self._memory.move_to_end(key)
+                    found[text] = self._memory[key]
+                else:
+                    missing_keys.append(key)
+
+            if missing_keys:
+                try:
+                    conn = self._get_conn()
+                    for start in range(0, len(missing_keys), 900):
+                        chunk = missing_keys[start:start + 900]
+                        placeholders = ", ".join("?" * len(chunk))
+                        rows = conn.execute(
+                            f"SELECT key, dtype, vector FROM embeddings WHERE model = ? AND key IN ({placeholders})",
+                            [self.model_name] + chunk
+                        ).fetchall()
+                        for key, dtype_name, blob in rows:
+                            vector = np.frombuffer(blob, dtype=np.dtype(dtype_name))
+                            self._remember(key, vector)
+                            found[keys[key]] = vector
+                except sqlite3.Error as e:
+                    logging.error(f"Erreur de lecture du cache d'embeddings : {e}")
+        return found
+
+    def get(self, text: str):
+        """Retourne l'embedding en cache pour `text`, ou None."""
+        return self.get_many([text]).get(text)
+
+    def put_many(self, embeddings_by_text: dict):
+        """Ajoute des embeddings au cache (mémoire et disque, en une transaction)."""
+        if not embeddings_by_text:
+            return
+        rows = []
+        with self._lock:
+            for text, embedding in embeddings_by_text.items():
+                vector = np.array(embedding, dtype=np.float32)
+                vector.flags.writeable = False  # Partagé entre appelants : lecture seule
+                key = embedding_cache_key(self.model_name, text)
+                self._remember(key, vector)
+                rows.append((key, self.model_name, vector.dtype.name, vector.tobytes()))
+            try:
+                conn = self._get_conn()
+                with conn:
+                    conn.executemany(
+                        "INSERT OR REPLACE INTO embeddings (key, model, dtype, vector) VALUES (?, ?, ?, ?)",
+                        rows
+                    )
+            except sqlite3.Error as e:
+                logging.error(f"Erreur d'écriture dans le cache d'embeddings : {e}")
+
+    def put(self, text: str, embedding):
+        self.put_many({text: embedding})
+
+    def purge_other_models(self) -> int:
+        """Supprime du disque les embeddings calculés avec un autre modèle. Retourne le nombre supprimé."""
+        with self._lock:
+            try:
+                conn = self._get_conn()
+                with conn:
+                    cursor = conn.execute("DELETE FROM embeddings WHERE model != ?", (self.model_name,))
+                return cursor.rowcount
+            except sqlite3.Error as e:
+                logging.error(f"Erreur lors de la purge du cache d'embeddings : {e}")
+                return 0
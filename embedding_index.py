@@ -0,0 +1,451 @@
+# /mon_agent_reco_emploi/embedding_index.py
+import threading
+import logging
+import time
+import numpy as np
+from config import (
+    ANN_BACKEND, ANN_MIN_OFFERS, ANN_SAVE_EVERY, ANN_MIN_RECALL, ANN_RECALL_K, ANN_RECALL_SAMPLE,
+    EMBEDDING_STORE_REFRESH_SECONDS,
+)
+from ann_index import create_ann_index
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Capacité initiale de la matrice (elle double ensuite quand elle est pleine)
+INITIAL_CAPACITY = 1024
+# Nombre de requêtes scorées ensemble par search_batch (taille du bloc de la matrice de scores)
+BATCH_QUERY_CHUNK = 256
+
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """
+    Indices des `k` meilleurs scores, triés par score décroissant.
+    np.argpartition sélectionne les gagnants en O(N) : seuls ces k éléments sont ensuite triés.
+    """
+    k = min(k, scores.shape[-1])
+    if k <= 0:
+        return np.empty(scores.shape[:-1] + (0,), dtype=np.int64)
+    if k < scores.shape[-1]:
+        candidates = np.argpartition(scores, -k, axis=-1)[..., -k:]
+    else:
+        candidates = np.broadcast_to(np.arange(scores.shape[-1]), scores.shape).copy()
+    candidate_scores = np.take_along_axis(scores, candidates, axis=-1)
+    order = np.argsort(-candidate_scores, axis=-1)
+    return np.take_along_axis(candidates, order, axis=-1)
+
+
+def measure_ann_recall(ann, matrix: np.ndarray, k: int = ANN_RECALL_K, sample_size: int = ANN_RECALL_SAMPLE,
+                       seed: int = 0) -> float:
+    """
+    Rappel moyen (recall@k) de l'index approché `ann` contre la recherche exacte sur `matrix`.
+    Les requêtes sont des lignes tirées au hasard et bruitées (similarité ~0.9 avec leur ligne d'origine) :
+    une ligne exacte de l'index se retrouverait trop facilement et surestimerait le rappel.
+    """
+    n_rows, dim = matrix.shape
+    k = min(k, n_rows)
+    if k == 0:
+        return 1.0
+    rng = np.random.default_rng(seed)
+    rows = rng.choice(n_rows, min(sample_size, n_rows), replace=False)
+    queries = matrix[rows] + rng.normal(scale=0.5 / np.sqrt(dim), size=(len(rows), dim)).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    exact = top_k_indices(queries @ matrix.T, k)
+    hits = 0
+    for query, expected in zip(queries, exact):
+        row_ids, scores = ann.search(matrix, query, k)
+        found = row_ids[top_k_indices(scores, k)] if len(row_ids) else row_ids
+        hits += len(np.intersect1d(found, expected))
+    return hits / (len(rows) * k)
+
+
+def normalize_embedding(embedding) -> np.ndarray:
+    """Convertit un embedding en vecteur float32 de norme 1 (None si invalide)."""
+    if embedding is None:
+        return None
+    vector = np.asarray(embedding, dtype=np.float32).reshape(-1)
+    if vector.size == 0:
+        return None
+    norm = np.linalg.norm(vector)
+    if not np.isfinite(norm) or norm == 0:
+        return None
+    return vector / norm
+
+
+def _offer_metadata(offer):
+    """Métadonnées conservées par l'index : l'offre sans son embedding (dictionnaire ou OfferRecord)."""
+    if isinstance(offer, dict):
+        return {key: value for key, value in offer.items() if key != 'embedding'}
+    return offer.without_embedding()
+
+
+class EmbeddingIndex:
+    """
+    Index en mémoire des embeddings de titres des offres.
+    La matrice est stockée en float32 et pré-normalisée : la similarité cosinus
+    avec une requête se réduit donc à un simple produit matrice-vecteur.
+    """
+
+    def __init__(self, ann_backend: str = "brute", persist_path: str = None,
+                 store_refresh_interval: float = EMBEDDING_STORE_REFRESH_SECONDS):
+        self._lock = threading.RLock()
+        self.ann_backend = ann_backend
+        self.persist_path = persist_path  # Chemin de base de l'index ANN sauvegardé (sans extension)
+        self._ann = None
+        self._ann_unsaved = 0
+        self._ann_retry_size = 0  # Après un rappel insuffisant : taille à atteindre avant un nouvel essai
+        self._matrix = None  # Matrice (capacité, dim), seules les `_size` premières lignes sont valides
+        self._size = 0
+        self._dim = None
+        self._offers = []  # Métadonnées des offres (sans l'embedding), alignées sur les lignes
+        self._urls = set()
+        self._store = None  # EmbeddingMatrixStore si la matrice est un memmap partagé entre processus
+        self._store_generation = None
+        self._metadata_loader = None
+        self.store_refresh_interval = store_refresh_interval
+        self._next_store_check = 0.0
+        self.is_built = False
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def dim(self):
+        return self._dim
+
+    def clear(self):
+        """Vide l'index et le marque comme non construit."""
+        with self._lock:
+            self._matrix = None
+            self._size = 0
+            self._dim = None
+            self._offers = []
+            self._urls = set()
+            self._ann = None
+            self._ann_unsaved = 0
+            self._ann_retry_size = 0
+            self._store = None
+            self._store_generation = None
+            self._metadata_loader = None
+            self.is_built = False
+
+    def build(self, offers):
+        """(Re)construit entièrement l'index à partir d'offres (liste ou générateur, dictionnaires ou OfferRecord)."""
+        with self._lock:
+            self.clear()
+            for offer in offers:
+                self._add_unlocked(offer, offer.get('embedding'))
+            self._prepare_ann()
+            self.is_built = True
+        logging.info(f"Index d'embeddings construit : {self._size} offres (dimension {self._dim}).")
+
+    def build_from_store(self, store, metadata_loader):
+        """
+        Construit l'index sur la matrice memmap partagée de `store` (aucune copie privée des vecteurs).
+        `metadata_loader(urls)` retourne {url: métadonnées} pour les lignes de la matrice.
+        """
+        with self._lock:
+            self.clear()
+            matrix, urls, manifest = store.open()
+            self._attach_store_rows(matrix, urls, metadata_loader(urls), start=0)
+            self._dim = manifest["dim"]
+            self._store = store
+            self._store_generation = manifest["generation"]
+            self._metadata_loader = metadata_loader
+            self._next_store_check = time.monotonic() + self.store_refresh_interval
+            self._prepare_ann()
+            self.is_built = True
+        logging.info(f"Index d'embeddings ouvert sur la matrice partagée : {self._size} offres (dimension {self._dim}).")
+
+    def _attach_store_rows(self, matrix, urls: list, metadata_by_url: dict, start: int):
+        """Adopte la matrice memmap et les métadonnées des lignes à partir de `start`."""
+        for url in urls[start:]:
+            # Offre supprimée de la base depuis l'ajout de sa ligne : ligne conservée jusqu'au compactage
+            self._offers.append(metadata_by_url.get(url) or {'url': url})
+            self._urls.add(url)
+        self._matrix = matrix
+        self._size = len(urls)
+
+    def _refresh_from_store(self) -> int:
+        """Rattrape les lignes ajoutées à la matrice partagée (par ce processus ou un autre)."""
+        matrix, urls, manifest = self._store.open()
+        if manifest["generation"] != self._store_generation:
+            # Matrice compactée : les numéros de ligne ont changé, on reconstruit
+            self.build_from_store(self._store, self._metadata_loader)
+            return self._size
+        start = self._size
+        if len(urls) <= start:
+            return 0
+        self._attach_store_rows(matrix, urls, self._metadata_loader(urls[start:]), start)
+        if self._dim is None:
+            self._dim = manifest["dim"]
+        if self._ann is not None:
+            self._ann.add(np.arange(start, self._size), self._matrix[start:self._size])
+            self._ann_unsaved += self._size - start
+            if self._ann_unsaved >= ANN_SAVE_EVERY:
+                self._save_ann()
+        else:
+            self._prepare_ann()
+        return self._size - start
+
+    def _ensure_store_current(self):
+        """
+        Côté lecteur (appelé par search et search_batch, verrou tenu) : au plus une fois par
+        `store_refresh_interval` secondes, compare le manifeste de la matrice partagée à la vue de l'index.
+        Nouvelle génération (compactage) : la matrice est rouverte ; lignes ajoutées : seule la fin est rattachée.
+        """
+        if self._store is None or time.monotonic() < self._next_store_check:
+            return
+        self._next_store_check = time.monotonic() + self.store_refresh_interval
+        manifest = self._store.read_manifest()
+        if manifest["generation"] == self._store_generation and manifest["count"] == self._size:
+            return
+        try:
+            self._refresh_from_store()
+        except Exception as e:
+            # Vue précédente conservée : nouvelle tentative à la prochaine vérification
+            logging.error(f"Impossible de rafraîchir l'index depuis la matrice partagée : {e}")
+
+    def add(self, offer: dict, embedding=None) -> bool:
+        """
+        Ajoute une offre à l'index. Retourne False si elle est ignorée.
+        Sur une matrice partagée, la ligne doit déjà avoir été ajoutée au store : l'index la rattrape.
+        """
+        if embedding is None:
+            embedding = offer.get('embedding')
+        with self._lock:
+            if self._store is not None:
+                if offer.get('url') in self._urls:
+                    return False
+                self._refresh_from_store()
+                return offer.get('url') in self._urls
+            if not self._add_unlocked(offer, embedding):
+                return False
+            row_id = self._size - 1
+            if self._ann is not None:
+                self._ann.add(row_id, self._matrix[row_id])
+                self._ann_unsaved += 1
+                if self._ann_unsaved >= ANN_SAVE_EVERY:
+                    self._save_ann()
+            elif self.is_built:
+                # Le seuil de l'index approché peut être franchi par des insertions incrémentales
+                self._prepare_ann()
+            return True
+
+    def _add_unlocked(self, offer: dict, embedding) -> bool:
+        url = offer.get('url')
+        if url in self._urls:
+            return False
+
+        vector = normalize_embedding(embedding)
+        if vector is None:
+            logging.warning(f"Offre sans embedding de titre valide ignorée : {url or 'URL inconnue'}")
+            return False
+
+        if self._dim is None:
+            self._dim = vector.shape[0]
+        elif vector.shape[0] != self._dim:
+            logging.warning(
+                f"Offre avec embedding de dimension incorrecte ignorée : {url or 'URL inconnue'}. "
+                f"Dim attendue: {self._dim}, Dim trouvée: {vector.shape[0]}"
+            )
+            return False
+
+        self._ensure_capacity(self._size + 1)
+        self._matrix[self._size] = vector
+        self._size += 1
+
+        # On ne garde pas l'embedding dans les métadonnées : il vit dans la matrice
+        self._offers.append(_offer_metadata(offer))
+        if url:
+            self._urls.add(url)
+        return True
+
+    def _prepare_ann(self):
+        """Charge (ou entraîne) l'index approché si le catalogue est assez grand."""
+        if self._size < max(ANN_MIN_OFFERS, self._ann_retry_size):
+            return
+        ann = create_ann_index(self.ann_backend)
+        if ann is None:
+            return
+
+        urls = [offer.get('url') for offer in self._offers]
+        stored_urls = None
+        if self.persist_path:
+            try:
+                stored_urls = ann.load(self.persist_path, dim=self._dim)
+            except Exception as e:
+                logging.warning(f"Impossible de charger l'index ANN sauvegardé ({self.persist_path}) : {e}")
+
+        if stored_urls is not None and 0 < len(stored_urls) <= self._size and urls[:len(stored_urls)] == stored_urls:
+            # Index sauvegardé cohérent : on n'indexe que les lignes ajoutées depuis
+            if len(stored_urls) < self._size:
+                ann.add(np.arange(len(stored_urls), self._size), self._matrix[len(stored_urls):self._size])
+            logging.info(f"Index ANN ({ann.backend_name}) rechargé depuis {self.persist_path}.")
+        else:
+            ann.train(self._matrix[:self._size])
+        if not self._check_ann_recall(ann):
+            # Pas de nouvel entraînement à chaque insertion : nouvel essai quand le catalogue aura doublé
+            self._ann = None
+            self._ann_retry_size = 2 * self._size
+            return
+        self._ann = ann
+        self._save_ann()
+
+    def _check_ann_recall(self, ann) -> bool:
+        """
+        Mesure le rappel de l'index approché contre la recherche exacte et élargit son exploration
+        tant qu'il est sous ANN_MIN_RECALL. Retourne False si le rappel reste insuffisant (recherche exacte).
+        """
+        matrix = self._matrix[:self._size]
+        recall = measure_ann_recall(ann, matrix)
+        while recall < ANN_MIN_RECALL and ann.widen_search():
+            recall = measure_ann_recall(ann, matrix)
+        if recall < ANN_MIN_RECALL:
+            logging.warning(
+                f"Rappel de l'index {ann.backend_name} insuffisant (recall@{ANN_RECALL_K} = {recall:.3f} < {ANN_MIN_RECALL}) : "
+                f"recherche exacte conservée."
+            )
+            return False
+        logging.info(f"Index {ann.backend_name} activé : recall@{ANN_RECALL_K} = {recall:.3f} contre la recherche exacte.")
+        return True
+
+    def _save_ann(self):
+        self._ann_unsaved = 0
+        if not self.persist_path or self._ann is None:
+            return
+        try:
+            self._ann.save(self.persist_path, [offer.get('url') for offer in self._offers])
+        except Exception as e:
+            logging.error(f"Erreur lors de la sauvegarde de l'index ANN : {e}")
+
+    def save(self):
+        """Sauvegarde l'index ANN sur disque (s'il existe)."""
+        with self._lock:
+            self._save_ann()
+
+    def _ensure_capacity(self, required: int):
+        if self._matrix is None:
+            capacity = max(INITIAL_CAPACITY, required)
+            self._matrix = np.empty((capacity, self._dim), dtype=np.float32)
+        elif required > self._matrix.shape[0]:
+            capacity = max(required, self._matrix.shape[0] * 2)
+            grown = np.empty((capacity, self._dim), dtype=np.float32)
+            grown[:self._size] = self._matrix[:self._size]
+            self._matrix = grown
+
+    def search(self, query_embedding, top_n: int) -> list:
+        """
+        Retourne les `top_n` offres les plus proches de `query_embedding`
+        sous forme de liste de couples (métadonnées de l'offre, score cosinus).
+        """
+        query = normalize_embedding(query_embedding)
+        if query is None:
+            logging.warning("Embedding de requête invalide. Aucune recherche possible.")
+            return []
+
+        with self._lock:
+            self._ensure_store_current()
+            if self._size == 0:
+                return []
+            if query.shape[0] != self._dim:
+                logging.error(
+                    f"Dimension de l'embedding de requête incorrecte. "
+                    f"Attendu: {self._dim}, Obtenu: {query.shape[0]}."
+                )
+                return []
+            # Vue sur les lignes valides : pas de copie de la matrice
+            matrix = self._matrix[:self._size]
+            if self._ann is not None:
+                # Recherche approchée : seuls les candidats de l'index ANN sont évalués
+                row_ids, scores = self._ann.search(matrix, query, top_n)
+            else:
+                row_ids, scores = None, matrix @ query
+            offers = self._offers
+
+        sorted_indices = top_k_indices(scores, top_n)
+        if row_ids is not None:
+            return [(offers[row_ids[idx]], float(scores[idx])) for idx in sorted_indices]
+        return [(offers[idx], float(scores[idx])) for idx in sorted_indices]
+
+    def search_batch(self, query_embeddings, top_n: int) -> list:
+        """
+        Recherche groupée : pour chaque requête, les `top_n` offres les plus proches.
+        Sans index approché, les scores d'un lot de requêtes sont obtenus par un seul
+        produit matrice-matrice (par blocs de BATCH_QUERY_CHUNK requêtes pour borner la mémoire).
+        Retourne une liste (une entrée par requête) de listes de couples (offre, score).
+        """
+        queries = np.atleast_2d(np.asarray(query_embeddings, dtype=np.float32))
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        valid = (norms[:, 0] > 0) & np.isfinite(norms[:, 0])
+        queries = np.divide(queries, norms, out=np.zeros_like(queries), where=norms > 0)
+        results = [[] for _ in range(queries.shape[0])]
+
+        with self._lock:
+            self._ensure_store_current()
+            if self._size == 0:
+                return results
+            if queries.shape[1] != self._dim:
+                logging.error(
+                    f"Dimension des embeddings de requête incorrecte. "
+                    f"Attendu: {self._dim}, Obtenu: {queries.shape[1]}."
+                )
+                return results
+            matrix = self._matrix[:self._size]
+            offers = self._offers
+
+            if self._ann is not None:
+                for q in np.flatnonzero(valid):
+                    row_ids, scores = self._ann.search(matrix, queries[q], top_n)
+                    results[q] = [(offers[row_ids[idx]], float(scores[idx])) for idx in top_k_indices(scores, top_n)]
+                return results
+
+            for start in range(0, queries.shape[0], BATCH_QUERY_CHUNK):
+                chunk = queries[start:start + BATCH_QUERY_CHUNK]
+                scores = chunk @ matrix.T
+                winners = top_k_indices(scores, top_n)
+                for offset, row_winners in enumerate(winners):
+                    q = start + offset
+                    if valid[q]:
+                        results[q] = [(offers[idx], float(scores[offset, idx])) for idx in row_winners]
+        return results
+
+
+# Index partagé par tout le processus (construit à la première utilisation)
+_shared_index = EmbeddingIndex(ann_backend=ANN_BACKEND)
+_shared_index_lock = threading.Lock()
+
+
+def get_shared_index(loader=None, persist_path: str = None, builder=None) -> EmbeddingIndex:
+    """
+    Retourne l'index partagé du processus. S'il n'est pas encore construit,
+    il est construit une seule fois à partir des offres renvoyées par `loader`
+    (ou par `builder(index)`, ex: ouverture de la matrice memmap partagée).
+    `persist_path` indique où sauvegarder/recharger l'index ANN.
+    """
+    if not _shared_index.is_built and (loader is not None or builder is not None):
+        with _shared_index_lock:
+            if not _shared_index.is_built:
+                _shared_index.persist_path = persist_path
+                if builder is not None:
+                    builder(_shared_index)
+                else:
+                    _shared_index.build(loader())
+    return _shared_index
+
+
+def add_offer_to_shared_index(offer: dict, embedding=None) -> bool:
+    """
+    Met à jour incrémentalement l'index partagé après une insertion en base.
+    Sans effet tant que l'index n'a pas été construit (il le sera depuis la base).
+    """
+    # Le verrou évite de perdre une offre insérée pendant une construction en cours
+    with _shared_index_lock:
+        if not _shared_index.is_built:
+            return False
+        return _shared_index.add(offer, embedding)
+
+
+def reset_shared_index():
+    """Invalide l'index partagé ; il sera reconstruit à la prochaine utilisation."""
+    with _shared_index_lock:
+        _shared_index.clear()
@@ -0,0 +1,236 @@
+# /mon_agent_reco_emploi/embedding_store.py
+import json
+import logging
+import os
+import threading
+from contextlib import contextmanager
+import numpy as np
+
+try:
+    import fcntl  # Verrou entre processus (workers gunicorn) ; absent sous Windows
+except ImportError:
+    fcntl = None
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+EMBEDDING_STORE_DTYPE = np.float32
+
+
+def _fsync_file(f):
+    f.flush()
+    os.fsync(f.fileno())
+
+
+class EmbeddingMatrixStore:
+    """
+    Matrice d'embeddings (float32, normalisés) stockée à côté de la base SQLite et ouverte par np.memmap :
+    tous les processus qui la lisent partagent la même copie dans le cache de pages du système.
+
+    Fichiers (pour le chemin de base "data/job_offers") :
+      - data/job_offers.embeddings.json      : manifeste (dimension, nombre de lignes, génération)
+      - data/job_offers.embeddings.<g>.f32   : lignes de la matrice, en binaire brut
+      - data/job_offers.embeddings.<g>.urls  : URL de chaque ligne (une par ligne, même ordre)
+      - data/job_offers.embeddings.lock      : verrou des écrivains
+    Les ajouts écrivent d'abord les données (fsync) puis remplacent le manifeste atomiquement :
+    un lecteur ne voit jamais que des lignes complètes. Le compactage réécrit une nouvelle génération.
+    """
+
+    def __init__(self, base_path: str):
+        self.base_path = base_path
+        self.manifest_path = f"{base_path}.embeddings.json"
+        self.lock_path = f"{base_path}.embeddings.lock"
+        self._thread_lock = threading.Lock()
+        self._urls_cache = (None, 0, 0, [])  # (génération, nombre de lignes lues, octets lus, URLs)
+
+    def _data_path(self, generation: int) -> str:
+        return f"{self.base_path}.embeddings.{generation}.f32"
+
+    def _urls_path(self, generation: int) -> str:
+        return f"{self.base_path}.embeddings.{generation}.urls"
+
+    @contextmanager
+    def _write_lock(self):
+        """Exclusion des écrivains : entre threads (verrou) et entre processus (flock)."""
+        with self._thread_lock:
+            if fcntl is None:
+                yield
+                return
+            os.makedirs(os.path.dirname(self.lock_path) or ".", exist_ok=True)
+            with open(self.lock_path, "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def read_manifest(self) -> dict:
+        """Manifeste courant ({"dim", "count", "generation", "urls_bytes"}), ou un manifeste vide."""
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {"dim": None, "count": 0, "generation": 0, "urls_bytes": 0}
+
+    def _write_manifest(self, manifest: dict):
+        tmp_path = f"{self.manifest_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+            _fsync_file(f)
+        os.replace(tmp_path, self.manifest_path)  # Atomique : l'ancien ou le nouveau manifeste, jamais un mélange
+
+    def _read_urls(self, manifest: dict) -> list:
+        """
+        URLs des `count` premières lignes. Le résultat est gardé en cache : après un ajout, seules
+        les nouvelles lignes du fichier sont lues (à partir de l'octet mémorisé).
+        """
+        count, generation = manifest["count"], manifest["generation"]
+        cached_generation, cached_count, cached_bytes, cached_urls = self._urls_cache
+        if cached_generation != generation or cached_count > count:
+            cached_count, cached_bytes, cached_urls = 0, 0, []
+        if cached_count < count:
+            cached_urls = list(cached_urls)
+            with open(self._urls_path(generation), "rb") as f:
+                f.seek(cached_bytes)
+                while cached_count < count:
+                    line = f.readline()
+                    if not line.endswith(b"\n"):
+                        raise RuntimeError(f"Fichier d'URLs de la matrice d'embeddings incomplet : {self._urls_path(generation)}")
+                    cached_urls.append(line[:-1].decode("utf-8"))
+                    cached_bytes += len(line)
+                    cached_count += 1
+            self._urls_cache = (generation, cached_count, cached_bytes, cached_urls)
+        return cached_urls[:count] if len(cached_urls) != count else cached_urls
+
+    def open(self):
+        """
+        Ouvre la matrice en lecture seule (np.memmap, aucune copie en mémoire privée).
+        Retourne (matrice (count, dim), liste des URLs des lignes, manifeste).
+        """
+        for _ in range(3):
+            manifest = self.read_manifest()
+            count, dim, generation = manifest["count"], manifest["dim"], manifest["generation"]
+            if count == 0 or not dim:
+                return np.empty((0, dim or 0), dtype=EMBEDDING_STORE_DTYPE), [], manifest
+            try:
+                matrix = np.memmap(self._data_path(generation), dtype=EMBEDDING_STORE_DTYPE, mode="r", shape=(count, dim))
+                return matrix, list(self._read_urls(manifest)), manifest
+            except FileNotFoundError:
+                continue  # Génération remplacée par un compactage entre-temps : relire le manifeste
+        raise RuntimeError(f"Impossible d'ouvrir la matrice d'embeddings {self.base_path}")
+
+    def append(self, urls: list, vectors) -> int:
+        """
+        Ajoute des lignes (vecteurs normalisés) à la matrice. Les URLs déjà présentes sont ignorées.
+        Une éventuelle fin de fichier incomplète (ajout interrompu) est d'abord tronquée.
+        Retourne le nombre de lignes ajoutées.
+        """
+        if not urls:
+            return 0
+        vectors = np.ascontiguousarray(np.atleast_2d(vectors), dtype=EMBEDDING_STORE_DTYPE)
+        with self._write_lock():
+            manifest = self.read_manifest()
+            count, dim, generation = manifest["count"], manifest["dim"], manifest["generation"]
+            if dim is None:
+                dim = vectors.shape[1]
+            elif vectors.shape[1] != dim:
+                logging.error(f"Dimension d'embedding incorrecte pour la matrice partagée : {vectors.shape[1]} au lieu de {dim}.")
+                return 0
+
+            known_urls = set(self._read_urls(manifest)) if count else set()
+            keep = []
+            for position, url in enumerate(urls):
+                if url not in known_urls and "\n" not in url:
+                    keep.append(position)
+                    known_urls.add(url)
+            if not keep:
+                return 0
+
+            new_urls = b"".join(f"{urls[position]}\n".encode("utf-8") for position in keep)
+            row_bytes = dim * np.dtype(EMBEDDING_STORE_DTYPE).itemsize
+            urls_bytes = manifest.get("urls_bytes", 0)
+            # Les deux fichiers sont tronqués à la partie validée par le manifeste avant d'y ajouter les lignes
+            with open(self._data_path(generation), "ab") as f:
+                f.truncate(count * row_bytes)
+                f.write(vectors[keep].tobytes())
+                _fsync_file(f)
+            with open(self._urls_path(generation), "ab") as f:
+                f.truncate(urls_bytes)
+                f.write(new_urls)
+                _fsync_file(f)
+
+            self._write_manifest({"dim": dim, "count": count + len(keep), "generation": generation,
+                                  "urls_bytes": urls_bytes + len(new_urls)})
+            return len(keep)
+
+    def _write_generation(self, matrix, urls: list, keep_rows: list, manifest: dict,
+                          new_urls: list = (), new_vectors=None) -> int:
+        """
+        Écrit une nouvelle génération (lignes `keep_rows` de la matrice courante, puis les nouvelles lignes),
+        bascule le manifeste et supprime l'ancienne génération. Appelée avec le verrou des écrivains.
+        Retourne le nombre de lignes de la nouvelle génération.
+        """
+        old_generation = manifest["generation"]
+        generation = old_generation + 1
+        with open(self._data_path(generation), "wb") as f:
+            f.write(np.ascontiguousarray(matrix[keep_rows]).tobytes())
+            if new_urls:
+                f.write(new_vectors.tobytes())
+            _fsync_file(f)
+        kept_urls = b"".join(f"{url}\n".encode("utf-8") for url in [urls[row] for row in keep_rows] + list(new_urls))
+        with open(self._urls_path(generation), "wb") as f:
+            f.write(kept_urls)
+            _fsync_file(f)
+        count = len(keep_rows) + len(new_urls)
+        self._write_manifest({"dim": manifest["dim"], "count": count, "generation": generation,
+                              "urls_bytes": len(kept_urls)})
+
+        for path in (self._data_path(old_generation), self._urls_path(old_generation)):
+            try:
+                os.remove(path)  # Les memmaps encore ouverts gardent l'ancien fichier jusqu'à leur fermeture
+            except FileNotFoundError:
+                pass
+        return count
+
+    def compact(self, keep_urls) -> int:
+        """
+        Réécrit la matrice sans les lignes dont l'URL n'est plus dans `keep_urls` (offres supprimées).
+        Les données sont écrites dans une nouvelle génération de fichiers : les lecteurs qui ont encore
+        l'ancienne ouverte ne sont pas perturbés. Retourne le nombre de lignes supprimées.
+        """
+        keep_urls = set(keep_urls)
+        with self._write_lock():
+            matrix, urls, manifest = self.open()
+            keep_rows = [row for row, url in enumerate(urls) if url in keep_urls]
+            removed = len(urls) - len(keep_rows)
+            if removed == 0:
+                return 0
+            kept = self._write_generation(matrix, urls, keep_rows, manifest)
+            del matrix
+        logging.info(f"Matrice d'embeddings compactée : {removed} lignes supprimées, {kept} conservées.")
+        return removed
+
+    def replace(self, urls: list, vectors) -> int:
+        """
+        Remplace les vecteurs de `urls` (offres ré-extraites) en UNE nouvelle génération : les anciennes lignes
+        de ces URLs sont retirées et les nouvelles ajoutées en fin de matrice. Les lecteurs détectent le
+        changement de génération et rouvrent la matrice. Retourne le nombre de lignes écrites.
+        """
+        if not urls:
+            return 0
+        vectors = np.ascontiguousarray(np.atleast_2d(vectors), dtype=EMBEDDING_STORE_DTYPE)
+        # Une seule ligne par URL (la dernière fournie)
+        positions = {url: position for position, url in enumerate(urls) if "\n" not in url}
+        new_urls = list(positions)
+        with self._write_lock():
+            matrix, store_urls, manifest = self.open()
+            if manifest["dim"] is None:
+                manifest = dict(manifest, dim=vectors.shape[1])
+            elif vectors.shape[1] != manifest["dim"]:
+                logging.error(f"Dimension d'embedding incorrecte pour la matrice partagée : {vectors.shape[1]} au lieu de {manifest['dim']}.")
+                return 0
+            replaced = set(new_urls)
+            keep_rows = [row for row, url in enumerate(store_urls) if url not in replaced]
+            self._write_generation(matrix, store_urls, keep_rows, manifest, new_urls, vectors[list(positions.values())])
+            del matrix
+        logging.info(f"Matrice d'embeddings : {len(new_urls)} lignes remplacées.")
+        return len(new_urls)
@@ -1,42 +1,71 @@
 # /mon_agent_reco_emploi/groq_presenter.py
-from groq import Groq
-from config import GROQ_API_KEY, GROQ_MODEL_NAME
+from config import (
+    GROQ_API_KEY, GROQ_MODEL_NAME, GROQ_USE_STUB,
+    GROQ_CACHE_ENABLED, GROQ_CACHE_PATH, GROQ_CACHE_TTL_SECONDS, GROQ_CACHE_MAX_ITEMS,
+)
+from response_cache import ResponseCache
 import logging
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-if not GROQ_API_KEY or GROQ_API_KEY == "VOTRE_CLE_API_GROQ":
+if GROQ_USE_STUB:
+    from groq_stub import StubGroqClient
+    logging.info("Client Groq local (stub) utilisé : aucune requête réseau ne sera envoyée.")
+    client_groq = StubGroqClient()
+elif not GROQ_API_KEY or GROQ_API_KEY == "VOTRE_CLE_API_GROQ":
     logging.warning("Clé API Groq non configurée dans config.py. Le module GroqPresenter ne fonctionnera pas.")
     client_groq = None
 else:
     try:
+        from groq import Groq
         client_groq = Groq(api_key=GROQ_API_KEY)
     except Exception as e:
         logging.error(f"Erreur lors de l'initialisation du client Groq : {e}")
         client_groq = None
 
-def format_recommendations_with_groq(user_job_input_summary: str, recommended_jobs: list) -> str:
-    """
-    Utilise l'API Groq pour formater et présenter les recommandations d'offres d'emploi,
-    en soulignant que la similarité est basée sur les titres.
-    """
-    if not client_groq:
-        logging.error("Client Groq non initialisé. Impossible de formater avec Groq.")
-        # Fallback vers une présentation brute si Groq n'est pas configuré
-        raw_output = "Le service de formatage IA n'est pas disponible. Voici les recommandations brutes (similarité par titre) :\n\n"
-        if not recommended_jobs:
-            return raw_output + "Aucune recommandation trouvée."
-        for job in recommended_jobs:
-            raw_output += (f"- Titre: {job.get('original_title', 'N/A')}\n"
-                           f"  Entreprise: {job.get('company', 'N/A')}\n"
-                           f"  Lieu: {job.get('location', 'N/A')}\n"
-                           f"  Score Similarité Titre: {job.get('similarity_score_title', 0.0):.2f}\n"
-                           f"  URL: {job.get('url', 'N/A')}\n\n")
-        return raw_output
+# Présentations déjà générées, indexées par prompt normalisé et modèle (requêtes populaires servies sans appel à l'API).
+# Les réponses du stub ont leur propre modèle dans la clé : elles ne sont jamais resservies à la place du vrai modèle.
+presentation_cache_model = f"stub:{GROQ_MODEL_NAME}" if GROQ_USE_STUB else GROQ_MODEL_NAME
+presentation_cache = (
+    ResponseCache(GROQ_CACHE_PATH, presentation_cache_model, GROQ_CACHE_TTL_SECONDS, GROQ_CACHE_MAX_ITEMS)
+    if GROQ_CACHE_ENABLED else None
+)
+
+SYSTEM_PROMPT = "Vous êtes un assistant IA spécialisé dans la recommandation d'offres d'emploi. Vous soulignerez que les recommandations sont basées sur la similarité des titres des postes. Soyez concis, professionnel et engageant."
 
+
+def format_recommendations_raw(recommended_jobs: list) -> str:
+    """Présentation brute (sans IA) des recommandations, utilisée quand Groq n'est pas configuré."""
+    raw_output = "Le service de formatage IA n'est pas disponible. Voici les recommandations brutes (similarité par titre) :\n\n"
     if not recommended_jobs:
-        return "Aucune offre à formater n'a été trouvée."
+        return raw_output + "Aucune recommandation trouvée."
+    for job in recommended_jobs:
+        raw_output += (f"- Titre: {job.get('original_title', 'N/A')}\n"
+                       f"  Entreprise: {job.get('company', 'N/A')}\n"
+                       f"  Lieu: {job.get('location', 'N/A')}\n"
+                       f"  Score Similarité Titre: {job.get('similarity_score_title', 0.0):.2f}\n"
+                       f"  URL: {job.get('url', 'N/A')}\n\n")
+    return raw_output
+
+
+def format_recommendations_list(recommended_jobs: list) -> str:
+    """Liste compacte et déterministe des offres (repli, et premier affichage du mode streaming)."""
+    listing = ""
+    for job in recommended_jobs:
+        listing += (f"- Titre: {job.get('original_title', 'N/A')} (Score: {job.get('similarity_score_title', 0.0):.2f})\n"
+                    f"  Entreprise: {job.get('company', 'N/A')}, Lieu: {job.get('location', 'N/A')}\n"
+                    f"  URL: {job.get('url', 'N/A')}\n\n")
+    return listing
+
 
+def format_recommendations_fallback(recommended_jobs: list) -> str:
+    """Présentation de repli si l'appel à Groq échoue."""
+    return ("J'ai rencontré un souci en formatant les recommandations avec l'assistant IA. Voici néanmoins les offres trouvées, basées sur la similarité des titres :\n\n"
+            + format_recommendations_list(recommended_jobs))
+
+
+def build_presentation_prompt(user_job_input_summary: str, recommended_jobs: list) -> str:
+    """Prompt envoyé à Groq : entièrement déterminé par le résumé utilisateur et les offres recommandées."""
     prompt_parts = []
     prompt_parts.append(f"Bonjour ! Vous êtes un assistant expert en recrutement. Un utilisateur recherche un emploi.")
     # user_job_input_summary contient maintenant quelque chose comme "Titre de poste recherché : 'Développeur Python'"
@@ -67,41 +96,122 @@ def format_recommendations_with_groq(user_job_input_summary: str, recommended_jo
     prompt_parts.append("Adoptez un ton amical et professionnel. Utilisez des listes à puces si cela rend la lecture plus facile.")
     prompt_parts.append("Terminez par une note positive l'encourageant à explorer ces pistes.")
 
-    final_prompt = "\n".join(prompt_parts)
+    return "\n".join(prompt_parts)
+
+
+def _create_completion(final_prompt: str, stream: bool = False):
+    """Appel à l'API Groq (avec `stream=True`, retourne un itérateur de fragments)."""
+    return client_groq.chat.completions.create(
+        messages=[
+            {
+                "role": "system",
+                "content": SYSTEM_PROMPT
+            },
+            {
+                "role": "user",
+                "content": final_prompt,
+            }
+        ],
+        model=GROQ_MODEL_NAME,
+        temperature=0.6, # Un peu moins de créativité pour rester factuel
+        max_tokens=1500, # Augmenté si besoin pour des listes plus longues
+        stream=stream,
+    )
+
+
+def format_recommendations_with_groq(user_job_input_summary: str, recommended_jobs: list) -> str:
+    """
+    Utilise l'API Groq pour formater et présenter les recommandations d'offres d'emploi,
+    en soulignant que la similarité est basée sur les titres.
+    Une présentation déjà générée pour le même prompt (et le même modèle) est resservie depuis le cache.
+    """
+    if not client_groq:
+        logging.error("Client Groq non initialisé. Impossible de formater avec Groq.")
+        # Fallback vers une présentation brute si Groq n'est pas configuré
+        return format_recommendations_raw(recommended_jobs)
+
+    if not recommended_jobs:
+        return "Aucune offre à formater n'a été trouvée."
+
+    final_prompt = build_presentation_prompt(user_job_input_summary, recommended_jobs)
+
+    if presentation_cache is not None:
+        cached_response = presentation_cache.get(final_prompt)
+        if cached_response is not None:
+            logging.info("Présentation servie depuis le cache (aucun appel à Groq).")
+            return cached_response
+
     logging.info(f"Prompt envoyé à Groq (début): {final_prompt[:300]}...")
 
     try:
-        chat_completion = client_groq.chat.completions.create(
-            messages=[
-                {
-                    "role": "system",
-                    "content": "Vous êtes un assistant IA spécialisé dans la recommandation d'offres d'emploi. Vous soulignerez que les recommandations sont basées sur la similarité des titres des postes. Soyez concis, professionnel et engageant."
-                },
-                {
-                    "role": "user",
-                    "content": final_prompt,
-                }
-            ],
-            model=GROQ_MODEL_NAME,
-            temperature=0.6, # Un peu moins de créativité pour rester factuel
-            max_tokens=1500, # Augmenté si besoin pour des listes plus longues
-        )
+        chat_completion = _create_completion(final_prompt)
         response_content = chat_completion.choices[0].message.content
         logging.info("Réponse reçue de Groq.")
+        if presentation_cache is not None:
+            presentation_cache.put(final_prompt, response_content)
         return response_content
     except Exception as e:
         logging.error(f"Erreur lors de l'appel à l'API Groq : {e}")
-        # Fallback amélioré si Groq échoue
-        fallback_response = "J'ai rencontré un souci en formatant les recommandations avec l'assistant IA. Voici néanmoins les offres trouvées, basées sur la similarité des titres :\n\n"
-        for job in recommended_jobs:
-            fallback_response += (f"- Titre: {job.get('original_title', 'N/A')} (Score: {job.get('similarity_score_title', 0.0):.2f})\n"
-                                  f"  Entreprise: {job.get('company', 'N/A')}, Lieu: {job.get('location', 'N/A')}\n"
-                                  f"  URL: {job.get('url', 'N/A')}\n\n")
-        return fallback_response
+        # Fallback amélioré si Groq échoue (jamais mis en cache)
+        return format_recommendations_fallback(recommended_jobs)
+
+
+def stream_recommendations_with_groq(user_job_input_summary: str, recommended_jobs: list):
+    """
+    Version streaming de format_recommendations_with_groq : générateur d'événements (type, texte).
+      - ("preview", ...) : liste déterministe des offres, émise immédiatement (premier affichage) ;
+      - ("token", ...)   : fragments de la présentation du LLM, au fil de leur arrivée ;
+      - ("error", ...)   : présentation de repli si l'appel échoue en cours de route ;
+      - ("done", "")     : fin du flux.
+    Une présentation déjà en cache est émise d'un seul bloc ; une présentation complète est mise en cache.
+    """
+    if not recommended_jobs:
+        yield ("preview", "Aucune offre à formater n'a été trouvée.")
+        yield ("done", "")
+        return
+
+    yield ("preview", format_recommendations_list(recommended_jobs))
+
+    if not client_groq:
+        logging.error("Client Groq non initialisé. Seule la présentation brute est disponible.")
+        yield ("done", "")
+        return
+
+    final_prompt = build_presentation_prompt(user_job_input_summary, recommended_jobs)
+    if presentation_cache is not None:
+        cached_response = presentation_cache.get(final_prompt)
+        if cached_response is not None:
+            logging.info("Présentation servie depuis le cache (aucun appel à Groq).")
+            yield ("token", cached_response)
+            yield ("done", "")
+            return
+
+    logging.info(f"Prompt envoyé à Groq en streaming (début): {final_prompt[:300]}...")
+    received_parts = []
+    try:
+        for chunk in _create_completion(final_prompt, stream=True):
+            if not chunk.choices:
+                continue
+            content = chunk.choices[0].delta.content
+            if content:
+                received_parts.append(content)
+                yield ("token", content)
+    except Exception as e:
+        logging.error(f"Erreur pendant le streaming de la réponse Groq : {e}")
+        yield ("error", format_recommendations_fallback(recommended_jobs))
+        yield ("done", "")
+        return
+
+    logging.info("Réponse complète reçue de Groq (streaming).")
+    if presentation_cache is not None:
+        presentation_cache.put(final_prompt, "".join(received_parts))
+    yield ("done", "")
+
 
 if __name__ == '__main__':
+    import time
     if not client_groq:
-        print("Le client Groq n'est pas initialisé (vérifiez la clé API dans config.py). Test annulé.")
+        print("Le client Groq n'est pas initialisé (vérifiez la clé API dans config.py, ou activez GROQ_USE_STUB). Test annulé.")
     else:
         sample_user_input_summary = "Titre de poste recherché : \"Développeur Fullstack Expérimenté\""
         sample_reco_jobs = [
@@ -127,4 +237,9 @@ if __name__ == '__main__':
         formatted_output = format_recommendations_with_groq(sample_user_input_summary, sample_reco_jobs)
         print("\n--- Réponse de Groq ---")
         print(formatted_output)
-        print("--- Fin de la réponse ---")
\ No newline at end of file
+        print("--- Fin de la réponse ---")
+
+        # Deuxième appel identique : servi par le cache, sans requête à l'API
+        start = time.perf_counter()
+        format_recommendations_with_groq(sample_user_input_summary, sample_reco_jobs)
+        print(f"Deuxième appel (cache) : {(time.perf_counter() - start) * 1000:.1f} ms")
\ No newline at end of file
@@ -0,0 +1,47 @@
+# /mon_agent_reco_emploi/groq_stub.py
+"""
+Client local imitant l'interface du client Groq utilisée par groq_presenter
+(client.chat.completions.create(...).choices[0].message.content, ou des chunks
+choices[0].delta.content avec stream=True).
+Aucun appel réseau : la réponse est dérivée du prompt, de façon déterministe.
+Activé par GROQ_USE_STUB dans config.py, pour tester le module (et son cache) hors ligne.
+"""
+import re
+from types import SimpleNamespace
+
+
+class _StubCompletions:
+    def __init__(self, client):
+        self._client = client
+
+    def create(self, messages, model, temperature=None, max_tokens=None, stream=False, **kwargs):
+        self._client.calls += 1
+        user_prompt = next((m["content"] for m in reversed(messages) if m.get("role") == "user"), "")
+        # On reprend les lignes décrivant les offres pour produire une présentation lisible
+        offer_lines = [line.strip() for line in user_prompt.splitlines()
+                       if line.startswith("Offre ") or line.strip().startswith("- Titre")]
+        content = "\n".join(
+            [f"[Présentation locale ({model})] Voici les offres les plus proches de votre recherche :"]
+            + offer_lines
+            + ["Bonne exploration de ces pistes !"]
+        )
+        if stream:
+            return self._stream(content, model)
+        message = SimpleNamespace(role="assistant", content=content)
+        return SimpleNamespace(choices=[SimpleNamespace(index=0, message=message, finish_reason="stop")], model=model)
+
+    @staticmethod
+    def _stream(content: str, model: str):
+        """Fragments au format des chunks Groq (choices[0].delta.content), mot par mot."""
+        for word in re.findall(r'\S+\s*|\s+', content):
+            delta = SimpleNamespace(role="assistant", content=word)
+            yield SimpleNamespace(choices=[SimpleNamespace(index=0, delta=delta, finish_reason=None)], model=model)
+        yield SimpleNamespace(choices=[SimpleNamespace(index=0, delta=SimpleNamespace(content=None), finish_reason="stop")], model=model)
+
+
+class StubGroqClient:
+    """Remplaçant hors ligne du client Groq. `calls` compte les complétions demandées."""
+
+    def __init__(self):
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=_StubCompletions(self))
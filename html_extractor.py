@@ -0,0 +1,314 @@
+# /mon_agent_reco_emploi/html_extractor.py
+import logging
+import re
+from functools import lru_cache
+import lxml.html
+from lxml import etree
+from lxml.cssselect import CSSSelector
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Balises dont le contenu n'est jamais du texte utile
+NON_CONTENT_TAGS = frozenset(['script', 'style', 'noscript', 'template'])
+
+_META_CHARSET_RE = re.compile(rb'<meta[^>]+charset\s*=\s*["\']?\s*([\w\-]+)', re.IGNORECASE)
+_XML_DECLARATION_RE = re.compile(r'^\s*<\?xml[^>]*\?>')
+
+
+def decode_html(content, declared_encoding: str = None) -> str:
+    """
+    Décode le HTML brut en texte : encodage déclaré par l'en-tête HTTP, sinon balise <meta charset>,
+    sinon UTF-8 strict, sinon cp1252 (pages françaises anciennes).
+    """
+    if isinstance(content, str):
+        return _XML_DECLARATION_RE.sub('', content, count=1)
+
+    candidates = []
+    if declared_encoding:
+        candidates.append(declared_encoding)
+    meta_match = _META_CHARSET_RE.search(content[:4096])
+    if meta_match:
+        candidates.append(meta_match.group(1).decode('ascii', 'ignore'))
+    candidates.append('utf-8')
+
+    for encoding in candidates:
+        try:
+            return _XML_DECLARATION_RE.sub('', content.decode(encoding), count=1)
+        except (LookupError, UnicodeDecodeError):
+            continue
+    return _XML_DECLARATION_RE.sub('', content.decode('cp1252', errors='replace'), count=1)
+
+
+def is_xpath_selector(selector: str) -> bool:
+    return selector.startswith('/') or selector.startswith('(')
+
+
+@lru_cache(maxsize=2048)
+def compile_selector(selector: str):
+    """
+    Compile un sélecteur une seule fois pour tout le processus :
+    XPath s'il commence par '/' ou '(', CSS sinon (converti en XPath par cssselect).
+    """
+    if is_xpath_selector(selector):
+        return etree.XPath(selector)
+    return CSSSelector(selector)
+
+
+class CompiledSelector:
+    """
+    Sélecteur CSS ou XPath compilé à l'avance (règles de domaine compilées au chargement) :
+    un sélecteur invalide est détecté une fois, à la compilation, et non à chaque page.
+    """
+    __slots__ = ('source', 'is_xpath', 'matcher')
+
+    def __init__(self, source: str):
+        self.source = source
+        self.is_xpath = is_xpath_selector(source)
+        # Pas de compile_selector ici : le cache LRU pourrait évincer les règles d'un catalogue de domaines étendu
+        self.matcher = etree.XPath(source) if self.is_xpath else CSSSelector(source)
+
+    def __repr__(self):
+        return f"CompiledSelector({self.source!r})"
+
+
+def _is_element(node) -> bool:
+    # Les commentaires et instructions de traitement ont un `tag` qui n'est pas une chaîne
+    return isinstance(node.tag, str)
+
+
+# Balises de mise en page exclues lors de la recherche du bloc de contenu principal
+LAYOUT_TAGS = ('header', 'footer', 'nav')
+# Balises candidates pour le bloc de contenu principal
+BLOCK_TAGS = ('div', 'article', 'section', 'main')
+# Balises de "paragraphe" dont le texte alimente le score de contenu de leurs ancêtres
+PARAGRAPH_TAGS = frozenset(['p', 'li', 'pre', 'blockquote', 'td', 'dd', 'h2', 'h3', 'h4'])
+# Texte minimal (hors liens) pour qu'un paragraphe compte dans le score
+MIN_PARAGRAPH_LENGTH = 25
+
+
+class NodeStats:
+    """Statistiques de contenu d'un élément (texte total, texte des liens, score de contenu)."""
+    __slots__ = ('text_length', 'link_length', 'paragraph_length', 'children_paragraph_length', 'score')
+
+    def __init__(self):
+        self.text_length = 0
+        self.link_length = 0
+        self.paragraph_length = 0  # Texte hors liens si l'élément est un paragraphe, 0 sinon
+        self.children_paragraph_length = 0  # Somme des paragraph_length des enfants directs
+        self.score = 0.0
+
+    @property
+    def link_density(self) -> float:
+        return self.link_length / self.text_length if self.text_length else 0.0
+
+
+class ParsedPage:
+    """
+    Page HTML analysée UNE seule fois avec lxml.
+    Le même arbre sert aux sélecteurs CSS et XPath, au texte de la page et à la recherche
+    du plus grand bloc de texte (longueurs calculées en une passe ascendante).
+    L'arbre n'est jamais modifié : les balises à ignorer sont simplement sautées.
+    """
+
+    def __init__(self, content, declared_encoding: str = None):
+        self.root = lxml.html.document_fromstring(decode_html(content, declared_encoding))
+        self._text_lengths = {}
+        self._text_spans = {}
+        self._content_stats = {}
+
+    @staticmethod
+    def _excluded_set(excluded_tags) -> frozenset:
+        return NON_CONTENT_TAGS | frozenset(excluded_tags or ())
+
+    def iter_text(self, element, excluded_tags=None):
+        """Fragments de texte non vides d'un élément, hors balises exclues."""
+        excluded = self._excluded_set(excluded_tags)
+        if not _is_element(element) or element.tag in excluded:
+            return
+        stack = [(element, False)]
+        while stack:
+            node, emit_tail = stack.pop()
+            if emit_tail:
+                if node.tail and node.tail.strip():
+                    yield node.tail.strip()
+                continue
+            if _is_element(node) and node.tag not in excluded:
+                if node.text and node.text.strip():
+                    yield node.text.strip()
+                for child in reversed(node):
+                    stack.append((child, True))
+                    stack.append((child, False))
+
+    def element_text(self, element, separator: str = ' ', excluded_tags=None) -> str:
+        """Texte d'un élément (fragments nettoyés, joints par `separator`)."""
+        return separator.join(self.iter_text(element, excluded_tags))
+
+    def page_text(self, separator: str = '\n', excluded_tags=None) -> str:
+        return self.element_text(self.root, separator, excluded_tags)
+
+    def select(self, selector) -> list:
+        """Éléments correspondant à un sélecteur CSS ou XPath (chaîne compilée une seule fois, ou CompiledSelector)."""
+        try:
+            if isinstance(selector, CompiledSelector):
+                result = selector.matcher(self.root)
+            else:
+                result = compile_selector(selector)(self.root)
+        except Exception as e:
+            logging.info(f"Erreur avec le sélecteur {selector}: {e}")
+            return []
+        if not isinstance(result, list):
+            return []
+        # Un XPath peut aussi retourner des chaînes ou des nombres : on ne garde que les éléments
+        return [node for node in result if hasattr(node, 'tag') and _is_element(node)]
+
+    def select_text(self, selectors) -> str:
+        """Premier texte non vide obtenu avec une liste de sélecteurs (XPath : textes des éléments joints)."""
+        for selector in selectors:
+            elements = self.select(selector)
+            if not elements:
+                continue
+            is_xpath = selector.is_xpath if isinstance(selector, CompiledSelector) else is_xpath_selector(selector)
+            if is_xpath:
+                texts = [self.element_text(element) for element in elements]
+                text = ' '.join(text for text in texts if text)
+            else:
+                text = self.element_text(elements[0])
+            if text:
+                return text
+        return None
+
+    def find_first(self, tag: str):
+        return next(self.root.iter(tag), None)
+
+    def text_lengths(self, excluded_tags=None) -> dict:
+        """
+        Longueur du texte (fragments nettoyés) de chaque élément, calculée en UNE passe :
+        les éléments sont parcourus en ordre préfixe inversé, donc chaque enfant est traité
+        avant son parent, qui additionne simplement les longueurs de ses enfants.
+        """
+        excluded = self._excluded_set(excluded_tags)
+        if excluded not in self._text_lengths:
+            lengths = {}
+            for element in reversed(list(self.root.iter(tag=etree.Element))):
+                if element.tag in excluded:
+                    lengths[element] = 0
+                    continue
+                total = len(element.text.strip()) if element.text else 0
+                for child in element:
+                    if _is_element(child):
+                        total += lengths.get(child, 0)
+                    if child.tail:
+                        total += len(child.tail.strip())
+                lengths[element] = total
+            self._text_lengths[excluded] = lengths
+        return self._text_lengths[excluded]
+
+    def text_spans(self, excluded_tags=None) -> tuple:
+        """
+        Texte normalisé de la page (fragments joints par une espace, espaces internes réduites à une seule)
+        et position de chaque élément dans ce texte, calculés en UNE passe : (texte, {élément: (début, fin)}).
+        Le texte normalisé d'un élément est la tranche texte[début:fin] : il n'est matérialisé qu'à la demande.
+        """
+        excluded = self._excluded_set(excluded_tags)
+        if excluded not in self._text_spans:
+            fragments, spans = [], {}
+            starts = {}
+            length = 0  # Longueur du texte déjà produit (séparateurs compris)
+
+            def add_fragment(raw):
+                nonlocal length
+                fragment = ' '.join(raw.split())
+                if fragment:
+                    length += len(fragment) + (1 if fragments else 0)
+                    fragments.append(fragment)
+
+            stack = [(self.root, 'enter')]
+            while stack:
+                node, step = stack.pop()
+                if step == 'tail':
+                    if node.tail:
+                        add_fragment(node.tail)
+                elif step == 'exit':
+                    start = starts.pop(node)
+                    spans[node] = (start, max(start, length))
+                elif _is_element(node) and node.tag not in excluded:
+                    # Premier caractère du prochain fragment (après le séparateur s'il y a déjà du texte)
+                    starts[node] = length + (1 if fragments else 0)
+                    if node.text:
+                        add_fragment(node.text)
+                    stack.append((node, 'exit'))
+                    for child in reversed(node):
+                        stack.append((child, 'tail'))
+                        stack.append((child, 'enter'))
+            self._text_spans[excluded] = (' '.join(fragments), spans)
+        return self._text_spans[excluded]
+
+    def longest_text_block(self, min_length: int = 100, tags=('div', 'article', 'section', 'main'), excluded_tags=LAYOUT_TAGS):
+        """Élément (parmi `tags`) contenant le plus de texte, ou None sous `min_length` caractères."""
+        lengths = self.text_lengths(excluded_tags)
+        best_element, best_length = None, min_length - 1
+        for element in self.root.iter(*tags):
+            length = lengths.get(element, 0)
+            if length > best_length:
+                best_element, best_length = element, length
+        return best_element
+
+    def content_stats(self, excluded_tags=LAYOUT_TAGS) -> dict:
+        """
+        Statistiques de contenu de chaque élément, en UNE passe postfixe (enfants avant parents) :
+        longueur de texte, longueur de texte dans des liens, et score de contenu à la readability.
+        Chaque paragraphe apporte son texte hors liens à son parent (en entier) et à son grand-parent
+        (pour moitié) ; un bloc qui porte directement du texte (div + <br>) compte pour lui-même.
+        """
+        excluded = self._excluded_set(excluded_tags)
+        if excluded in self._content_stats:
+            return self._content_stats[excluded]
+
+        stats = {}
+        for element in reversed(list(self.root.iter(tag=etree.Element))):
+            node = NodeStats()
+            stats[element] = node
+            if element.tag in excluded:
+                continue
+            own_length = len(element.text.strip()) if element.text else 0
+            for child in element:
+                if child.tail:
+                    own_length += len(child.tail.strip())
+                if not _is_element(child):
+                    continue
+                child_stats = stats[child]
+                node.text_length += child_stats.text_length
+                node.link_length += child_stats.link_length
+                node.children_paragraph_length += child_stats.paragraph_length
+                # Parent : paragraphes des enfants en entier ; grand-parent : paragraphes des petits-enfants pour moitié
+                node.score += child_stats.paragraph_length + 0.5 * child_stats.children_paragraph_length
+            node.text_length += own_length
+            if element.tag == 'a':
+                node.link_length = node.text_length
+
+            content_length = node.text_length - node.link_length
+            if element.tag in PARAGRAPH_TAGS and content_length >= MIN_PARAGRAPH_LENGTH:
+                node.paragraph_length = content_length
+            if element.tag in BLOCK_TAGS and own_length >= MIN_PARAGRAPH_LENGTH:
+                node.score += own_length
+        self._content_stats[excluded] = stats
+        return stats
+
+    def main_content_block(self, min_length: int = 100, tags=BLOCK_TAGS, excluded_tags=LAYOUT_TAGS):
+        """
+        Bloc de contenu principal : l'élément (parmi `tags`) au meilleur score de contenu,
+        pondéré par (1 - densité de liens) pour écarter menus et listes de liens.
+        Repli sur le plus grand bloc de texte si aucun paragraphe n'a été trouvé.
+        """
+        stats = self.content_stats(excluded_tags)
+        best_element, best_score = None, 0.0
+        for element in self.root.iter(*tags):
+            node = stats.get(element)
+            if node is None or node.text_length < min_length:
+                continue
+            score = node.score * (1.0 - node.link_density)
+            if score > best_score:
+                best_element, best_score = element, score
+        if best_element is None:
+            return self.longest_text_block(min_length, tags, excluded_tags)
+        return best_element
@@ -0,0 +1,136 @@
+# /mon_agent_reco_emploi/http_client.py
+import logging
+import os
+import sqlite3
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from config import (
+    HTTP_POOL_CONNECTIONS, HTTP_POOL_MAXSIZE, HTTP_MAX_RETRIES,
+    HTTP_BACKOFF_FACTOR, HTTP_VALIDATORS_PATH,
+)
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+try:
+    import brotli  # noqa: F401 -- urllib3 ne décode le Brotli que si ce paquet est installé
+    ACCEPT_ENCODING = "gzip, deflate, br"
+except ImportError:
+    ACCEPT_ENCODING = "gzip, deflate"
+
+# Les 429/503 ne sont pas rejoués ici : ils sont gérés par l'ordonnanceur de politesse (crawl_scheduler)
+RETRY_STATUS_CODES = (500, 502, 504)
+
+_thread_local = threading.local()
+
+
+def _create_session() -> requests.Session:
+    session = requests.Session()
+    retry = Retry(
+        total=HTTP_MAX_RETRIES,
+        backoff_factor=HTTP_BACKOFF_FACTOR,
+        status_forcelist=RETRY_STATUS_CODES,
+        allowed_methods=frozenset(["GET", "HEAD"]),
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=HTTP_POOL_CONNECTIONS, pool_maxsize=HTTP_POOL_MAXSIZE, max_retries=retry)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers["Accept-Encoding"] = ACCEPT_ENCODING
+    return session
+
+
+def get_session() -> requests.Session:
+    """
+    Session HTTP du thread courant. Chaque session garde un pool de connexions keep-alive
+    par hôte (pas de nouvelle poignée de main TCP+TLS à chaque page) et rejoue les erreurs
+    serveur transitoires avec un backoff exponentiel.
+    """
+    session = getattr(_thread_local, "session", None)
+    if session is None:
+        session = _create_session()
+        _thread_local.session = session
+    return session
+
+
+class ValidatorStore:
+    """Stocke les en-têtes ETag / Last-Modified par URL pour les GET conditionnels des re-crawls."""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _get_conn(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS http_validators (
+                    url TEXT PRIMARY KEY,
+                    etag TEXT,
+                    last_modified TEXT,
+                    updated_at REAL
+                )
+            ''')
+            self._conn.commit()
+        return self._conn
+
+    def get(self, url: str):
+        """Retourne (etag, last_modified) connus pour `url`, ou (None, None)."""
+        with self._lock:
+            try:
+                row = self._get_conn().execute(
+                    "SELECT etag, last_modified FROM http_validators WHERE url = ?", (url,)
+                ).fetchone()
+            except sqlite3.Error as e:
+                logging.error(f"Erreur de lecture des validateurs HTTP : {e}")
+                row = None
+        return row if row else (None, None)
+
+    def put(self, url: str, etag: str, last_modified: str):
+        if not etag and not last_modified:
+            return
+        with self._lock:
+            try:
+                conn = self._get_conn()
+                with conn:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO http_validators (url, etag, last_modified, updated_at) VALUES (?, ?, ?, ?)",
+                        (url, etag, last_modified, time.time())
+                    )
+            except sqlite3.Error as e:
+                logging.error(f"Erreur d'écriture des validateurs HTTP : {e}")
+
+
+validator_store = ValidatorStore(HTTP_VALIDATORS_PATH)
+
+
+def response_validators(response: requests.Response):
+    """(etag, last_modified) d'une réponse, à mémoriser avec validator_store.put."""
+    return response.headers.get('ETag'), response.headers.get('Last-Modified')
+
+
+def fetch(url: str, headers: dict = None, timeout: float = 15, conditional: bool = False,
+          remember_validators: bool = False) -> requests.Response:
+    """
+    GET via la session poolée du thread.
+    Avec `conditional=True`, les validateurs connus sont envoyés (If-None-Match / If-Modified-Since) :
+    une page inchangée répond 304 sans corps. Les validateurs des réponses 200 ne sont mémorisés qu'avec
+    `remember_validators=True` : en général l'appelant les enregistre lui-même une fois la page exploitée
+    (un 304 ne doit jamais renvoyer à une page dont l'extraction a échoué, voir remember_page_validators).
+    """
+    request_headers = dict(headers or {})
+    if conditional:
+        etag, last_modified = validator_store.get(url)
+        if etag:
+            request_headers['If-None-Match'] = etag
+        if last_modified:
+            request_headers['If-Modified-Since'] = last_modified
+
+    response = get_session().get(url, headers=request_headers, timeout=timeout)
+    if response.status_code == 200 and remember_validators:
+        validator_store.put(url, *response_validators(response))
+    return response
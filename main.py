@@ -1,6 +1,6 @@
 # /mon_agent_reco_emploi/main.py
 import logging
-from database_manager import load_job_offers_from_db # add_job_offer_to_db n'est pas directement utilisé ici
+from database_manager import get_offers_index # add_job_offer_to_db n'est pas directement utilisé ici
 from duckduckgo_retriever import search_and_scrape_jobs
 from recommender_engine import get_recommendations
 from groq_presenter import format_recommendations_with_groq
@@ -82,8 +82,9 @@ def run_agent():
     else:
         logging.info("Skipping de la mise à jour de la base de données depuis le web.")
 
-    all_offers = load_job_offers_from_db()
-    if not all_offers:
+    # Index construit en flux depuis la base (colonnes utiles uniquement, sans les descriptions)
+    offers_index = get_offers_index()
+    if len(offers_index) == 0:
         logging.error("La base de données d'offres est vide et aucune nouvelle offre n'a été ajoutée. Impossible de recommander.")
         print("Désolé, la base de données d'offres est vide. Essayez de la peupler ou d'activer la recherche en ligne.")
         return
@@ -91,7 +92,7 @@ def run_agent():
     logging.info("Génération des recommandations basées sur la similarité des titres...")
     # On passe user_description pour maintenir la signature de la fonction, mais elle n'est pas utilisée
     # pour le calcul de similarité dans la version actuelle de recommender_engine.py
-    recommendations = get_recommendations(user_title, user_description, all_offers) 
+    recommendations = get_recommendations(user_title, user_description) 
 
     if not recommendations:
         logging.info("Aucune recommandation trouvée pour ce titre.")
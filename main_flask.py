@@ -1,21 +1,38 @@
 # /mon_agent_reco_emploi/main_flask.py
 
 import logging
-from flask import Flask, render_template, request, jsonify
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from flask import Flask, render_template, request, jsonify, Response, stream_with_context
 import json # Pour le retour JSON
 
 # Importer les fonctions nécessaires de vos modules
-from database_manager import load_job_offers_from_db, initialize_db
-from duckduckgo_retriever import search_and_scrape_jobs
+from database_manager import initialize_db, get_offers_index
+from scrape_job_queue import get_scrape_job_queue
+from scrape_pipeline import start_extract_executor
 from recommender_engine import get_recommendations
+from groq_presenter import stream_recommendations_with_groq
+from text_processor import warm_up_models_async
+from config import RECOMMENDATION_STREAM_TTL_SECONDS, RECOMMENDATION_STREAM_MAX_ITEMS
 # from scraper_utils import scrape_job_page # Non utilisé directement ici
 # from text_processor import process_job_offer_text # Utilisé indirectement via recommender_engine
 
 # Configuration du logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-# Initialiser la base de données au démarrage (crée la table si besoin)
-initialize_db()
+# Les processus d'extraction (forkserver/spawn) réimportent le script principal sous le nom '__mp_main__' :
+# le démarrage du serveur n'y est pas rejoué
+if __name__ != '__mp_main__':
+    # Initialiser la base de données au démarrage (crée la table si besoin)
+    initialize_db()
+
+    # Démarrer les processus d'extraction du scraping avant les threads du serveur (et pas depuis une requête)
+    start_extract_executor()
+
+    # Précharger le modèle d'embeddings en arrière-plan : le serveur démarre sans l'attendre
+    warm_up_models_async()
 
 # Créer l'application Flask
 app = Flask(__name__)
@@ -26,6 +43,58 @@ def index():
     """Affiche la page HTML principale."""
     return render_template('index.html')
 
+def _recommendation_for_frontend(reco: dict) -> dict:
+    """Champs d'une recommandation renvoyés au frontend (sans l'embedding)."""
+    return {
+        "title": reco.get('original_title', 'N/A'),
+        "company": reco.get('company', 'N/A'),
+        "location": reco.get('location', 'N/A'),
+        "url": reco.get('url', '#'),
+        "score": round(reco.get('similarity_score_title', 0.0), 4), # Score de similarité du titre
+        "skills": reco.get('skills', []) # Compétences pour info
+    }
+
+# Recommandations calculées par /api/recommend, reprises par le flux de présentation sans nouveau calcul
+_computed_recommendations = OrderedDict()  # identifiant -> (échéance, titre, recommandations)
+_computed_recommendations_lock = threading.Lock()
+
+def _remember_recommendations(user_title: str, recommendations: list) -> str:
+    """Conserve un résultat pour /api/recommend/stream et retourne son identifiant."""
+    recommendation_id = uuid.uuid4().hex
+    now = time.monotonic()
+    with _computed_recommendations_lock:
+        # Éviction des résultats expirés (les plus anciens sont en tête), puis des plus anciens au-delà de la limite
+        while _computed_recommendations and next(iter(_computed_recommendations.values()))[0] <= now:
+            _computed_recommendations.popitem(last=False)
+        _computed_recommendations[recommendation_id] = (now + RECOMMENDATION_STREAM_TTL_SECONDS, user_title, recommendations)
+        while len(_computed_recommendations) > RECOMMENDATION_STREAM_MAX_ITEMS:
+            _computed_recommendations.popitem(last=False)
+    return recommendation_id
+
+def _computed_recommendations_for(recommendation_id: str):
+    """(titre, recommandations) d'un résultat conservé, ou None s'il est inconnu ou expiré."""
+    with _computed_recommendations_lock:
+        entry = _computed_recommendations.get(recommendation_id)
+        if entry is None or entry[0] <= time.monotonic():
+            return None
+        return entry[1], entry[2]
+
+def _sse_event(event: str, payload: dict) -> str:
+    """Événement Server-Sent Events ; les données sont en JSON (une seule ligne, retours à la ligne échappés)."""
+    return f"event: {event}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+def _sse_error(message: str):
+    """Fin de flux en erreur : événement "error" (texte affiché par le frontend) puis "done"."""
+    yield _sse_event("error", {"text": message})
+    yield _sse_event("done", {"text": ""})
+
+def _sse_response(events) -> Response:
+    headers = {
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",  # Désactive la mise en tampon des proxys (nginx) pour un affichage immédiat
+    }
+    return Response(stream_with_context(events), mimetype="text/event-stream", headers=headers)
+
 # Route API pour obtenir les recommandations
 @app.route('/api/recommend', methods=['POST'])
 def api_recommend():
@@ -42,46 +111,93 @@ def api_recommend():
 
         logging.info(f"Requête API reçue pour le titre : '{user_title}', Scraper nouvelles offres : {should_scrape}")
 
+        # Le scraping n'est plus exécuté dans la requête : il est confié à la file de tâches en arrière-plan
+        # et la réponse est calculée immédiatement depuis l'index courant (GET /api/scrape/<id> pour suivre la tâche)
+        scrape_job_id = None
         if should_scrape:
-            logging.info("Lancement du scraping de nouvelles offres...")
-            try:
-                # La recherche web se base sur le titre fourni
-                search_query = f"offre emploi {user_title}" 
-                new_jobs_count = search_and_scrape_jobs(search_query)
-                logging.info(f"{new_jobs_count} nouvelles offres potentiellement ajoutées.")
-            except Exception as e:
-                logging.error(f"Erreur pendant le scraping : {e}")
-                # On continue quand même pour essayer de recommander depuis la base existante
-                # mais on pourrait retourner une erreur partielle si on voulait
-
-        # Charger les offres (y compris les nouvelles si elles ont été scrappées)
-        all_offers = load_job_offers_from_db()
-        if not all_offers:
+            # La recherche web se base sur le titre fourni
+            scrape_job_id = get_scrape_job_queue().submit(f"offre emploi {user_title}")
+
+        # Index des offres partagé par le processus : construit une seule fois depuis la base,
+        # puis mis à jour à chaque insertion (y compris les offres qui viennent d'être scrappées)
+        offers_index = get_offers_index()
+        if len(offers_index) == 0:
             logging.warning("La base de données est vide.")
-            return jsonify({"error": "La base de données d'offres est vide.", "recommendations": []}), 200 # Retourner une liste vide
+            return jsonify({"error": "La base de données d'offres est vide.", "recommendations": [], "scrape_job_id": scrape_job_id}), 200 # Retourner une liste vide
 
         # Obtenir les recommandations (basées sur le titre)
-        recommendations = get_recommendations(user_title, user_description, all_offers)
+        recommendations = get_recommendations(user_title, user_description)
 
         # Préparer les données pour le frontend (on ne renvoie pas l'embedding complet)
-        results_for_frontend = []
-        for reco in recommendations:
-            results_for_frontend.append({
-                "title": reco.get('original_title', 'N/A'),
-                "company": reco.get('company', 'N/A'),
-                "location": reco.get('location', 'N/A'),
-                "url": reco.get('url', '#'),
-                "score": round(reco.get('similarity_score_title', 0.0), 4), # Score de similarité du titre
-                "skills": reco.get('skills', []) # Compétences pour info
-            })
+        results_for_frontend = [_recommendation_for_frontend(reco) for reco in recommendations]
+
+        # Identifiant du résultat : le flux de présentation le reprend tel quel (GET /api/recommend/stream?id=...)
+        recommendation_id = _remember_recommendations(user_title, recommendations) if recommendations else None
 
         logging.info(f"{len(results_for_frontend)} recommandations trouvées pour '{user_title}'")
-        return jsonify({"recommendations": results_for_frontend})
+        return jsonify({"recommendations": results_for_frontend, "recommendation_id": recommendation_id, "scrape_job_id": scrape_job_id})
 
     except Exception as e:
         logging.exception("Erreur inattendue dans l'API de recommandation.") # Log l'exception complète
         return jsonify({"error": "Une erreur interne est survenue."}), 500
 
+# Routes API des tâches de scraping en arrière-plan
+@app.route('/api/scrape', methods=['POST'])
+def api_scrape():
+    """Lance une tâche de scraping (JSON : "title" ou "query") et retourne son identifiant sans attendre."""
+    data = request.get_json(silent=True) or {}
+    query = (data.get('query') or '').strip()
+    if not query:
+        title = (data.get('title') or '').strip()
+        if not title:
+            return jsonify({"error": "Le titre du poste (ou la requête) est manquant."}), 400
+        query = f"offre emploi {title}"
+
+    job_id = get_scrape_job_queue().submit(query)
+    return jsonify({"job_id": job_id, "status_url": f"/api/scrape/{job_id}"}), 202
+
+@app.route('/api/scrape/<job_id>', methods=['GET'])
+def api_scrape_status(job_id):
+    """Progression d'une tâche de scraping (statut, URLs traitées, offres ajoutées, erreur éventuelle)."""
+    job = get_scrape_job_queue().get(job_id)
+    if job is None:
+        return jsonify({"error": "Tâche de scraping inconnue."}), 404
+    return jsonify(job)
+
+# Route API de présentation en streaming (Server-Sent Events)
+@app.route('/api/recommend/stream', methods=['GET'])
+def api_recommend_stream():
+    """
+    Relaie la présentation des recommandations au fil de l'eau (GET ?id=<recommendation_id>&title=...).
+    Les recommandations sont celles déjà calculées par /api/recommend ; elles ne sont recalculées
+    depuis le titre que si l'identifiant est inconnu (expiré, ou reçu par un autre processus du serveur).
+    Événements : "preview" (liste déterministe, immédiatement), "token" (fragments du LLM),
+    "error" (présentation de repli) et "done".
+    """
+    computed = _computed_recommendations_for(request.args.get('id', ''))
+    if computed is not None:
+        user_title, recommendations = computed
+    else:
+        user_title = request.args.get('title', '').strip()
+        # Erreurs envoyées en événements : EventSource ne sait pas lire un corps JSON
+        if not user_title:
+            return _sse_response(_sse_error("Recommandations inconnues ou expirées, et titre du poste manquant."))
+        if len(get_offers_index()) == 0:
+            return _sse_response(_sse_error("La base de données d'offres est vide."))
+        logging.info(f"Recommandations inconnues pour le flux de présentation : recalcul pour '{user_title}'")
+        recommendations = get_recommendations(user_title, request.args.get('description', ''))
+    user_input_summary = f"Titre de poste recherché : \"{user_title}\""
+
+    def generate():
+        try:
+            for event, text in stream_recommendations_with_groq(user_input_summary, recommendations):
+                yield _sse_event(event, {"text": text})
+        except Exception:
+            logging.exception("Erreur inattendue pendant le streaming de la présentation.")
+            yield from _sse_error("Une erreur interne est survenue.")
+
+    return _sse_response(generate())
+
 if __name__ == '__main__':
     # Lance le serveur de développement Flask
     # accessible sur http://127.0.0.1:5000 par défaut
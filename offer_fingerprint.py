@@ -0,0 +1,124 @@
+# /mon_agent_reco_emploi/offer_fingerprint.py
+import hashlib
+import re
+from collections import Counter
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+import numpy as np
+
+# Paramètres de suivi (identifiants de clic publicitaire, campagnes e-mail) sans effet sur le contenu de la page.
+# Seules des clés sans ambiguïté : des clés génériques comme 'ref' ou 'cmp' portent souvent l'identifiant
+# de l'offre sur les sites d'emploi (?ref=12345), les retirer fusionnerait des offres distinctes.
+TRACKING_QUERY_PARAMS = frozenset([
+    'gclid', 'gclsrc', 'dclid', 'fbclid', 'msclkid', 'yclid', 'mc_cid', 'mc_eid', '_hsenc', '_hsmi', 'igshid',
+])
+TRACKING_QUERY_PREFIXES = ('utm_', 'pk_', 'mtm_')
+# Paramètres de suivi propres à un site (domaine et ses sous-domaines), où l'on sait qu'ils n'identifient pas l'offre
+DOMAIN_TRACKING_QUERY_PARAMS = {
+    'linkedin.com': frozenset(['trk', 'trackingid', 'refid']),
+    'indeed.com': frozenset(['from', 'tk', 'vjs', 'advn']),  # L'offre est identifiée par 'jk'
+}
+DEFAULT_PORTS = {'http': '80', 'https': '443'}
+
+SIMHASH_BITS = 64
+# 6 bandes (4 de 11 bits, 2 de 10 bits) : deux empreintes à distance de Hamming <= 5 ont au moins une
+# bande identique (principe des tiroirs), qui sert de clé de recherche indexée en base.
+SIMHASH_BANDS = 6
+SIMHASH_BAND_WIDTHS = [SIMHASH_BITS // SIMHASH_BANDS + (band < SIMHASH_BITS % SIMHASH_BANDS) for band in range(SIMHASH_BANDS)]
+# Taille des fragments de texte (n-grammes de mots) comparés par la SimHash.
+# Des bigrammes : sur des descriptions de quelques centaines de mots, un mot modifié ou une phrase ajoutée
+# change peu l'empreinte, alors que deux offres différentes restent loin l'une de l'autre.
+SHINGLE_SIZE = 2
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+_BIT_POSITIONS = np.arange(SIMHASH_BITS, dtype=np.uint64)
+
+
+def _domain_tracking_params(host: str) -> frozenset:
+    for domain, params in DOMAIN_TRACKING_QUERY_PARAMS.items():
+        if host == domain or host.endswith(f".{domain}"):
+            return params
+    return frozenset()
+
+
+def _is_tracking_param(key: str, domain_params: frozenset) -> bool:
+    key = key.lower()
+    return key in TRACKING_QUERY_PARAMS or key in domain_params or key.startswith(TRACKING_QUERY_PREFIXES)
+
+
+def canonicalize_url(url: str) -> str:
+    """
+    Forme canonique d'une URL d'offre, pour reconnaître la même page sous plusieurs URLs :
+    schéma et hôte en minuscules, sans 'www.' ni port par défaut, sans fragment,
+    sans paramètres de suivi (utm_*, gclid, ... et ceux connus pour le site), paramètres restants triés, sans '/' final.
+    """
+    if not url:
+        return url
+    try:
+        parts = urlsplit(url.strip())
+    except ValueError:
+        return url
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or '').lower()
+    if host.startswith('www.'):
+        host = host[4:]
+    try:
+        port = parts.port
+    except ValueError:
+        port = None
+    netloc = host if port is None or str(port) == DEFAULT_PORTS.get(scheme) else f"{host}:{port}"
+
+    domain_params = _domain_tracking_params(host)
+    query = sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not _is_tracking_param(key, domain_params)
+    )
+    path = parts.path.rstrip('/') or '/'
+    return urlunsplit((scheme, netloc, path, urlencode(query), ''))
+
+
+def _shingles(tokens: list) -> Counter:
+    if len(tokens) < SHINGLE_SIZE:
+        return Counter(tokens)
+    return Counter(' '.join(tokens[i:i + SHINGLE_SIZE]) for i in range(len(tokens) - SHINGLE_SIZE + 1))
+
+
+def simhash(text: str, min_tokens: int = 0):
+    """
+    Empreinte SimHash 64 bits du texte : deux textes presque identiques (offre republiée sur un autre
+    site, mentions légales ou bandeau différents) ont des empreintes à faible distance de Hamming.
+    Retourne None si le texte a moins de `min_tokens` mots (empreinte non significative).
+    """
+    tokens = _TOKEN_RE.findall(text.lower()) if text else []
+    if not tokens or len(tokens) < min_tokens:
+        return None
+    shingles = _shingles(tokens)
+    hashes = np.fromiter(
+        (int.from_bytes(hashlib.blake2b(shingle.encode('utf-8'), digest_size=8).digest(), 'little') for shingle in shingles),
+        dtype=np.uint64, count=len(shingles)
+    )
+    weights = np.fromiter(shingles.values(), dtype=np.int64, count=len(shingles))
+    bits = ((hashes[:, None] >> _BIT_POSITIONS) & np.uint64(1)).astype(np.int64)  # (n, 64)
+    votes = weights @ (2 * bits - 1)  # Somme pondérée de +1/-1 par bit
+    return sum(1 << position for position in np.flatnonzero(votes > 0).tolist())
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return bin(a ^ b).count('1')
+
+
+def simhash_bands(fingerprint: int) -> list:
+    """Découpe l'empreinte en SIMHASH_BANDS entiers (largeurs SIMHASH_BAND_WIDTHS) : clés de recherche LSH."""
+    bands, shift = [], 0
+    for width in SIMHASH_BAND_WIDTHS:
+        bands.append((fingerprint >> shift) & ((1 << width) - 1))
+        shift += width
+    return bands
+
+
+def to_signed64(value: int) -> int:
+    """Empreinte non signée -> entier signé 64 bits (type INTEGER de SQLite)."""
+    return value - (1 << 64) if value >= (1 << 63) else value
+
+
+def from_signed64(value: int) -> int:
+    return value + (1 << 64) if value < 0 else value
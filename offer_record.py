@@ -0,0 +1,52 @@
+# /mon_agent_reco_emploi/offer_record.py
+
+# Colonnes de la table job_offers exposées aux lecteurs (embedding : vecteur décodé depuis le BLOB ou le JSON)
+OFFER_COLUMNS = (
+    'url', 'original_title', 'original_description', 'company', 'location',
+    'cleaned_title', 'cleaned_description', 'combined_text_for_embedding',
+    'skills', 'embedding',
+)
+
+# Colonnes utiles au moteur de recommandation et à l'affichage : pas de texte de description
+INDEX_COLUMNS = ('url', 'original_title', 'company', 'location', 'skills', 'embedding')
+
+
+class OfferRecord:
+    """
+    Offre légère à attributs fixes (__slots__ : pas de dictionnaire par instance).
+    Seules les colonnes chargées sont renseignées ; les autres valent None via get().
+    L'interface get()/[]/to_dict() permet de l'utiliser là où un dictionnaire d'offre est attendu.
+    """
+    __slots__ = OFFER_COLUMNS
+
+    def __init__(self, **fields):
+        for name, value in fields.items():
+            setattr(self, name, value)
+
+    @classmethod
+    def from_mapping(cls, mapping, columns=INDEX_COLUMNS) -> 'OfferRecord':
+        """Projette un dictionnaire d'offre sur `columns` (les clés absentes sont ignorées)."""
+        return cls(**{name: mapping[name] for name in columns if name in mapping})
+
+    def get(self, name: str, default=None):
+        return getattr(self, name, default) if name in OFFER_COLUMNS else default
+
+    def __getitem__(self, name: str):
+        if name not in OFFER_COLUMNS or not hasattr(self, name):
+            raise KeyError(name)
+        return getattr(self, name)
+
+    def __contains__(self, name: str) -> bool:
+        return name in OFFER_COLUMNS and hasattr(self, name)
+
+    def to_dict(self, exclude=('embedding',)) -> dict:
+        """Dictionnaire des colonnes renseignées (sans l'embedding par défaut)."""
+        return {name: getattr(self, name) for name in OFFER_COLUMNS
+                if name not in exclude and hasattr(self, name)}
+
+    def without_embedding(self) -> 'OfferRecord':
+        """Copie sans l'embedding (les métadonnées gardées par l'index, le vecteur vivant dans sa matrice)."""
+        return OfferRecord(**self.to_dict())
+
+    def __repr__(self):
+        return f"OfferRecord(url={self.get('url')!r}, original_title={self.get('original_title')!r})"
@@ -0,0 +1,179 @@
+# /mon_agent_reco_emploi/page_store.py
+import gzip
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from config import RAW_PAGES_DB_PATH, RAW_PAGES_DIR
+
+try:
+    import zstandard  # Compression plus rapide et plus compacte que gzip (pip install zstandard)
+except ImportError:
+    zstandard = None
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Extension des blobs selon leur compression : la lecture ne dépend pas de la présence de zstandard
+# au moment de l'écriture (un blob .gz reste lisible une fois zstandard installé, et inversement)
+ZSTD_EXTENSION = ".html.zst"
+GZIP_EXTENSION = ".html.gz"
+
+
+def content_hash(content: bytes) -> str:
+    return hashlib.sha256(content).hexdigest()
+
+
+def _compress(content: bytes):
+    """(octets compressés, extension) : zstd si disponible, gzip sinon."""
+    if zstandard is not None:
+        return zstandard.ZstdCompressor(level=10).compress(content), ZSTD_EXTENSION
+    return gzip.compress(content, compresslevel=6), GZIP_EXTENSION
+
+
+def _decompress(data: bytes, extension: str) -> bytes:
+    if extension == ZSTD_EXTENSION:
+        if zstandard is None:
+            raise RuntimeError("Page compressée en zstd : installez le paquet zstandard pour la relire.")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return gzip.decompress(data)
+
+
+def stored_header(headers: dict, name: str):
+    """En-tête HTTP stocké, recherché sans tenir compte de la casse."""
+    name = name.lower()
+    return next((value for key, value in headers.items() if key.lower() == name), None)
+
+
+def read_blob(blob_path: str) -> bytes:
+    """Relit et décompresse un blob (utilisable dans un processus de ré-extraction, sans connexion SQLite)."""
+    extension = ZSTD_EXTENSION if blob_path.endswith(ZSTD_EXTENSION) else GZIP_EXTENSION
+    with open(blob_path, "rb") as f:
+        return _decompress(f.read(), extension)
+
+
+class RawPageStore:
+    """
+    Stockage du HTML brut des pages scrapées, pour pouvoir ré-extraire les offres (nouvelles règles
+    de domaine, extracteur amélioré) sans re-télécharger les pages.
+    Les pages sont adressées par leur contenu (SHA-256) : data/raw_pages/ab/abcdef....html.zst.
+    Deux URLs (ou deux crawls) au contenu identique partagent le même blob.
+    Un index SQLite associe chaque URL à son dernier contenu, avec la date du fetch et les en-têtes HTTP.
+    """
+
+    def __init__(self, db_path: str, blob_dir: str):
+        self.db_path = db_path
+        self.blob_dir = blob_dir
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _get_conn(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS raw_pages (
+                    url TEXT PRIMARY KEY,
+                    content_hash TEXT,
+                    blob_extension TEXT,
+                    fetched_at REAL,
+                    status_code INTEGER,
+                    headers TEXT -- En-têtes de la réponse (JSON)
+                )
+            ''')
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_raw_pages_hash ON raw_pages (content_hash)")
+            self._conn.commit()
+        return self._conn
+
+    def blob_path(self, digest: str, extension: str) -> str:
+        return os.path.join(self.blob_dir, digest[:2], f"{digest}{extension}")
+
+    def _find_blob(self, digest: str):
+        """Extension d'un blob déjà présent pour `digest` (quelle que soit sa compression), ou None."""
+        for extension in (ZSTD_EXTENSION, GZIP_EXTENSION):
+            if os.path.exists(self.blob_path(digest, extension)):
+                return extension
+        return None
+
+    def _write_blob(self, digest: str, content: bytes) -> str:
+        extension = self._find_blob(digest)
+        if extension is not None:
+            return extension  # Contenu déjà stocké
+        data, extension = _compress(content)
+        path = self.blob_path(digest, extension)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)  # Atomique : un lecteur ne voit jamais de blob partiel
+        return extension
+
+    def put(self, url: str, content: bytes, headers=None, status_code: int = 200) -> str:
+        """Enregistre le HTML brut de `url` (remplace la version précédente). Retourne le hash du contenu."""
+        digest = content_hash(content)
+        try:
+            extension = self._write_blob(digest, content)
+            with self._lock:
+                conn = self._get_conn()
+                with conn:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO raw_pages (url, content_hash, blob_extension, fetched_at, status_code, headers) "
+                        "VALUES (?, ?, ?, ?, ?, ?)",
+                        (url, digest, extension, time.time(), status_code, json.dumps(dict(headers or {})))
+                    )
+        except (OSError, sqlite3.Error) as e:
+            logging.error(f"Erreur lors de l'enregistrement de la page brute {url} : {e}")
+            return None
+        return digest
+
+    def get_entry(self, url: str):
+        """Entrée d'index de `url` ({"url", "content_hash", "blob_path", "fetched_at", "status_code", "headers"}), ou None."""
+        with self._lock:
+            row = self._get_conn().execute(
+                "SELECT url, content_hash, blob_extension, fetched_at, status_code, headers FROM raw_pages WHERE url = ?",
+                (url,)
+            ).fetchone()
+        return self._entry_from_row(row) if row else None
+
+    def get(self, url: str):
+        """HTML brut (octets) de la dernière version stockée de `url`, ou None."""
+        entry = self.get_entry(url)
+        if entry is None:
+            return None
+        try:
+            return read_blob(entry["blob_path"])
+        except (OSError, RuntimeError) as e:
+            logging.error(f"Page brute illisible pour {url} : {e}")
+            return None
+
+    def list_entries(self, url_like: str = None) -> list:
+        """Entrées de l'index (filtre LIKE optionnel sur l'URL, ex: '%indeed.com%')."""
+        sql = "SELECT url, content_hash, blob_extension, fetched_at, status_code, headers FROM raw_pages"
+        params = ()
+        if url_like:
+            sql += " WHERE url LIKE ?"
+            params = (url_like,)
+        with self._lock:
+            rows = self._get_conn().execute(sql, params).fetchall()
+        return [self._entry_from_row(row) for row in rows]
+
+    def _entry_from_row(self, row) -> dict:
+        url, digest, extension, fetched_at, status_code, headers_json = row
+        try:
+            headers = json.loads(headers_json) if headers_json else {}
+        except json.JSONDecodeError:
+            headers = {}
+        return {
+            "url": url,
+            "content_hash": digest,
+            "blob_path": self.blob_path(digest, extension),
+            "fetched_at": fetched_at,
+            "status_code": status_code,
+            "headers": headers,
+        }
+
+
+# Stockage partagé par le processus (scraping et ré-extraction)
+raw_page_store = RawPageStore(RAW_PAGES_DB_PATH, RAW_PAGES_DIR)
@@ -1,25 +1,43 @@
 # /mon_agent_reco_emploi/recommender_engine.py
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
-from text_processor import process_job_offer_text, get_text_embedding # get_text_embedding pour l'offre utilisateur
-from database_manager import load_job_offers_from_db
+from text_processor import process_job_offer_text, get_text_embedding, get_text_embeddings # get_text_embedding pour l'offre utilisateur
+from database_manager import load_job_offers_from_db, get_offers_index
+from embedding_index import EmbeddingIndex
 from config import TOP_N_RECOMMENDATIONS
 import logging
 from scraper_utils import clean_text
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+def _get_offers_index(all_offers_in_db: list = None):
+    """Index partagé du processus, ou index temporaire si une liste d'offres est fournie."""
+    if all_offers_in_db is None:
+        return get_offers_index()
+    # Liste fournie explicitement (tests, base factice) : index temporaire
+    index = EmbeddingIndex()
+    index.build(all_offers_in_db)
+    return index
+
+def _build_recommendation(offer, score: float) -> dict:
+    """Copie les métadonnées d'une offre gagnante et y ajoute son score (l'index n'est pas modifié)."""
+    recommended_offer = dict(offer) if isinstance(offer, dict) else offer.to_dict()
+    recommended_offer['similarity_score_title'] = score
+    return recommended_offer
+
 def get_recommendations(user_job_title: str, user_job_description: str, all_offers_in_db: list = None) -> list:
     """
     Recommande des offres d'emploi similaires UNIQUEMENT en se basant sur le titre.
     `user_job_description` est ignoré pour le calcul de similarité mais peut être utile
     pour l'extraction du titre si l'entrée utilisateur est une description complète.
+
+    Sans `all_offers_in_db`, la recherche utilise l'index d'embeddings partagé du processus,
+    construit une seule fois depuis la base puis mis à jour à chaque insertion.
+    Au-delà de ANN_MIN_OFFERS offres, cet index passe par une recherche approchée (ANN_BACKEND).
     """
-    if all_offers_in_db is None:
-        all_offers_in_db = load_job_offers_from_db()
+    index = _get_offers_index(all_offers_in_db)
 
-    if not all_offers_in_db:
-        logging.warning("La base de données d'offres est vide. Aucune recommandation possible.")
+    if len(index) == 0:
+        logging.warning("Aucune offre avec embedding de titre valide dans la base. Aucune recommandation possible.")
         return []
 
     # 1. Traiter le TITRE de l'offre de l'utilisateur pour obtenir son embedding
@@ -31,83 +49,52 @@ def get_recommendations(user_job_title: str, user_job_description: str, all_offe
         logging.warning("Le titre de l'offre utilisateur est vide après nettoyage. Aucune recommandation possible.")
         return []
         
-    user_title_embedding_np = get_text_embedding(cleaned_user_title)
-    user_title_embedding = np.array(user_title_embedding_np, dtype=np.float32).reshape(1, -1)
-    
+    user_title_embedding = np.asarray(get_text_embedding(cleaned_user_title), dtype=np.float32)
     logging.debug(f"User title embedding shape: {user_title_embedding.shape}")
 
-    # 2. Préparer les embeddings des titres des offres de la base
-    db_title_embeddings_lists = []
-    db_offers_data = [] 
-
-    expected_embedding_dim = user_title_embedding.shape[1]
-
-    for offer in all_offers_in_db:
-        # Le champ 'embedding' dans la DB est maintenant supposé être l'embedding du titre
-        if 'embedding' in offer and isinstance(offer['embedding'], list) and len(offer['embedding']) == expected_embedding_dim:
-            db_title_embeddings_lists.append(offer['embedding'])
-            db_offers_data.append(offer)
-        else:
-            actual_len = len(offer.get('embedding', [])) if isinstance(offer.get('embedding'), list) else 'N/A'
-            logging.warning(
-                f"Offre sans embedding de titre valide ou de dimension incorrecte ignorée : {offer.get('url', 'URL inconnue')}. "
-                f"Dim attendue: {expected_embedding_dim}, Dim trouvée: {actual_len}"
-            )
-            
-    if not db_offers_data:
-        logging.warning("Aucune offre avec embedding de titre valide trouvée dans la base. Aucune recommandation possible.")
-        return []
-
-    try:
-        db_title_embeddings_matrix = np.array(db_title_embeddings_lists, dtype=np.float32)
-    except ValueError as e:
-        logging.error(f"Erreur lors de la création de la matrice d'embeddings de titres de la BD : {e}")
-        return []
-
-    logging.debug(f"DB title embeddings matrix shape: {db_title_embeddings_matrix.shape}")
-
-    if db_title_embeddings_matrix.ndim != 2 or db_title_embeddings_matrix.shape[1] != expected_embedding_dim:
-        logging.error(
-            f"Problème de forme avec db_title_embeddings_matrix. "
-            f"Attendu: (N, {expected_embedding_dim}), Obtenu: {db_title_embeddings_matrix.shape}."
-        )
-        return []
-
-    # 3. Calculer la similarité cosinus entre les embeddings de titres
-    logging.info("Calcul des similarités cosinus sur les titres...")
-    cosine_similarities_titles = cosine_similarity(user_title_embedding, db_title_embeddings_matrix)
-    
-    similarity_scores = cosine_similarities_titles[0]
-
-    # 4. La combinaison de scores n'est plus nécessaire car on se base uniquement sur la similarité des titres.
-    # Les `similarity_scores` sont maintenant nos scores finaux.
-    for i, score in enumerate(similarity_scores):
-        db_offers_data[i]['similarity_score_title'] = float(score) # Renommer pour plus de clarté
-        # Supprimer les anciens champs de score si besoin, ou les laisser pour info si le dict le permet
-        db_offers_data[i].pop('similarity_score_semantic', None)
-        db_offers_data[i].pop('similarity_score_skills_jaccard', None)
-        db_offers_data[i].pop('similarity_score_combined', None)
-
+    # 2. Similarité cosinus (un produit matrice-vecteur) puis sélection top-k par argpartition
+    logging.info(f"Calcul des similarités cosinus sur les titres ({len(index)} offres indexées)...")
+    top_matches = index.search(user_title_embedding, TOP_N_RECOMMENDATIONS)
 
-    # 5. Obtenir les indices des offres les plus similaires par titre
-    sorted_indices = np.argsort(similarity_scores)[::-1]
-
-    # 6. Préparer la liste des recommandations
+    # 3. Seules les offres gagnantes sont matérialisées en recommandations
     recommendations = []
     logging.info(f"Les {TOP_N_RECOMMENDATIONS} meilleures recommandations (basées sur la similarité des titres):")
-    for i in range(min(TOP_N_RECOMMENDATIONS, len(sorted_indices))):
-        idx = sorted_indices[i]
-        recommended_offer = db_offers_data[idx]
+    for i, (offer, score) in enumerate(top_matches):
+        recommended_offer = _build_recommendation(offer, score)
         
         recommendations.append(recommended_offer)
         logging.info(
             f"  - Reco {i+1}: {recommended_offer.get('original_title', 'N/A')} "
             f"(URL: {recommended_offer.get('url', 'N/A')}) "
-            f"Score Similarité Titre: {recommended_offer.get('similarity_score_title', 0.0):.4f}"
+            f"Score Similarité Titre: {score:.4f}"
         )
         
     return recommendations
 
+def get_recommendations_batch(user_job_titles: list, all_offers_in_db: list = None, top_n: int = TOP_N_RECOMMENDATIONS) -> list:
+    """
+    Recommandations pour plusieurs titres à la fois (ex: alertes e-mail nocturnes).
+    Les titres sont encodés en un seul appel au modèle, puis scorés ensemble par un produit
+    matrice-matrice. Retourne une liste de recommandations par titre, dans l'ordre d'entrée
+    (liste vide pour un titre vide après nettoyage).
+    """
+    results = [[] for _ in user_job_titles]
+    index = _get_offers_index(all_offers_in_db)
+    if len(index) == 0:
+        logging.warning("Aucune offre avec embedding de titre valide dans la base. Aucune recommandation possible.")
+        return results
+
+    cleaned_titles = [clean_text(title) for title in user_job_titles]
+    positions = [i for i, title in enumerate(cleaned_titles) if title]
+    if not positions:
+        return results
+
+    logging.info(f"Recommandations groupées pour {len(positions)} titres ({len(index)} offres indexées)...")
+    embeddings = get_text_embeddings([cleaned_titles[i] for i in positions])
+    for position, matches in zip(positions, index.search_batch(embeddings, top_n)):
+        results[position] = [_build_recommendation(offer, score) for offer, score in matches]
+    return results
+
 if __name__ == '__main__':
     logging.getLogger().setLevel(logging.DEBUG) # Voir les logs DEBUG
 
@@ -0,0 +1,104 @@
+# /mon_agent_reco_emploi/recrawl.py
+"""
+Re-crawl des offres déjà en base : chaque page est re-téléchargée par une requête conditionnelle
+(ETag / Last-Modified enregistrés au crawl précédent). Une page inchangée (304) ne coûte ni
+téléchargement ni extraction ; les autres passent par le pipeline de scraping et seules les offres
+dont le contenu extrait a changé sont mises à jour en base.
+
+    python recrawl.py                          # toutes les offres en base
+    python recrawl.py --domain example.com     # seulement les URLs de ce domaine
+    python recrawl.py --limit 200 --dry-run    # compte les offres modifiées sans écrire en base
+
+La recherche (duckduckgo_retriever) écarte les URLs déjà en base : c'est ce script qui les revisite.
+"""
+import argparse
+import logging
+import time
+from functools import partial
+from config import SCRAPE_MAX_WORKERS
+from database_manager import iter_offers, update_job_offers_in_db, replace_embedding_store_rows
+from duckduckgo_retriever import extract_domain, scrape_urls_politely
+from reextract import changed_offers
+from scrape_pipeline import ScrapePipeline
+from scraper_utils import fetch_job_page, is_complete_extraction
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+def _stored_offer_urls(domain: str = None, limit: int = None) -> list:
+    urls = []
+    for offer in iter_offers(('url',)):
+        if domain and domain not in offer.url:
+            continue
+        urls.append(offer.url)
+        if limit and len(urls) >= limit:
+            break
+    return urls
+
+
+def recrawl_stored_offers(domain: str = None, limit: int = None, max_workers: int = SCRAPE_MAX_WORKERS,
+                          dry_run: bool = False) -> dict:
+    """
+    Re-télécharge (requêtes conditionnelles) les offres en base, ou celles de `domain`, et met à jour
+    les offres modifiées. Retourne les compteurs {"pages", "unchanged", "failed", "changed", "updated"}.
+    """
+    urls = _stored_offer_urls(domain, limit)
+    stats = {"pages": len(urls), "unchanged": 0, "failed": 0, "changed": 0, "updated": 0}
+    if not urls:
+        logging.info("Aucune offre à re-crawler.")
+        return stats
+
+    urls_grouped_by_domain = {}
+    for url in urls:
+        urls_grouped_by_domain.setdefault(extract_domain(url) or '', []).append({'url': url})
+    updated_urls = []
+    start_time = time.time()
+    logging.info(f"Re-crawl de {len(urls)} offres sur {len(urls_grouped_by_domain)} domaines.")
+
+    def fetched_pages():
+        # Requête conditionnelle même sans copie stockée : les validateurs suffisent à obtenir un 304
+        page_function = partial(fetch_job_page, conditional=True)
+        workers = min(max_workers, len(urls_grouped_by_domain))
+        for url_info, page in scrape_urls_politely(urls_grouped_by_domain, workers, page_function=page_function):
+            if page is not None and page.not_modified:
+                stats["unchanged"] += 1
+                page = None  # Contenu inchangé : rien à ré-extraire
+            yield url_info, page
+
+    def prepare_offer(url_info, offer):
+        # Échec du téléchargement ou de l'extraction : l'offre en base est conservée telle quelle
+        if not is_complete_extraction(offer):
+            stats["failed"] += 1
+            return None
+        return offer
+
+    def write_batch(offers):
+        changed = changed_offers(offers)
+        stats["changed"] += len(changed)
+        if not changed or dry_run:
+            return 0
+        # La matrice d'embeddings partagée n'est réécrite qu'une fois, à la fin
+        updated = update_job_offers_in_db(changed, refresh_embedding_store=False)
+        stats["updated"] += updated
+        updated_urls.extend(offer["url"] for offer in changed)
+        return updated
+
+    ScrapePipeline(write_batch=write_batch, prepare_offer=prepare_offer).run(fetched_pages(), urls_total=len(urls))
+    if updated_urls:
+        replace_embedding_store_rows(updated_urls)
+
+    logging.info(
+        f"Re-crawl terminé en {time.time() - start_time:.1f} s : {stats['unchanged']} pages inchangées (304), "
+        f"{stats['changed']} offres modifiées, {stats['updated']} mises à jour, {stats['failed']} échecs."
+    )
+    return stats
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Re-crawle les offres en base par requêtes conditionnelles.")
+    parser.add_argument("--domain", help="Ne traiter que les URLs contenant ce domaine")
+    parser.add_argument("--limit", type=int, help="Nombre maximal d'offres à re-crawler")
+    parser.add_argument("--workers", type=int, default=SCRAPE_MAX_WORKERS, help="Nombre de domaines téléchargés en parallèle")
+    parser.add_argument("--dry-run", action="store_true", help="Compter les offres modifiées sans écrire en base")
+    args = parser.parse_args()
+    recrawl_stored_offers(domain=args.domain, limit=args.limit, max_workers=args.workers, dry_run=args.dry_run)
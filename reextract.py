@@ -0,0 +1,119 @@
+# /mon_agent_reco_emploi/reextract.py
+"""
+Ré-extraction des offres depuis les pages HTML stockées (page_store), sans re-télécharger :
+à lancer après une amélioration de DOMAIN_RULES ou de l'extracteur.
+
+    python reextract.py                          # toutes les pages stockées
+    python reextract.py --domain indeed.com      # seulement les URLs de ce domaine
+    python reextract.py --workers 8 --dry-run    # compte les offres modifiées sans écrire en base
+
+Les pages sont ré-analysées en parallèle dans des processus (l'analyse HTML est limitée par le CPU) ;
+seules les offres dont le contenu extrait a changé sont mises à jour en base.
+"""
+import argparse
+import logging
+import time
+from concurrent.futures import ProcessPoolExecutor
+from config import REEXTRACT_WORKERS
+from page_store import raw_page_store, read_blob, stored_header
+from scraper_utils import extract_offer_from_html
+from scrape_pipeline import extract_mp_context
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Champs comparés à la base (clé du résultat d'extraction -> colonne de job_offers)
+COMPARED_FIELDS = {
+    "title": "original_title",
+    "description_full": "original_description",
+    "company": "company",
+    "location": "location",
+}
+# Valeurs de repli de l'extracteur : elles ne remplacent jamais une valeur existante
+NOT_FOUND_VALUES = ("Titre non trouvé", "Description non trouvée")
+# Pages traitées (comparées puis écrites en base) par lot
+REEXTRACT_BATCH_SIZE = 500
+
+
+def _reextract_entry(entry: dict):
+    """
+    Exécutée dans un processus du pool : relit le blob et ré-extrait l'offre.
+    Retourne (offre extraite, None) ou (None, message d'erreur).
+    """
+    try:
+        content = read_blob(entry["blob_path"])
+        return extract_offer_from_html(entry["url"], content, stored_header(entry["headers"], "Content-Type")), None
+    except Exception as e:
+        return None, f"{entry['url']} : {e}"
+
+
+def changed_offers(extracted_offers: list) -> list:
+    """Offres ré-extraites dont le contenu diffère de celui en base (offres absentes de la base ignorées)."""
+    # Import différé : les processus d'extraction n'ont pas à charger database_manager (et text_processor, l'index d'embeddings)
+    from database_manager import iter_offers
+
+    current = {
+        offer.url: offer
+        for offer in iter_offers(('url',) + tuple(COMPARED_FIELDS.values()), urls=[o["url"] for o in extracted_offers])
+    }
+    changed = []
+    for offer in extracted_offers:
+        stored = current.get(offer["url"])
+        if stored is None or offer["title"] in NOT_FOUND_VALUES or offer["description_full"] in NOT_FOUND_VALUES:
+            continue
+        if any(offer[field] != stored.get(column) for field, column in COMPARED_FIELDS.items()):
+            changed.append(offer)
+    return changed
+
+
+def reextract_stored_pages(domain: str = None, workers: int = REEXTRACT_WORKERS, dry_run: bool = False) -> dict:
+    """
+    Rejoue toutes les pages stockées (ou celles de `domain`) dans l'extracteur courant et met à jour
+    les offres modifiées. Retourne les compteurs {"pages", "failed", "changed", "updated"}.
+    """
+    from database_manager import update_job_offers_in_db, replace_embedding_store_rows
+
+    entries = raw_page_store.list_entries(f"%{domain}%" if domain else None)
+    stats = {"pages": len(entries), "failed": 0, "changed": 0, "updated": 0}
+    updated_urls = []
+    logging.info(f"Ré-extraction de {len(entries)} pages stockées ({workers or 'tous les'} processus).")
+    start_time = time.time()
+
+    def flush(batch):
+        changed = changed_offers(batch)
+        stats["changed"] += len(changed)
+        if changed and not dry_run:
+            # La matrice d'embeddings partagée n'est réécrite qu'une fois, à la fin
+            stats["updated"] += update_job_offers_in_db(changed, refresh_embedding_store=False)
+            updated_urls.extend(offer["url"] for offer in changed)
+
+    batch = []
+    with ProcessPoolExecutor(max_workers=workers, mp_context=extract_mp_context()) as executor:
+        for offer, error in executor.map(_reextract_entry, entries, chunksize=32):
+            if error:
+                stats["failed"] += 1
+                logging.error(f"Ré-extraction impossible pour {error}")
+                continue
+            batch.append(offer)
+            if len(batch) >= REEXTRACT_BATCH_SIZE:
+                flush(batch)
+                batch = []
+        if batch:
+            flush(batch)
+    if updated_urls:
+        replace_embedding_store_rows(updated_urls)
+
+    elapsed = time.time() - start_time
+    logging.info(
+        f"Ré-extraction terminée en {elapsed:.1f} s ({len(entries) / max(elapsed, 1e-6):.0f} pages/s) : "
+        f"{stats['changed']} offres modifiées, {stats['updated']} mises à jour, {stats['failed']} échecs."
+    )
+    return stats
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Ré-extrait les offres depuis les pages HTML stockées.")
+    parser.add_argument("--domain", help="Ne traiter que les URLs contenant ce domaine")
+    parser.add_argument("--workers", type=int, default=REEXTRACT_WORKERS, help="Nombre de processus d'extraction")
+    parser.add_argument("--dry-run", action="store_true", help="Compter les offres modifiées sans écrire en base")
+    args = parser.parse_args()
+    reextract_stored_pages(domain=args.domain, workers=args.workers, dry_run=args.dry_run)
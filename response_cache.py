@@ -0,0 +1,146 @@
+# /mon_agent_reco_emploi/response_cache.py
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+def normalize_prompt(prompt: str) -> str:
+    """
+    Normalise un prompt avant hachage : forme Unicode NFC et espaces ignorés.
+    La casse est conservée : le prompt contient des URLs et des titres d'offres où elle est significative.
+    """
+    prompt = unicodedata.normalize('NFC', prompt or '')
+    return re.sub(r'\s+', ' ', prompt).strip()
+
+
+def response_cache_key(model_name: str, prompt: str) -> str:
+    """Clé de cache : empreinte SHA-256 du nom du modèle et du prompt normalisé."""
+    return hashlib.sha256(f"{model_name}\0{normalize_prompt(prompt)}".encode('utf-8')).hexdigest()
+
+
+class ResponseCache:
+    """
+    Cache des réponses du LLM indexé par le prompt normalisé et le nom du modèle.
+    Les entrées expirent après `ttl_seconds` ; au-delà de `max_items`, les moins récemment
+    utilisées sont évincées (en mémoire comme sur disque). La base SQLite permet de resservir
+    les requêtes populaires d'une exécution du CLI à l'autre.
+    """
+
+    def __init__(self, db_path: str, model_name: str, ttl_seconds: float, max_items: int = 1000):
+        self.db_path = db_path
+        self.model_name = model_name
+        self.ttl_seconds = ttl_seconds
+        self.max_items = max_items
+        self._memory = OrderedDict()  # clé -> (réponse, instant de création)
+        # Dernier usage des entrées servies depuis la mémoire, reporté sur disque avant la prochaine éviction
+        self._memory_hits = {}
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _get_conn(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    model TEXT,
+                    response TEXT,
+                    created_at REAL,
+                    last_used_at REAL
+                )
+            ''')
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_last_used ON responses (last_used_at)")
+            self._conn.commit()
+        return self._conn
+
+    def _is_expired(self, created_at: float, now: float) -> bool:
+        return now - created_at > self.ttl_seconds
+
+    def _remember(self, key: str, response: str, created_at: float):
+        self._memory[key] = (response, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_items:
+            self._memory.popitem(last=False)
+
+    def get(self, prompt: str):
+        """Retourne la réponse en cache pour `prompt`, ou None (absente ou expirée)."""
+        key = response_cache_key(self.model_name, prompt)
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                response, created_at = entry
+                if not self._is_expired(created_at, now):
+                    self._memory.move_to_end(key)
+                    self._memory_hits[key] = now
+                    return response
+                del self._memory[key]
+
+            try:
+                conn = self._get_conn()
+                row = conn.execute(
+                    "SELECT response, created_at FROM responses WHERE key = ? AND model = ?",
+                    (key, self.model_name)
+                ).fetchone()
+                if row is None:
+                    return None
+                response, created_at = row
+                with conn:
+                    if self._is_expired(created_at, now):
+                        conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                        return None
+                    conn.execute("UPDATE responses SET last_used_at = ? WHERE key = ?", (now, key))
+            except sqlite3.Error as e:
+                logging.error(f"Erreur de lecture du cache des réponses Groq : {e}")
+                return None
+            self._remember(key, response, created_at)
+            return response
+
+    def put(self, prompt: str, response: str):
+        """Mémorise la réponse du LLM pour `prompt` (mémoire et disque)."""
+        if not response:
+            return
+        key = response_cache_key(self.model_name, prompt)
+        now = time.time()
+        with self._lock:
+            self._remember(key, response, now)
+            try:
+                conn = self._get_conn()
+                with conn:
+                    if self._memory_hits:
+                        conn.executemany("UPDATE responses SET last_used_at = ? WHERE key = ?",
+                                         [(used_at, hit_key) for hit_key, used_at in self._memory_hits.items()])
+                        self._memory_hits.clear()
+                    conn.execute(
+                        "INSERT OR REPLACE INTO responses (key, model, response, created_at, last_used_at) VALUES (?, ?, ?, ?, ?)",
+                        (key, self.model_name, response, now, now)
+                    )
+                    # Éviction : entrées expirées, puis les moins récemment utilisées au-delà de max_items
+                    conn.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl_seconds,))
+                    conn.execute(
+                        "DELETE FROM responses WHERE key IN ("
+                        "SELECT key FROM responses ORDER BY last_used_at DESC LIMIT -1 OFFSET ?)",
+                        (self.max_items,)
+                    )
+            except sqlite3.Error as e:
+                logging.error(f"Erreur d'écriture dans le cache des réponses Groq : {e}")
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._memory_hits.clear()
+            try:
+                conn = self._get_conn()
+                with conn:
+                    conn.execute("DELETE FROM responses")
+            except sqlite3.Error as e:
+                logging.error(f"Erreur lors du vidage du cache des réponses Groq : {e}")
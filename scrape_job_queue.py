@@ -0,0 +1,232 @@
+# /mon_agent_reco_emploi/scrape_job_queue.py
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from config import SCRAPE_JOBS_DB_PATH, SCRAPE_JOB_WORKERS
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# États d'une tâche de scraping
+STATUS_QUEUED = "queued"
+STATUS_RUNNING = "running"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+
+_JOB_COLUMNS = ("id", "query", "status", "created_at", "started_at", "finished_at",
+                "urls_total", "urls_done", "offers_added", "error")
+
+
+def _process_start_time(pid):
+    """
+    Instant de démarrage du processus `pid` (tops d'horloge depuis le boot, lu dans /proc), ou None si inconnu.
+    Hors Linux (pas de /proc : macOS, Windows), toujours None : la vivacité d'une tâche n'est alors
+    vérifiée que par son PID, sans détecter un PID réattribué à un autre processus.
+    """
+    try:
+        with open(f"/proc/{pid}/stat", "rb") as f:
+            stat = f.read()
+    except OSError:
+        return None
+    # Le nom du processus (2e champ, entre parenthèses) peut contenir des espaces : on découpe après lui
+    fields = stat[stat.rfind(b")") + 2:].split()
+    return fields[19].decode() if len(fields) > 19 else None
+
+
+def _pid_exists(pid: int) -> bool:
+    """Vrai si un processus `pid` existe."""
+    if os.name == 'nt':
+        # Sous Windows, os.kill(pid, 0) enverrait CTRL_C_EVENT : on ouvre le processus pour lire son état
+        import ctypes
+        kernel32 = ctypes.WinDLL('kernel32', use_last_error=True)
+        handle = kernel32.OpenProcess(0x1000, False, pid)  # PROCESS_QUERY_LIMITED_INFORMATION
+        if not handle:
+            return ctypes.get_last_error() == 5  # ERROR_ACCESS_DENIED : processus existant d'un autre utilisateur
+        try:
+            exit_code = ctypes.c_ulong()
+            return bool(kernel32.GetExitCodeProcess(handle, ctypes.byref(exit_code))) and exit_code.value == 259  # STILL_ACTIVE
+        finally:
+            kernel32.CloseHandle(handle)
+    try:
+        os.kill(pid, 0)  # Signal 0 : teste l'existence du processus sans l'affecter
+    except ProcessLookupError:
+        return False
+    except (PermissionError, OSError):
+        pass  # Processus existant (autre utilisateur)
+    return True
+
+
+# Identité de chaque processus, enregistrée sur chaque tâche qu'il prend en charge. Le PID seul ne suffit pas :
+# dans un conteneur, le serveur est le PID 1 à chaque redémarrage. Le token contient aussi l'instant de
+# démarrage du processus (comparé à celui du PID encore vivant) et un identifiant aléatoire.
+# Calculé à la demande et par PID : des workers forkés après l'import (gunicorn --preload) ont chacun le leur.
+_process_tokens = {}
+
+
+def process_token() -> str:
+    pid = os.getpid()
+    token = _process_tokens.get(pid)
+    if token is None:
+        token = _process_tokens.setdefault(pid, f"{pid}:{_process_start_time(pid) or ''}:{uuid.uuid4().hex}")
+    return token
+
+
+def _worker_is_alive(worker_token, worker_pid) -> bool:
+    """Vrai si le processus qui a pris la tâche tourne encore (token, ou PID seul pour les anciennes tâches)."""
+    if worker_token == process_token():
+        return True
+    start_time = None
+    if worker_token:
+        pid, start_time, _ = worker_token.split(":", 2)
+        worker_pid = int(pid)
+    if not worker_pid or worker_pid == os.getpid():
+        # Notre PID mais pas notre token : tâche d'une exécution précédente de ce processus
+        return False
+    if not _pid_exists(worker_pid):
+        return False
+    # PID réattribué à un autre processus depuis la prise de la tâche (vérifiable seulement avec /proc)
+    current_start_time = _process_start_time(worker_pid)
+    return not (start_time and current_start_time and current_start_time != start_time)
+
+
+class ScrapeJobQueue:
+    """
+    File de tâches de scraping exécutées en arrière-plan par un pool de threads.
+    L'état de chaque tâche (progression, nombre d'offres ajoutées, erreur) est persisté dans
+    une table SQLite : il reste consultable après la fin de la tâche et d'un processus à l'autre.
+    Une même requête déjà en attente ou en cours n'est pas relancée : son identifiant est réutilisé.
+    """
+
+    def __init__(self, db_path: str, max_workers: int = 1, scrape_function=None):
+        self.db_path = db_path
+        self.max_workers = max_workers
+        self._scrape_function = scrape_function
+        self._lock = threading.Lock()
+        self._conn = None
+        self._executor = None
+
+    def _get_conn(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS scrape_jobs (
+                    id TEXT PRIMARY KEY,
+                    query TEXT,
+                    status TEXT,
+                    created_at REAL,
+                    started_at REAL,
+                    finished_at REAL,
+                    urls_total INTEGER DEFAULT 0,
+                    urls_done INTEGER DEFAULT 0,
+                    offers_added INTEGER DEFAULT 0,
+                    error TEXT,
+                    worker_pid INTEGER,
+                    worker_token TEXT
+                )
+            ''')
+            existing_columns = {row[1] for row in self._conn.execute("PRAGMA table_info(scrape_jobs)")}
+            if 'worker_token' not in existing_columns:
+                self._conn.execute("ALTER TABLE scrape_jobs ADD COLUMN worker_token TEXT")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_scrape_jobs_status ON scrape_jobs (status)")
+            self._fail_orphaned_jobs()
+            self._conn.commit()
+        return self._conn
+
+    def _fail_orphaned_jobs(self):
+        """Marque en échec les tâches dont le processus a disparu (arrêt ou redémarrage du serveur)."""
+        rows = self._conn.execute(
+            "SELECT id, worker_pid, worker_token FROM scrape_jobs WHERE status IN (?, ?)", (STATUS_QUEUED, STATUS_RUNNING)
+        ).fetchall()
+        orphaned = [job_id for job_id, worker_pid, worker_token in rows if not _worker_is_alive(worker_token, worker_pid)]
+        if orphaned:
+            self._conn.executemany(
+                "UPDATE scrape_jobs SET status = ?, error = ?, finished_at = ? WHERE id = ?",
+                [(STATUS_FAILED, "Interrompue par un arrêt du serveur.", time.time(), job_id) for job_id in orphaned]
+            )
+            logging.warning(f"{len(orphaned)} tâche(s) de scraping interrompue(s) marquée(s) en échec.")
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="scrape-job")
+        return self._executor
+
+    def _update(self, job_id: str, **fields):
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock:
+            conn = self._get_conn()
+            with conn:
+                conn.execute(f"UPDATE scrape_jobs SET {assignments} WHERE id = ?", list(fields.values()) + [job_id])
+
+    def submit(self, query: str) -> str:
+        """Met en file une tâche de scraping pour `query` et retourne son identifiant (immédiatement)."""
+        with self._lock:
+            conn = self._get_conn()
+            rows = conn.execute(
+                "SELECT id, worker_pid, worker_token FROM scrape_jobs WHERE query = ? AND status IN (?, ?) ORDER BY created_at DESC",
+                (query, STATUS_QUEUED, STATUS_RUNNING)
+            ).fetchall()
+            for existing_id, worker_pid, worker_token in rows:
+                # Une tâche d'un processus disparu depuis l'ouverture de la file (autre worker arrêté) n'est pas réutilisée
+                if _worker_is_alive(worker_token, worker_pid):
+                    logging.info(f"Tâche de scraping déjà en cours pour '{query}' : {existing_id}")
+                    return existing_id
+            if rows:
+                self._fail_orphaned_jobs()
+            job_id = uuid.uuid4().hex
+            with conn:
+                conn.execute(
+                    "INSERT INTO scrape_jobs (id, query, status, created_at, worker_pid, worker_token) VALUES (?, ?, ?, ?, ?, ?)",
+                    (job_id, query, STATUS_QUEUED, time.time(), os.getpid(), process_token())
+                )
+        self._get_executor().submit(self._run, job_id, query)
+        logging.info(f"Tâche de scraping {job_id} mise en file pour '{query}'")
+        return job_id
+
+    def _run(self, job_id: str, query: str):
+        self._update(job_id, status=STATUS_RUNNING, started_at=time.time(), worker_pid=os.getpid(), worker_token=process_token())
+
+        def report_progress(urls_done, urls_total, offers_added):
+            self._update(job_id, urls_done=urls_done, urls_total=urls_total, offers_added=offers_added)
+
+        try:
+            scrape_function = self._scrape_function
+            if scrape_function is None:
+                # Import différé : le module de recherche (et ses dépendances) n'est chargé qu'à la première tâche
+                from duckduckgo_retriever import search_and_scrape_jobs as scrape_function
+            offers_added = scrape_function(query, progress_callback=report_progress)
+            self._update(job_id, status=STATUS_DONE, offers_added=offers_added or 0, finished_at=time.time())
+            logging.info(f"Tâche de scraping {job_id} terminée : {offers_added} nouvelles offres.")
+        except Exception as e:
+            logging.exception(f"Échec de la tâche de scraping {job_id}")
+            self._update(job_id, status=STATUS_FAILED, error=str(e), finished_at=time.time())
+
+    def get(self, job_id: str):
+        """État d'une tâche (dictionnaire), ou None si l'identifiant est inconnu."""
+        with self._lock:
+            row = self._get_conn().execute(
+                f"SELECT {', '.join(_JOB_COLUMNS)} FROM scrape_jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        return dict(zip(_JOB_COLUMNS, row)) if row else None
+
+    def shutdown(self, wait: bool = True):
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+            self._executor = None
+
+
+# File partagée par le processus (serveur Flask)
+_shared_queue = None
+_shared_queue_lock = threading.Lock()
+
+
+def get_scrape_job_queue() -> ScrapeJobQueue:
+    global _shared_queue
+    if _shared_queue is None:
+        with _shared_queue_lock:
+            if _shared_queue is None:
+                _shared_queue = ScrapeJobQueue(SCRAPE_JOBS_DB_PATH, SCRAPE_JOB_WORKERS)
+    return _shared_queue
@@ -0,0 +1,298 @@
+# /mon_agent_reco_emploi/scrape_pipeline.py
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+from config import SCRAPE_EXTRACT_WORKERS, SCRAPE_EXTRACT_START_METHOD, SCRAPE_PIPELINE_QUEUE_SIZE, SCRAPE_DB_BATCH_SIZE
+from scraper_utils import extract_fetched_page, scrape_error_result, remember_page_validators
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Marqueur de fin de flux entre deux étapes
+_END = object()
+
+
+def _timed_extract(page):
+    """Exécutée dans un processus d'extraction : (offre extraite, durée de l'extraction en secondes)."""
+    start = time.perf_counter()
+    return extract_fetched_page(page), time.perf_counter() - start
+
+
+class StageCounters:
+    """Compteurs d'une étape du pipeline : éléments traités, erreurs, temps actif et temps bloqué."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.processed = 0
+        self.errors = 0
+        self.busy_seconds = 0.0  # Temps passé à travailler (téléchargement, extraction, écriture en base)
+        self.blocked_seconds = 0.0  # Temps passé à attendre l'étape suivante (contre-pression)
+        self._lock = threading.Lock()
+
+    def record(self, processed: int = 1, errors: int = 0, busy_seconds: float = 0.0, blocked_seconds: float = 0.0):
+        with self._lock:
+            self.processed += processed
+            self.errors += errors
+            self.busy_seconds += busy_seconds
+            self.blocked_seconds += blocked_seconds
+
+    def snapshot(self, elapsed: float) -> dict:
+        with self._lock:
+            return {
+                "processed": self.processed,
+                "errors": self.errors,
+                "busy_seconds": round(self.busy_seconds, 3),
+                "blocked_seconds": round(self.blocked_seconds, 3),
+                "per_second": round(self.processed / elapsed, 2) if elapsed > 0 else 0.0,
+            }
+
+
+# Pool de processus d'extraction partagé par les crawls du processus (créé par start_extract_executor au
+# démarrage du serveur, sinon à la première utilisation)
+_extract_executor = None
+_extract_executor_pid = None
+_extract_executor_lock = threading.Lock()
+
+
+def extract_mp_context():
+    """Contexte multiprocessing des processus d'extraction (SCRAPE_EXTRACT_START_METHOD, "spawn" si indisponible)."""
+    method = SCRAPE_EXTRACT_START_METHOD
+    if method not in multiprocessing.get_all_start_methods():
+        method = "spawn"
+    context = multiprocessing.get_context(method)
+    if method == "forkserver":
+        # Modules importés une fois par le serveur de fork : chaque processus d'extraction en hérite déjà chargés
+        context.set_forkserver_preload(["scraper_utils"])
+    return context
+
+
+def get_extract_executor():
+    """Pool de processus d'extraction, ou None si SCRAPE_EXTRACT_WORKERS vaut 0 (extraction dans le pipeline)."""
+    global _extract_executor, _extract_executor_pid
+    if SCRAPE_EXTRACT_WORKERS == 0:
+        return None
+    # Un pool hérité par fork (ex: gunicorn --preload) n'a pas son thread de gestion : on en recrée un
+    if _extract_executor is None or _extract_executor_pid != os.getpid():
+        with _extract_executor_lock:
+            if _extract_executor is None or _extract_executor_pid != os.getpid():
+                _extract_executor = ProcessPoolExecutor(max_workers=SCRAPE_EXTRACT_WORKERS, mp_context=extract_mp_context())
+                _extract_executor_pid = os.getpid()
+    return _extract_executor
+
+
+def start_extract_executor():
+    """
+    Crée le pool d'extraction au démarrage du serveur (thread principal) et lance ses processus,
+    plutôt que depuis le thread d'une requête au premier crawl.
+    """
+    executor = get_extract_executor()
+    if executor is not None:
+        executor.submit(os.getpid).result()
+    return executor
+
+
+def _reset_extract_executor(broken_executor):
+    """Remplace un pool cassé (processus d'extraction tué) : il sera recréé à la prochaine utilisation."""
+    global _extract_executor
+    with _extract_executor_lock:
+        if _extract_executor is broken_executor:
+            _extract_executor = None
+    broken_executor.shutdown(wait=False)
+
+
+class ScrapePipeline:
+    """
+    Pipeline de scraping en trois étapes reliées par des files bornées :
+
+      téléchargement (threads, I/O)  -> file -> extraction (processus, CPU) -> file -> écriture en base (par lots)
+
+    Les threads de téléchargement ne font plus que du réseau ; l'analyse HTML et l'extraction tournent
+    dans un pool de processus (tous les cœurs, sans GIL partagé) ; un seul thread écrit en base par lots.
+    Contre-pression : si l'extraction ou l'écriture prend du retard, les files se remplissent et
+    l'étape précédente se bloque au lieu d'accumuler des pages en mémoire.
+    """
+
+    def __init__(self, write_batch, prepare_offer=None, extract_executor=None,
+                 queue_size: int = SCRAPE_PIPELINE_QUEUE_SIZE, db_batch_size: int = SCRAPE_DB_BATCH_SIZE):
+        """
+        `write_batch(offers) -> int` insère un lot d'offres et retourne le nombre d'offres ajoutées.
+        `prepare_offer(url_info, offer)` complète ou rejette (None) une offre extraite avant l'écriture.
+        """
+        self._write_batch = write_batch
+        self._prepare_offer = prepare_offer
+        self._executor = extract_executor
+        self._max_extract_in_flight = queue_size
+        self.db_batch_size = db_batch_size
+        self._fetch_queue = queue.Queue(maxsize=queue_size)
+        self._write_queue = queue.Queue(maxsize=queue_size)
+        self.counters = {name: StageCounters(name) for name in ("fetch", "extract", "write")}
+        self.urls_done = 0
+        self.offers_added = 0
+        self._started_at = None
+
+    def stats(self) -> dict:
+        """Compteurs par étape et occupation des files (consultable pendant l'exécution)."""
+        elapsed = time.monotonic() - self._started_at if self._started_at else 0.0
+        stats = {name: counters.snapshot(elapsed) for name, counters in self.counters.items()}
+        stats["fetch_queue"] = self._fetch_queue.qsize()
+        stats["write_queue"] = self._write_queue.qsize()
+        stats["elapsed_seconds"] = round(elapsed, 3)
+        return stats
+
+    def _put(self, target_queue: queue.Queue, item, consumer: threading.Thread) -> float:
+        """Put bloquant (contre-pression) qui échoue si l'étape consommatrice s'est arrêtée. Retourne l'attente."""
+        start = time.perf_counter()
+        while True:
+            try:
+                target_queue.put(item, timeout=0.5)
+                return time.perf_counter() - start
+            except queue.Full:
+                if not consumer.is_alive():
+                    raise RuntimeError(f"Étape du pipeline de scraping arrêtée ({consumer.name})")
+
+    def _put_end(self, target_queue: queue.Queue, consumer: threading.Thread):
+        """
+        Envoie la fin de flux à l'étape suivante sans jamais lever : appelé pendant l'arrêt du pipeline,
+        il ne doit pas masquer l'exception d'origine (une étape déjà arrêtée n'a plus à la recevoir).
+        """
+        try:
+            self._put(target_queue, _END, consumer)
+        except RuntimeError as e:
+            logging.warning(f"{e} : fin de flux non transmise.")
+
+    def run(self, fetched_pages, urls_total: int = None, progress_callback=None) -> int:
+        """
+        Fait passer les pages téléchargées (itérable de couples (url_info, FetchedPage ou None), produits
+        au fil de l'eau par les threads de téléchargement) par l'extraction puis l'écriture en base.
+        `progress_callback(urls_done, urls_total, offers_added)` est appelé après chaque page traitée.
+        Retourne le nombre d'offres ajoutées.
+        """
+        self._started_at = time.monotonic()
+        if self._executor is None:
+            self._executor = get_extract_executor()
+        writer = threading.Thread(target=self._write_stage, args=(urls_total, progress_callback),
+                                  name="scrape-pipeline-write", daemon=True)
+        extractor = threading.Thread(target=self._extract_stage, args=(writer,),
+                                     name="scrape-pipeline-extract", daemon=True)
+        writer.start()
+        extractor.start()
+        fetch_counters = self.counters["fetch"]
+        try:
+            for url_info, page in fetched_pages:
+                failed = page is not None and page.fallback is not None
+                fetch_counters.record(errors=int(failed), busy_seconds=page.fetch_seconds if page is not None else 0.0,
+                                      blocked_seconds=self._put(self._fetch_queue, (url_info, page), extractor))
+        finally:
+            self._put_end(self._fetch_queue, extractor)
+            extractor.join()
+            writer.join()
+            stats = self.stats()
+            logging.info(
+                f"Pipeline de scraping terminé en {stats['elapsed_seconds']:.1f} s : "
+                + ", ".join(f"{name} {stats[name]['processed']} ({stats[name]['per_second']}/s, "
+                            f"{stats[name]['errors']} erreurs, bloqué {stats[name]['blocked_seconds']} s)"
+                            for name in self.counters)
+            )
+        return self.offers_added
+
+    def _extract_stage(self, writer: threading.Thread):
+        """Thread de répartition : envoie les pages au pool de processus et transmet les offres à l'écriture."""
+        in_flight = {}  # future -> (url_info, page)
+        input_done = False
+        try:
+            while not input_done or in_flight:
+                # Assez de pages en cours d'extraction (ou plus rien à lire) : attendre qu'une se termine
+                if in_flight and (input_done or len(in_flight) >= self._max_extract_in_flight):
+                    done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    self._forward_extracted(done, in_flight, writer)
+                    continue
+                try:
+                    item = self._fetch_queue.get(timeout=0.05 if in_flight else None)
+                except queue.Empty:
+                    self._forward_extracted([future for future in in_flight if future.done()], in_flight, writer)
+                    continue
+                if item is _END:
+                    input_done = True
+                    continue
+
+                url_info, page = item
+                if page is None or page.fallback is not None:
+                    # Page inchangée (304) ou échec du téléchargement : rien à extraire
+                    self._forward(url_info, page.fallback if page else None, writer)
+                elif self._executor is None:
+                    offer, seconds = _timed_extract(page)
+                    self.counters["extract"].record(busy_seconds=seconds)
+                    remember_page_validators(page, offer)
+                    self._forward(url_info, offer, writer)
+                else:
+                    self._submit(page, url_info, in_flight, writer)
+                self._forward_extracted([future for future in in_flight if future.done()], in_flight, writer)
+        finally:
+            self._put_end(self._write_queue, writer)
+
+    def _submit(self, page, url_info, in_flight: dict, writer: threading.Thread):
+        try:
+            in_flight[self._executor.submit(_timed_extract, page)] = (url_info, page)
+        except BrokenProcessPool:
+            logging.error("Pool d'extraction cassé : il est recréé.")
+            _reset_extract_executor(self._executor)
+            self._executor = get_extract_executor()
+            if self._executor is None:
+                offer, seconds = _timed_extract(page)
+                self.counters["extract"].record(busy_seconds=seconds)
+                remember_page_validators(page, offer)
+                self._forward(url_info, offer, writer)
+            else:
+                in_flight[self._executor.submit(_timed_extract, page)] = (url_info, page)
+
+    def _forward_extracted(self, done, in_flight: dict, writer: threading.Thread):
+        for future in done:
+            url_info, page = in_flight.pop(future)
+            try:
+                offer, seconds = future.result()
+                self.counters["extract"].record(busy_seconds=seconds)
+                # Validateurs HTTP enregistrés dans ce processus (pas dans le processus d'extraction)
+                remember_page_validators(page, offer)
+            except Exception as e:
+                logging.error(f"Erreur d'extraction pour {page.url}: {e}")
+                self.counters["extract"].record(errors=1)
+                offer = scrape_error_result(page.url)
+            self._forward(url_info, offer, writer)
+
+    def _forward(self, url_info, offer, writer: threading.Thread):
+        self.counters["extract"].record(processed=0, blocked_seconds=self._put(self._write_queue, (url_info, offer), writer))
+
+    def _write_stage(self, urls_total: int, progress_callback):
+        """Thread d'écriture : insère les offres par lots de `db_batch_size` (un encodage et un commit par lot)."""
+        pending_offers = []
+        while True:
+            item = self._write_queue.get()
+            if item is _END:
+                break
+            url_info, offer = item
+            if offer is not None and self._prepare_offer is not None:
+                offer = self._prepare_offer(url_info, offer)
+            if offer is not None:
+                pending_offers.append(offer)
+            self.urls_done += 1
+            if len(pending_offers) >= self.db_batch_size or self.urls_done == urls_total:
+                self._flush(pending_offers)
+                pending_offers = []
+            if progress_callback:
+                progress_callback(self.urls_done, urls_total, self.offers_added)
+        self._flush(pending_offers)
+
+    def _flush(self, offers: list):
+        if not offers:
+            return
+        start = time.perf_counter()
+        try:
+            self.offers_added += self._write_batch(offers)
+            self.counters["write"].record(processed=len(offers), busy_seconds=time.perf_counter() - start)
+        except Exception as e:
+            logging.error(f"Erreur lors de l'écriture d'un lot de {len(offers)} offres scrapées : {e}")
+            self.counters["write"].record(processed=len(offers), errors=len(offers), busy_seconds=time.perf_counter() - start)
@@ -1,10 +1,15 @@
 import requests
-from bs4 import BeautifulSoup
 import logging
 import re
 from urllib.parse import urlparse
-import time
 import random
+import time
+from crawl_scheduler import get_scheduler
+import http_client
+from html_extractor import ParsedPage, LAYOUT_TAGS
+from page_store import raw_page_store, stored_header
+from domain_rule_registry import DomainRuleRegistry
+from config import RAW_PAGE_STORE_ENABLED, DOMAIN_RULES_FILE, DOMAIN_RULES_RELOAD_SECONDS
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
@@ -42,6 +47,10 @@ DOMAIN_RULES = {
     # Ajoutez d'autres sites selon vos besoins
 }
 
+# Registre des règles utilisé par l'extraction : DOMAIN_RULES + règles apprises (domain_rules.json),
+# sélecteurs compilés au chargement et rechargés quand le fichier change
+domain_rules = DomainRuleRegistry(DOMAIN_RULES_FILE, DOMAIN_RULES, check_interval=DOMAIN_RULES_RELOAD_SECONDS)
+
 # Expressions régulières pour identifier des sections communes
 # Ces patterns peuvent aider à extraire des informations même sans règles spécifiques au domaine
 COMMON_PATTERNS = {
@@ -58,22 +67,12 @@ COMMON_PATTERNS = {
 }
 
 def get_element_text(soup, selectors):
-    """Tente d'extraire le texte en utilisant une liste de sélecteurs"""
-    for selector in selectors:
-        try:
-            if selector.startswith('//'):  # XPath
-                import lxml.html
-                dom = lxml.html.fromstring(str(soup))
-                elements = dom.xpath(selector)
-                if elements:
-                    return ' '.join(el.text_content().strip() for el in elements if el.text_content().strip())
-            else:  # CSS
-                element = soup.select_one(selector)
-                if element:
-                    return element.get_text(strip=True)
-        except Exception as e:
-            logging.info(f"Erreur avec le sélecteur {selector}: {e}")
-    return None
+    """
+    Tente d'extraire le texte en utilisant une liste de sélecteurs (CSS ou XPath).
+    L'arbre n'est sérialisé et analysé qu'une seule fois pour tous les sélecteurs ;
+    préférer ParsedPage.select_text quand la page est déjà analysée.
+    """
+    return ParsedPage(str(soup)).select_text(selectors)
 
 def extract_with_patterns(text, patterns):
     """Tente d'extraire des informations en utilisant des expressions régulières"""
@@ -83,31 +82,6 @@ def extract_with_patterns(text, patterns):
             return match.group(1).strip()
     return None
 
-def find_longest_text_block(soup, min_length=100, excluded_tags=None):
-    """Trouve le bloc de texte le plus long dans la page"""
-    if excluded_tags is None:
-        excluded_tags = ['script', 'style', 'header', 'footer', 'nav']
-    
-    # Exclure certaines balises
-    for tag in excluded_tags:
-        for element in soup.find_all(tag):
-            element.decompose()
-    
-    # Trouver tous les éléments de texte
-    text_elements = []
-    for tag in ['div', 'article', 'section', 'main']:
-        for element in soup.find_all(tag):
-            text = element.get_text(strip=True)
-            if len(text) >= min_length:
-                text_elements.append((element, len(text)))
-    
-    # Trier par longueur de texte
-    text_elements.sort(key=lambda x: x[1], reverse=True)
-    
-    if text_elements:
-        return text_elements[0][0].get_text(separator='\n', strip=True)
-    return None
-
 def clean_text(text):
     """Nettoie le texte en supprimant les espaces multiples, etc."""
     if not text:
@@ -118,6 +92,11 @@ def clean_text(text):
     text = re.sub(r'\s+', ' ', text)
     return text.strip()
 
+def get_declared_charset(content_type):
+    """Encodage explicitement déclaré dans l'en-tête Content-Type (None sinon)."""
+    match = re.search(r'charset\s*=\s*["\']?([\w\-]+)', content_type or '', re.IGNORECASE)
+    return match.group(1) if match else None
+
 def get_domain(url):
     """Extrait le domaine principal d'une URL"""
     parsed_url = urlparse(url)
@@ -129,7 +108,18 @@ def get_domain(url):
     return domain
 
 def extract_job_details(soup, url):
-    """Extrait les détails de l'offre d'emploi en fonction du domaine ou de façon générique"""
+    """
+    Extrait les détails de l'offre d'emploi à partir d'un objet BeautifulSoup.
+    Conservée pour compatibilité : la page est analysée une fois avec lxml puis traitée
+    par extract_job_details_from_page.
+    """
+    return extract_job_details_from_page(ParsedPage(str(soup)), url)
+
+def extract_job_details_from_page(page: ParsedPage, url):
+    """
+    Extrait les détails de l'offre d'emploi en fonction du domaine ou de façon générique.
+    Tout le travail se fait sur l'arbre lxml déjà analysé de `page` (aucune ré-analyse).
+    """
     domain = get_domain(url)
     result = {
         "title": None,
@@ -138,48 +128,57 @@ def extract_job_details(soup, url):
         "location": None
     }
     
-    # Utiliser des règles spécifiques au domaine si disponibles
-    rules = DOMAIN_RULES.get(domain)
+    # Utiliser des règles spécifiques au domaine si disponibles (sélecteurs déjà compilés)
+    rules = domain_rules.get(domain)
     
     # 1. D'abord essayer d'extraire avec les règles spécifiques au domaine
     if rules:
         for field, selectors in rules.items():
-            result[field] = get_element_text(soup, selectors)
+            # Les règles utilisent la clé 'description' alors que le résultat utilise 'description_full'
+            result_field = 'description_full' if field == 'description' else field
+            result[result_field] = page.select_text(selectors)
     
     # 2. Pour les champs toujours manquants, utiliser des méthodes génériques
     
     # Pour le titre (si non trouvé)
     if not result["title"]:
         # Essayer h1, puis titre de la page
-        h1 = soup.find('h1')
-        if h1:
-            result["title"] = h1.get_text(strip=True)
+        h1 = page.find_first('h1')
+        if h1 is not None:
+            result["title"] = page.element_text(h1)
         else:
-            title_tag = soup.find('title')
-            if title_tag:
-                result["title"] = title_tag.get_text(strip=True)
+            title_tag = page.find_first('title')
+            if title_tag is not None:
+                result["title"] = page.element_text(title_tag)
     
     # Pour la description (si non trouvée)
     if not result["description_full"]:
         # 1. Essayer de trouver un conteneur principal de contenu
+        lengths = page.text_lengths()
         for selector in ['main', 'article', '[role="main"]', '#main-content', '.job-description']:
-            content = soup.select_one(selector)
-            if content and len(content.get_text(strip=True)) > 200:
-                result["description_full"] = content.get_text(separator='\n', strip=True)
+            matches = page.select(selector)
+            content = matches[0] if matches else None
+            if content is not None and lengths.get(content, 0) > 200:
+                result["description_full"] = page.element_text(content, separator='\n')
                 break
         
-        # 2. Si rien n'est trouvé, chercher le plus grand bloc de texte
+        # 2. Si rien n'est trouvé, chercher le bloc de contenu principal
+        #    (score de texte pondéré par la densité de liens, calculé en une passe)
         if not result["description_full"]:
-            result["description_full"] = find_longest_text_block(soup)
+            block = page.main_content_block()
+            if block is not None:
+                result["description_full"] = page.element_text(block, separator='\n', excluded_tags=LAYOUT_TAGS)
     
     # 3. Pour l'entreprise et la localisation, utiliser des patterns si non trouvés
-    page_text = soup.get_text()
-    
-    if not result["company"]:
-        result["company"] = extract_with_patterns(page_text, COMMON_PATTERNS['company'])
-    
-    if not result["location"]:
-        result["location"] = extract_with_patterns(page_text, COMMON_PATTERNS['location'])
+    if not result["company"] or not result["location"]:
+        # Texte de la page hors en-tête/navigation/pied de page (menus "Entreprises", etc.)
+        page_text = page.page_text(excluded_tags=LAYOUT_TAGS)
+        
+        if not result["company"]:
+            result["company"] = extract_with_patterns(page_text, COMMON_PATTERNS['company'])
+        
+        if not result["location"]:
+            result["location"] = extract_with_patterns(page_text, COMMON_PATTERNS['location'])
     
     # Nettoyer et formater les résultats
     for field in result:
@@ -195,10 +194,86 @@ def extract_job_details(soup, url):
     
     return result
 
-def scrape_job_page(url: str) -> dict:
+def extract_offer_from_html(url: str, content, content_type: str = None) -> dict:
     """
-    Scrape une page d'offre d'emploi donnée avec une approche plus robuste.
+    Extrait l'offre d'une page HTML déjà téléchargée (octets bruts ou texte).
+    Utilisée par scrape_job_page et par la ré-extraction des pages stockées (reextract.py).
+    """
+    # Une seule analyse (lxml) partagée par toutes les étapes d'extraction
+    page = ParsedPage(content, declared_encoding=get_declared_charset(content_type))
+    
+    # Extraire les détails du job
+    job_details = extract_job_details_from_page(page, url)
+    
+    # Vérifier si on a au moins un titre et une description
+    if not job_details["title"] or not job_details["description_full"]:
+        logging.warning(f"Impossible d'extraire les informations essentielles pour {url}")
+        if not job_details["title"]:
+            job_details["title"] = "Titre non trouvé"
+        if not job_details["description_full"]:
+            job_details["description_full"] = "Description non trouvée"
+    
+    # Ajouter l'URL au résultat
+    return {
+        "url": url,
+        "title": job_details["title"] or "Titre non trouvé",
+        "description_full": job_details["description_full"] or "Description non trouvée",
+        "company": job_details["company"] or "Entreprise non trouvée",
+        "location": job_details["location"] or "Localisation non trouvée"
+    }
+
+# Valeurs de repli de l'extraction : une offre qui en contient n'a pas été extraite correctement
+EXTRACTION_FAILURE_VALUES = ("Erreur de scraping", "Format non supporté", "Titre non trouvé", "Description non trouvée")
+
+def is_complete_extraction(offer: dict) -> bool:
+    """Vrai si le titre et la description de l'offre ont été extraits de la page."""
+    return bool(offer) and offer.get("title") not in EXTRACTION_FAILURE_VALUES \
+        and offer.get("description_full") not in EXTRACTION_FAILURE_VALUES
+
+def scrape_error_result(url: str) -> dict:
+    return {
+        "url": url,
+        "title": "Erreur de scraping",
+        "description_full": "Erreur de scraping",
+        "company": "N/A",
+        "location": "N/A"
+    }
+
+class FetchedPage:
+    """
+    Résultat de l'étape réseau du scraping : le HTML brut à extraire (`content`, `content_type`),
+    ou directement l'offre de repli (`fallback` : erreur de requête, contenu non HTML).
+    `validators` (etag, last_modified) de la réponse ne sont enregistrés qu'une fois l'offre extraite
+    (remember_page_validators). `not_modified` : copie stockée relue après un 304.
+    """
+    __slots__ = ('url', 'content', 'content_type', 'fallback', 'fetch_seconds', 'validators', 'not_modified')
+
+    def __init__(self, url: str, content: bytes = None, content_type: str = None, fallback: dict = None):
+        self.url = url
+        self.content = content
+        self.content_type = content_type
+        self.fallback = fallback
+        self.fetch_seconds = 0.0  # Durée du téléchargement (hors attente de l'ordonnanceur)
+        self.validators = None
+        self.not_modified = False
+
+def _stored_page(url: str):
+    """Dernière version stockée de `url` sous forme de FetchedPage, ou None."""
+    entry = raw_page_store.get_entry(url) if RAW_PAGE_STORE_ENABLED else None
+    content = raw_page_store.get(url) if entry else None
+    if content is None:
+        return None
+    return FetchedPage(url, content, stored_header(entry["headers"], "Content-Type"))
+
+def fetch_job_page(url: str, polite_delay: bool = True, conditional: bool = None):
+    """
+    Étape réseau de scrape_job_page : télécharge la page (sans l'analyser) et stocke son HTML brut.
+    Re-crawl (`conditional=None` : la page est déjà dans le stockage des pages brutes ; ou `conditional=True`) :
+    la requête est conditionnelle (ETag / Last-Modified) et une page inchangée (304) est relue depuis le
+    stockage. Retourne un FetchedPage, ou None si la page n'a pas changé et qu'aucune copie n'est stockée.
     """
+    if conditional is None:
+        conditional = RAW_PAGE_STORE_ENABLED and raw_page_store.get_entry(url) is not None
     # Sélectionner un User-Agent aléatoire
     headers = {
         'User-Agent': random.choice(USER_AGENTS),
@@ -208,61 +283,90 @@ def scrape_job_page(url: str) -> dict:
     }
     
     try:
-        # Délai aléatoire pour éviter la détection
-        time.sleep(random.uniform(1, 3))
+        # Attendre que le domaine soit éligible (sans pénaliser les autres domaines)
+        domain = get_domain(url)
+        if polite_delay:
+            get_scheduler().acquire(domain)
         
-        response = requests.get(url, headers=headers, timeout=15)
+        # Session poolée (connexions keep-alive réutilisées, tentatives avec backoff)
+        fetch_start = time.perf_counter()
+        response = http_client.fetch(url, headers=headers, timeout=15, conditional=conditional)
+        fetch_seconds = time.perf_counter() - fetch_start
+        # Un 429/503 suspend le domaine pour tout le processus (Retry-After respecté)
+        get_scheduler().record_response(domain, response.status_code, response.headers)
+        if response.status_code == 304:
+            logging.info(f"Page inchangée depuis le dernier crawl : {url}")
+            page = _stored_page(url)
+            if page is not None:
+                page.not_modified = True
+            return page
         response.raise_for_status()
         
         # Vérifier que c'est bien du HTML
         content_type = response.headers.get('Content-Type', '')
         if 'text/html' not in content_type and 'application/xhtml+xml' not in content_type:
             logging.warning(f"Le contenu n'est pas HTML: {content_type}")
-            return {
+            return FetchedPage(url, fallback={
                 "url": url,
                 "title": "Format non supporté",
                 "description_full": "Le contenu n'est pas au format HTML",
                 "company": "N/A",
                 "location": "N/A"
-            }
-        
-        soup = BeautifulSoup(response.content, 'html.parser')
-        
-        # Extraire les détails du job
-        job_details = extract_job_details(soup, url)
-        
-        # Vérifier si on a au moins un titre et une description
-        if not job_details["title"] or not job_details["description_full"]:
-            logging.warning(f"Impossible d'extraire les informations essentielles pour {url}")
-            if not job_details["title"]:
-                job_details["title"] = "Titre non trouvé"
-            if not job_details["description_full"]:
-                job_details["description_full"] = "Description non trouvée"
+            })
         
-        # Ajouter l'URL au résultat
-        result = {
-            "url": url,
-            "title": job_details["title"] or "Titre non trouvé",
-            "description_full": job_details["description_full"] or "Description non trouvée",
-            "company": job_details["company"] or "Entreprise non trouvée",
-            "location": job_details["location"] or "Localisation non trouvée"
-        }
-        
-        logging.info(f"Scraping réussi pour : {url}")
-        return result
+        # HTML brut conservé pour pouvoir ré-extraire l'offre plus tard sans re-télécharger la page
+        if RAW_PAGE_STORE_ENABLED:
+            raw_page_store.put(url, response.content, response.headers, response.status_code)
+        page = FetchedPage(url, response.content, content_type)
+        page.fetch_seconds = fetch_seconds
+        page.validators = http_client.response_validators(response)
+        return page
 
     except requests.exceptions.RequestException as e:
         logging.error(f"Erreur de requête pour {url}: {e}")
     except Exception as e:
         logging.error(f"Erreur de scraping pour {url}: {e}")
-    
-    return {
-        "url": url,
-        "title": "Erreur de scraping",
-        "description_full": "Erreur de scraping",
-        "company": "N/A",
-        "location": "N/A"
-    }
+    return FetchedPage(url, fallback=scrape_error_result(url))
+
+def extract_fetched_page(page: FetchedPage) -> dict:
+    """
+    Étape CPU de scrape_job_page : analyse et extraction d'une page téléchargée.
+    Fonction de module (sérialisable) : elle peut s'exécuter dans un processus d'extraction.
+    """
+    if page.fallback is not None:
+        return page.fallback
+    try:
+        result = extract_offer_from_html(page.url, page.content, page.content_type)
+    except Exception as e:
+        logging.error(f"Erreur de scraping pour {page.url}: {e}")
+        return scrape_error_result(page.url)
+    logging.info(f"Scraping réussi pour : {page.url}")
+    return result
+
+def remember_page_validators(page: FetchedPage, offer: dict):
+    """
+    Enregistre les validateurs HTTP de la page une fois l'offre extraite : seule une page exploitée
+    peut ensuite être servie par un 304 (sinon l'offre resterait définitivement non extraite).
+    """
+    if page is not None and page.validators and is_complete_extraction(offer):
+        http_client.validator_store.put(page.url, *page.validators)
+
+def scrape_job_page(url: str, polite_delay: bool = True, conditional: bool = None) -> dict:
+    """
+    Scrape une page d'offre d'emploi donnée avec une approche plus robuste.
+    La politesse est gérée par l'ordonnanceur partagé (un seau à jetons par domaine) :
+    `polite_delay=False` indique que l'appelant a déjà obtenu un jeton pour ce domaine
+    (voir search_and_scrape_jobs).
+    Re-crawl d'une page déjà stockée : la requête est conditionnelle (ETag / Last-Modified) et une page
+    inchangée est ré-extraite depuis sa copie stockée (None si la page n'a pas changé et n'est pas stockée).
+    Téléchargement et extraction dans le même thread : pour un crawl, voir scrape_pipeline.
+    """
+    page = fetch_job_page(url, polite_delay=polite_delay, conditional=conditional)
+    if page is None:
+        return None
+    offer = extract_fetched_page(page)
+    remember_page_validators(page, offer)
+    return offer
 
 def add_domain_rules(domain, title_selectors=None, description_selectors=None, 
                      company_selectors=None, location_selectors=None):
@@ -281,6 +385,7 @@ def add_domain_rules(domain, title_selectors=None, description_selectors=None,
         DOMAIN_RULES[domain]['company'] = company_selectors
     if location_selectors:
         DOMAIN_RULES[domain]['location'] = location_selectors
+    domain_rules.invalidate()
     
     logging.info(f"Règles ajoutées pour le domaine: {domain}")
 
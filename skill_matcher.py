@@ -0,0 +1,84 @@
+# /mon_agent_reco_emploi/skill_matcher.py
+from collections import deque
+from functools import lru_cache
+
+
+def _is_word_char(char: str) -> bool:
+    # Même définition que \w des expressions régulières Unicode de Python
+    return char.isalnum() or char == '_'
+
+
+def _is_word_boundary(text: str, position: int) -> bool:
+    """Équivalent de \\b : un caractère de mot d'un seul côté de `position`."""
+    before = position > 0 and _is_word_char(text[position - 1])
+    after = position < len(text) and _is_word_char(text[position])
+    return before != after
+
+
+class SkillMatcher:
+    """
+    Automate d'Aho-Corasick sur une liste de compétences.
+    Le texte est parcouru UNE seule fois, quelle que soit la taille de la taxonomie ;
+    chaque occurrence est validée par les mêmes frontières de mot que le motif \\b...\\b
+    de l'ancienne extraction, une expression par compétence.
+    """
+
+    def __init__(self, skills_keywords):
+        self._goto = [{}]  # Transitions de chaque état
+        self._fail = [0]
+        self._outputs = [[]]  # Compétences reconnues à chaque état : (longueur du motif, nom normalisé)
+        for skill in skills_keywords:
+            pattern = skill.lower()
+            if pattern.strip():
+                self._add_pattern(pattern, skill.strip().lower())
+        self._build_failure_links()
+
+    def _add_pattern(self, pattern: str, skill_name: str):
+        state = 0
+        for char in pattern:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._outputs.append([])
+            state = next_state
+        self._outputs[state].append((len(pattern), skill_name))
+
+    def _build_failure_links(self):
+        # Parcours en largeur : les états de profondeur 1 gardent la racine comme repli
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[next_state] = self._goto[fallback].get(char, 0)
+                # Les motifs reconnus par l'état de repli le sont aussi ici (suffixes)
+                self._outputs[next_state] = self._outputs[next_state] + self._outputs[self._fail[next_state]]
+
+    def find_skills(self, text: str) -> set:
+        """Ensemble des compétences (normalisées) présentes dans `text` entre frontières de mot."""
+        found = set()
+        if not text:
+            return found
+        text = text.lower()
+        goto, fail, outputs = self._goto, self._fail, self._outputs
+        state = 0
+        for end, char in enumerate(text, start=1):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for length, skill_name in outputs[state]:
+                if skill_name not in found and _is_word_boundary(text, end - length) and _is_word_boundary(text, end):
+                    found.add(skill_name)
+        return found
+
+
+@lru_cache(maxsize=16)
+def get_skill_matcher(skills_keywords: tuple) -> SkillMatcher:
+    """Automate compilé une seule fois par liste de compétences (mis en cache)."""
+    return SkillMatcher(skills_keywords)
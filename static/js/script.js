@@ -8,6 +8,10 @@ document.addEventListener('DOMContentLoaded', () => {
     const loadingIndicator = document.getElementById('loading-indicator');
     const errorMessageDiv = document.getElementById('error-message');
     const submitButton = document.getElementById('submit-button');
+    const presentationDiv = document.getElementById('presentation');
+    const scrapeStatusDiv = document.getElementById('scrape-status');
+    let presentationSource = null;
+    let scrapePollTimer = null;
 
     form.addEventListener('submit', async (event) => {
         event.preventDefault(); // Empêche le rechargement de la page
@@ -25,6 +29,9 @@ document.addEventListener('DOMContentLoaded', () => {
         hideError();
         submitButton.disabled = true;
         resultsDiv.innerHTML = ''; // Vider les anciens résultats
+        presentationDiv.textContent = '';
+        clearTimeout(scrapePollTimer);
+        scrapeStatusDiv.style.display = 'none';
 
         try {
             // Appel à l'API Flask
@@ -49,6 +56,14 @@ document.addEventListener('DOMContentLoaded', () => {
 
             // Afficher les résultats
             displayResults(data.recommendations);
+            // Présentation rédigée par l'assistant, affichée au fil de l'eau
+            if (data.recommendations && data.recommendations.length > 0) {
+                streamPresentation(data.recommendation_id, jobTitle);
+            }
+            // Le scraping tourne en arrière-plan : on suit sa progression sans bloquer l'affichage
+            if (data.scrape_job_id) {
+                pollScrapeJob(data.scrape_job_id, jobTitle);
+            }
 
         } catch (error) {
             console.error("Erreur lors de la requête:", error);
@@ -110,6 +125,90 @@ document.addEventListener('DOMContentLoaded', () => {
         });
     }
 
+    function streamPresentation(recommendationId, jobTitle) {
+        if (presentationSource) {
+            presentationSource.close();
+        }
+        let receivedTokens = false;
+        // Le serveur reprend les recommandations déjà affichées ; le titre ne sert que si elles ont expiré
+        const params = new URLSearchParams({ id: recommendationId || '', title: jobTitle });
+        presentationSource = new EventSource(`/api/recommend/stream?${params}`);
+
+        // Premier affichage immédiat : liste déterministe, remplacée dès l'arrivée du texte de l'assistant
+        presentationSource.addEventListener('preview', (event) => {
+            presentationDiv.textContent = JSON.parse(event.data).text;
+        });
+        presentationSource.addEventListener('token', (event) => {
+            if (!receivedTokens) {
+                presentationDiv.textContent = '';
+                receivedTokens = true;
+            }
+            presentationDiv.textContent += JSON.parse(event.data).text;
+        });
+        presentationSource.addEventListener('error', (event) => {
+            // Erreur serveur (avec texte de repli) ou coupure de la connexion (sans données)
+            if (event.data) {
+                presentationDiv.textContent = JSON.parse(event.data).text;
+            }
+            presentationSource.close();
+        });
+        presentationSource.addEventListener('done', () => {
+            presentationSource.close();
+        });
+    }
+
+    function pollScrapeJob(jobId, jobTitle) {
+        clearTimeout(scrapePollTimer);
+        scrapeStatusDiv.style.display = 'block';
+        scrapeStatusDiv.textContent = 'Recherche de nouvelles offres en ligne...';
+
+        const poll = async () => {
+            try {
+                const response = await fetch(`/api/scrape/${jobId}`);
+                const job = await response.json();
+                if (!response.ok) {
+                    throw new Error(job.error || `Erreur HTTP ${response.status}`);
+                }
+                if (job.status === 'done') {
+                    scrapeStatusDiv.textContent = `Recherche en ligne terminée : ${job.offers_added} nouvelle(s) offre(s).`;
+                    if (job.offers_added > 0) {
+                        await refreshResults(jobTitle);
+                    }
+                    return;
+                }
+                if (job.status === 'failed') {
+                    scrapeStatusDiv.textContent = `La recherche en ligne a échoué : ${job.error || 'erreur inconnue'}`;
+                    return;
+                }
+                scrapeStatusDiv.textContent = job.urls_total > 0
+                    ? `Recherche en ligne : ${job.urls_done}/${job.urls_total} pages traitées, ${job.offers_added} nouvelle(s) offre(s)...`
+                    : 'Recherche de nouvelles offres en ligne...';
+                scrapePollTimer = setTimeout(poll, 2000);
+            } catch (error) {
+                console.error("Erreur lors du suivi du scraping:", error);
+                scrapeStatusDiv.textContent = `Suivi de la recherche en ligne impossible : ${error.message}`;
+            }
+        };
+        scrapePollTimer = setTimeout(poll, 1000);
+    }
+
+    async function refreshResults(jobTitle) {
+        // Nouvelles recommandations une fois les offres scrappées ajoutées à l'index
+        const response = await fetch('/api/recommend', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+            },
+            body: JSON.stringify({ title: jobTitle, scrape_new: false }),
+        });
+        const data = await response.json();
+        if (response.ok && data.recommendations && data.recommendations.length > 0) {
+            hideError();
+            displayResults(data.recommendations);
+            streamPresentation(data.recommendation_id, jobTitle);
+        }
+    }
+
     function showLoading(isLoading) {
         loadingIndicator.style.display = isLoading ? 'block' : 'none';
     }
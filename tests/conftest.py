@@ -0,0 +1,6 @@
+# /mon_agent_reco_emploi/tests/conftest.py
+import os
+import sys
+
+# Les modules du projet sont à la racine du dépôt (pas de paquet installable)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
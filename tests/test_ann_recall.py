@@ -0,0 +1,97 @@
+# /mon_agent_reco_emploi/tests/test_ann_recall.py
+import numpy as np
+import pytest
+
+import embedding_index
+from ann_index import IVFIndex
+from embedding_index import EmbeddingIndex, measure_ann_recall
+
+
+def _unit_rows(count, dim=16, seed=0):
+    rows = np.random.default_rng(seed).normal(size=(count, dim)).astype(np.float32)
+    return rows / np.linalg.norm(rows, axis=1, keepdims=True)
+
+
+class ExactIndex:
+    """Index "approché" qui retourne toutes les lignes : rappel parfait."""
+    backend_name = "exact"
+
+    def search(self, matrix, query, top_n):
+        return np.arange(matrix.shape[0]), matrix @ query
+
+
+class BlindIndex:
+    """Index qui ne propose que les premières lignes, sans pouvoir élargir sa recherche."""
+    backend_name = "blind"
+
+    def __init__(self):
+        self.trained = 0
+
+    def train(self, matrix):
+        self.trained += 1
+
+    def add(self, row_ids, vectors):
+        pass
+
+    def widen_search(self):
+        return False
+
+    def search(self, matrix, query, top_n):
+        row_ids = np.arange(min(top_n, matrix.shape[0]))
+        return row_ids, matrix[row_ids] @ query
+
+
+def _offers(matrix):
+    return [{"url": f"https://example.com/offre/{row}", "embedding": vector} for row, vector in enumerate(matrix)]
+
+
+def test_measure_ann_recall_against_exact_search():
+    matrix = _unit_rows(500)
+    assert measure_ann_recall(ExactIndex(), matrix, k=10, sample_size=50) == 1.0
+    assert measure_ann_recall(BlindIndex(), matrix, k=10, sample_size=50) < 0.2
+
+
+def test_low_recall_ivf_is_widened_until_it_passes(monkeypatch):
+    monkeypatch.setattr(embedding_index, "ANN_MIN_OFFERS", 100)
+    # Données sans structure et une seule liste explorée : rappel initial très faible
+    monkeypatch.setattr(embedding_index, "create_ann_index", lambda backend: IVFIndex(nlist=32, nprobe=1))
+    matrix = _unit_rows(2000)
+    index = EmbeddingIndex(ann_backend="ivf")
+    index.build(_offers(matrix))
+
+    assert index._ann is not None
+    assert index._ann.nprobe > 1
+    assert measure_ann_recall(index._ann, matrix) >= embedding_index.ANN_MIN_RECALL
+
+
+def test_rejected_index_falls_back_to_exact_search_until_the_catalogue_doubles(monkeypatch):
+    monkeypatch.setattr(embedding_index, "ANN_MIN_OFFERS", 100)
+    created = []
+    monkeypatch.setattr(embedding_index, "create_ann_index", lambda backend: created.append(BlindIndex()) or created[-1])
+    matrix = _unit_rows(400)
+    index = EmbeddingIndex(ann_backend="ivf")
+    index.build(_offers(matrix[:200]))
+
+    assert index._ann is None
+    assert len(created) == 1
+    # Recherche exacte : la ligne la plus proche d'elle-même est bien trouvée
+    assert index.search(matrix[150], 1)[0][0]["url"] == "https://example.com/offre/150"
+
+    offers = _offers(matrix)
+    for offer in offers[200:399]:
+        index.add(offer)
+    assert len(created) == 1  # Pas de nouvel entraînement à chaque insertion
+    index.add(offers[399])
+    assert len(created) == 2  # Nouvel essai une fois la taille doublée (400 offres)
+
+
+@pytest.mark.parametrize("saved_dim, expected_dim", [(16, 16), (16, 32)])
+def test_saved_ivf_index_is_ignored_for_another_dimension(tmp_path, saved_dim, expected_dim):
+    matrix = _unit_rows(200, dim=saved_dim)
+    ivf = IVFIndex(nlist=8)
+    ivf.train(matrix)
+    urls = [f"u{row}" for row in range(200)]
+    ivf.save(str(tmp_path / "index"), urls)
+
+    loaded = IVFIndex().load(str(tmp_path / "index"), dim=expected_dim)
+    assert loaded == (urls if saved_dim == expected_dim else None)
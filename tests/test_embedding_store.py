@@ -0,0 +1,104 @@
+# /mon_agent_reco_emploi/tests/test_embedding_store.py
+import numpy as np
+import pytest
+
+from embedding_store import EmbeddingMatrixStore
+
+
+def _vectors(count, dim=4, seed=0):
+    vectors = np.random.default_rng(seed).random((count, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+@pytest.fixture
+def store(tmp_path):
+    return EmbeddingMatrixStore(str(tmp_path / "job_offers"))
+
+
+def _rows(store):
+    matrix, urls, manifest = store.open()
+    return {url: np.array(matrix[row]) for row, url in enumerate(urls)}, manifest
+
+
+def test_append_skips_known_urls(store):
+    vectors = _vectors(3)
+    assert store.append(["a", "b", "c"], vectors) == 3
+    assert store.append(["b", "d"], _vectors(2, seed=1)) == 1
+    rows, manifest = _rows(store)
+    assert list(rows) == ["a", "b", "c", "d"]
+    np.testing.assert_array_equal(rows["b"], vectors[1])
+    assert manifest["count"] == 4 and manifest["generation"] == 0
+
+
+def test_append_rejects_other_dimension(store):
+    store.append(["a"], _vectors(1))
+    assert store.append(["b"], _vectors(1, dim=8)) == 0
+    assert store.read_manifest()["count"] == 1
+
+
+def test_compact_drops_removed_urls_in_a_new_generation(store, tmp_path):
+    vectors = _vectors(5)
+    store.append(["a", "b", "c", "d", "e"], vectors)
+    reader_matrix, _, _ = store.open()  # Lecteur ouvert avant le compactage
+
+    assert store.compact(["a", "c", "e"]) == 2
+    rows, manifest = _rows(store)
+    assert list(rows) == ["a", "c", "e"]
+    np.testing.assert_array_equal(rows["e"], vectors[4])
+    assert manifest["generation"] == 1
+    assert not (tmp_path / "job_offers.embeddings.0.f32").exists()
+    # Le memmap déjà ouvert garde l'ancienne génération lisible
+    np.testing.assert_array_equal(reader_matrix[1], vectors[1])
+
+
+def test_compact_without_removal_keeps_the_generation(store):
+    store.append(["a", "b"], _vectors(2))
+    assert store.compact(["a", "b", "z"]) == 0
+    assert store.read_manifest()["generation"] == 0
+
+
+def test_append_after_compact_uses_the_new_generation(store):
+    store.append(["a", "b", "c"], _vectors(3))
+    store.compact(["a", "c"])
+    assert store.append(["d"], _vectors(1, seed=2)) == 1
+    rows, manifest = _rows(store)
+    assert list(rows) == ["a", "c", "d"] and manifest["generation"] == 1
+
+
+
+def test_replace_rewrites_rows_in_one_generation(store):
+    vectors = _vectors(3)
+    store.append(["a", "b", "c"], vectors)
+    new_vectors = _vectors(3, seed=5)
+
+    # "b" fourni deux fois : seule la dernière version est gardée
+    assert store.replace(["b", "a", "b"], new_vectors) == 2
+    rows, manifest = _rows(store)
+    assert list(rows) == ["c", "b", "a"]  # Lignes remplacées réécrites en fin de matrice
+    np.testing.assert_array_equal(rows["c"], vectors[2])
+    np.testing.assert_array_equal(rows["b"], new_vectors[2])
+    np.testing.assert_array_equal(rows["a"], new_vectors[1])
+    assert manifest["generation"] == 1 and manifest["count"] == 3
+
+
+def test_replace_adds_unknown_urls_and_refuses_other_dimension(store):
+    store.append(["a"], _vectors(1))
+    assert store.replace(["z"], _vectors(1, seed=3)) == 1
+    assert list(_rows(store)[0]) == ["a", "z"]
+    assert store.replace(["a"], _vectors(1, dim=8)) == 0
+    assert store.read_manifest()["generation"] == 1
+
+def test_reader_index_follows_appends_and_compaction(store):
+    from embedding_index import EmbeddingIndex
+
+    vectors = _vectors(4)
+    store.append(["a", "b", "c"], vectors[:3])
+    index = EmbeddingIndex(store_refresh_interval=0.0)
+    index.build_from_store(store, lambda urls: {url: {"url": url} for url in urls})
+
+    store.append(["d"], vectors[3:])  # Ajout par un autre processus
+    assert index.search(vectors[3], 1)[0][0]["url"] == "d"
+    assert len(index) == 4
+
+    store.compact(["a", "d"])
+    assert [offer["url"] for offer, _ in index.search(vectors[0], 4)] == ["a", "d"]
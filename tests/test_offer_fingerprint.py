@@ -0,0 +1,126 @@
+# /mon_agent_reco_emploi/tests/test_offer_fingerprint.py
+import random
+import numpy as np
+import pytest
+
+import database_manager
+from db_connection import ConnectionManager
+from offer_fingerprint import canonicalize_url, simhash, simhash_bands, hamming_distance, SIMHASH_BITS
+
+DESCRIPTION = (
+    "Nous recherchons un développeur Python confirmé pour rejoindre notre équipe produit à Lyon. "
+    "Vous concevrez des API REST avec Django et FastAPI, participerez aux revues de code et à "
+    "l'amélioration continue de notre plateforme de paiement utilisée par plusieurs milliers de "
+    "commerçants. Une expérience de PostgreSQL, de Docker et des tests automatisés est attendue. "
+    "Télétravail partiel possible, mutuelle prise en charge à cent pour cent et tickets restaurant. "
+    "Au sein d'une équipe de huit personnes, vous travaillerez en lien direct avec le responsable produit "
+    "et les designers pour livrer chaque semaine de nouvelles fonctionnalités. Vous prendrez part aux "
+    "choix d'architecture, à la surveillance de la production et à l'accompagnement des profils juniors. "
+    "Notre pile technique comprend Python, Django, Celery, Redis, PostgreSQL, Kubernetes et un frontend "
+    "en React. Le processus de recrutement comporte un premier échange téléphonique, un exercice technique "
+    "à réaliser chez vous puis une rencontre avec l'équipe dans nos locaux proches de la gare. "
+    "Rémunération selon profil entre quarante-cinq et cinquante-cinq mille euros bruts annuels, avec une "
+    "participation aux bénéfices et un budget de formation annuel. Nous valorisons la curiosité, "
+    "l'autonomie et le goût du travail bien fait, quel que soit votre parcours."
+)
+OTHER_DESCRIPTION = (
+    "Cabinet comptable indépendant recrute un assistant administratif à temps plein pour gérer "
+    "l'accueil téléphonique, le classement des pièces justificatives, la saisie des factures et le "
+    "suivi des relances clients. Maîtrise du pack bureautique indispensable, une première expérience "
+    "en cabinet serait appréciée. Poste basé à Nantes, horaires de journée, démarrage immédiat."
+)
+
+
+class TestCanonicalizeUrl:
+    def test_normalizes_host_port_fragment_and_trailing_slash(self):
+        assert canonicalize_url("HTTPS://WWW.Example.com:443/offres/123/#postuler") == "https://example.com/offres/123"
+
+    def test_removes_tracking_params_and_sorts_the_others(self):
+        url = "https://example.com/offre?utm_source=ddg&id=42&gclid=abc&b=2&mtm_campaign=x"
+        assert canonicalize_url(url) == "https://example.com/offre?b=2&id=42"
+
+    def test_keeps_generic_params_that_can_identify_the_offer(self):
+        assert canonicalize_url("https://example.com/offre?ref=12345") == "https://example.com/offre?ref=12345"
+        assert canonicalize_url("https://example.com/offre?ref=1") != canonicalize_url("https://example.com/offre?ref=2")
+
+    def test_domain_tracking_params_only_apply_to_their_site(self):
+        assert canonicalize_url("https://fr.indeed.com/viewjob?jk=abc&from=serp&tk=1") == "https://fr.indeed.com/viewjob?jk=abc"
+        assert canonicalize_url("https://www.linkedin.com/jobs/view/1/?trk=public_jobs") == "https://linkedin.com/jobs/view/1"
+        assert canonicalize_url("https://example.com/offre?from=2024") == "https://example.com/offre?from=2024"
+
+    def test_empty_url(self):
+        assert canonicalize_url("") == ""
+
+
+class TestSimhash:
+    def test_small_edit_stays_within_dedup_distance(self):
+        edited = DESCRIPTION.replace("Lyon", "Villeurbanne") + " Postulez en ligne."
+        assert hamming_distance(simhash(DESCRIPTION), simhash(edited)) <= database_manager.DEDUP_SIMHASH_MAX_DISTANCE
+
+    def test_different_offers_are_far_apart(self):
+        assert hamming_distance(simhash(DESCRIPTION), simhash(OTHER_DESCRIPTION)) > database_manager.DEDUP_SIMHASH_MAX_DISTANCE
+
+    def test_short_text_has_no_fingerprint(self):
+        assert simhash("Développeur Python", min_tokens=30) is None
+        assert simhash("") is None
+
+    def test_close_fingerprints_share_a_band(self):
+        rng = random.Random(0)
+        for _ in range(500):
+            fingerprint = rng.getrandbits(SIMHASH_BITS)
+            flipped = fingerprint
+            for bit in rng.sample(range(SIMHASH_BITS), database_manager.DEDUP_SIMHASH_MAX_DISTANCE):
+                flipped ^= 1 << bit
+            assert any(a == b for a, b in zip(simhash_bands(fingerprint), simhash_bands(flipped)))
+
+
+@pytest.fixture
+def offers_db(tmp_path, monkeypatch):
+    """Base des offres temporaire ; l'encodage des titres est remplacé par des vecteurs déterministes."""
+    manager = ConnectionManager(str(tmp_path / "job_offers.sqlite3"), schema_initializer=database_manager._create_schema)
+    monkeypatch.setattr(database_manager, "_connection_manager", manager)
+    monkeypatch.setattr(database_manager, "embedding_store", None)
+    monkeypatch.setattr(database_manager, "add_offer_to_shared_index", lambda offer, embedding: None)
+
+    def process_batch(texts, batch_size=None):
+        return [
+            {"cleaned_title": title.lower(), "cleaned_description": description.lower(),
+             "combined_text_for_embedding": title, "skills": [],
+             "embedding": np.random.default_rng(len(title)).random(8).astype(np.float32)}
+            for title, description in texts
+        ]
+
+    monkeypatch.setattr(database_manager, "process_job_offers_batch", process_batch)
+    yield manager
+    manager.close_all()
+
+
+def _offer(url, description=DESCRIPTION, title="Développeur Python"):
+    return {"url": url, "title": title, "description_full": description, "company": "ACME", "location": "Lyon"}
+
+
+class TestDuplicateRejection:
+    def test_same_offer_under_tracking_url_is_rejected(self, offers_db):
+        assert database_manager.add_job_offers_to_db([_offer("https://example.com/offre/1")]) == 1
+        assert database_manager.add_job_offers_to_db([_offer("https://www.example.com/offre/1/?utm_source=ddg")]) == 0
+
+    def test_republished_description_is_rejected(self, offers_db):
+        assert database_manager.add_job_offers_to_db([_offer("https://example.com/offre/1")]) == 1
+        republished = _offer("https://autre-site.fr/annonce/987", DESCRIPTION.replace("Lyon", "Villeurbanne"))
+        assert database_manager.add_job_offers_to_db([republished]) == 0
+
+    def test_duplicates_within_one_batch_are_rejected(self, offers_db):
+        batch = [
+            _offer("https://example.com/offre/1"),
+            _offer("https://example.com/offre/1?gclid=abc"),
+            _offer("https://autre-site.fr/annonce/987", DESCRIPTION + " Postulez en ligne."),
+            _offer("https://example.com/offre/2", OTHER_DESCRIPTION, title="Assistant administratif"),
+        ]
+        assert database_manager.add_job_offers_to_db(batch) == 2
+        assert database_manager.filter_new_urls(["https://example.com/offre/2/", "https://example.com/offre/3"]) == \
+            ["https://example.com/offre/3"]
+
+    def test_short_descriptions_are_not_compared(self, offers_db):
+        short = "Poste de développeur Python à pourvoir rapidement, contactez-nous."
+        assert database_manager.add_job_offers_to_db([_offer("https://example.com/offre/1", short)]) == 1
+        assert database_manager.add_job_offers_to_db([_offer("https://autre-site.fr/offre/1", short)]) == 1
@@ -0,0 +1,71 @@
+# /mon_agent_reco_emploi/tests/test_response_cache.py
+import pytest
+
+import response_cache
+from response_cache import ResponseCache, response_cache_key
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(response_cache, "time", fake)
+    return fake
+
+
+@pytest.fixture
+def cache_path(tmp_path):
+    return str(tmp_path / "groq_cache.sqlite3")
+
+
+def test_prompt_normalization_ignores_whitespace_but_not_case():
+    assert response_cache_key("m", "Bonjour  \n le monde ") == response_cache_key("m", "Bonjour le monde")
+    assert response_cache_key("m", "https://example.com/Offre") != response_cache_key("m", "https://example.com/offre")
+    assert response_cache_key("m", "prompt") != response_cache_key("stub:m", "prompt")
+
+
+def test_entries_expire_after_ttl(clock, cache_path):
+    cache = ResponseCache(cache_path, "m", ttl_seconds=60, max_items=10)
+    cache.put("prompt", "réponse")
+    clock.now += 59
+    assert cache.get("prompt") == "réponse"
+    clock.now += 2
+    assert cache.get("prompt") is None
+    # Expirée aussi sur disque : un nouveau processus ne la resert pas
+    assert ResponseCache(cache_path, "m", ttl_seconds=60).get("prompt") is None
+
+
+def test_least_recently_used_entries_are_evicted(clock, cache_path):
+    cache = ResponseCache(cache_path, "m", ttl_seconds=3600, max_items=2)
+    cache.put("a", "A")
+    clock.now += 1
+    cache.put("b", "B")
+    clock.now += 1
+    assert cache.get("a") == "A"  # "a" devient la plus récemment utilisée
+    clock.now += 1
+    cache.put("c", "C")
+
+    assert cache.get("b") is None
+    assert cache.get("a") == "A" and cache.get("c") == "C"
+    reopened = ResponseCache(cache_path, "m", ttl_seconds=3600, max_items=2)
+    assert reopened.get("b") is None
+    assert reopened.get("a") == "A" and reopened.get("c") == "C"
+
+
+def test_entries_are_shared_across_instances_but_not_across_models(clock, cache_path):
+    ResponseCache(cache_path, "m", ttl_seconds=60).put("prompt", "réponse du modèle")
+    assert ResponseCache(cache_path, "m", ttl_seconds=60).get("prompt") == "réponse du modèle"
+    assert ResponseCache(cache_path, "stub:m", ttl_seconds=60).get("prompt") is None
+
+
+def test_empty_responses_are_not_cached(clock, cache_path):
+    cache = ResponseCache(cache_path, "m", ttl_seconds=60)
+    cache.put("prompt", "")
+    assert cache.get("prompt") is None
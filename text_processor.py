@@ -1,20 +1,49 @@
 # /mon_agent_reco_emploi/text_processor.py
 import re
-import spacy
-from sentence_transformers import SentenceTransformer
-from config import SENTENCE_TRANSFORMER_MODEL, SKILLS_KEYWORDS, SPACY_MODEL_LANG
+import threading
+from config import (
+    SENTENCE_TRANSFORMER_MODEL, SKILLS_KEYWORDS, EMBEDDING_BATCH_SIZE,
+    EMBEDDING_CACHE_ENABLED, EMBEDDING_CACHE_PATH, EMBEDDING_CACHE_MEMORY_ITEMS,
+)
+from embedding_cache import EmbeddingCache
+from skill_matcher import get_skill_matcher
+import numpy as np
 import logging
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-try:
-    nlp = spacy.load(SPACY_MODEL_LANG)
-except OSError:
-    logging.warning(f"Modèle spaCy {SPACY_MODEL_LANG} non trouvé. Certaines fonctionnalités NLP avancées (comme NER) seront limitées.")
-    logging.warning(f"Essayez : python -m spacy download {SPACY_MODEL_LANG}")
-    nlp = None
+# Le modèle Sentence Transformer n'est chargé qu'au premier besoin (import de torch compris) :
+# les modules qui n'encodent rien (CLI des règles, chargement de la base...) démarrent sans lui.
+# spaCy n'est plus chargé : aucun traitement n'utilisait le pipeline `nlp`.
+_model_st = None
+_model_lock = threading.Lock()
 
-model_st = SentenceTransformer(SENTENCE_TRANSFORMER_MODEL)
+def get_sentence_model():
+    """Retourne le modèle Sentence Transformer, chargé une seule fois (thread-safe)."""
+    global _model_st
+    if _model_st is None:
+        with _model_lock:
+            if _model_st is None:
+                from sentence_transformers import SentenceTransformer
+                logging.info(f"Chargement du modèle Sentence Transformer '{SENTENCE_TRANSFORMER_MODEL}'...")
+                _model_st = SentenceTransformer(SENTENCE_TRANSFORMER_MODEL)
+                logging.info("Modèle Sentence Transformer chargé.")
+    return _model_st
+
+def warm_up_models_async() -> threading.Thread:
+    """Charge le modèle en arrière-plan (ex: au démarrage de Flask) pour que la première requête ne l'attende pas."""
+    def _warm_up():
+        try:
+            get_sentence_model()
+        except Exception as e:
+            logging.error(f"Erreur lors du préchargement du modèle Sentence Transformer : {e}")
+
+    thread = threading.Thread(target=_warm_up, name="model-warm-up", daemon=True)
+    thread.start()
+    return thread
+
+# Cache des embeddings partagé par les requêtes utilisateur et l'ingestion des offres
+embedding_cache = EmbeddingCache(EMBEDDING_CACHE_PATH, SENTENCE_TRANSFORMER_MODEL, EMBEDDING_CACHE_MEMORY_ITEMS) if EMBEDDING_CACHE_ENABLED else None
 
 def clean_text(text: str) -> str:
     """Nettoie le texte : supprime les caractères spéciaux, normalise les espaces."""
@@ -36,37 +65,45 @@ def extract_skills_simple(text: str, skills_keywords: list = None) -> list:
     if skills_keywords is None:
         skills_keywords = SKILLS_KEYWORDS
 
-    found_skills = set()
-    text_lower = text.lower()
-    
-    for skill in skills_keywords:
-        pattern = r'\b' + re.escape(skill.lower()) + r'\b'
-        if re.search(pattern, text_lower):
-            found_skills.add(skill.strip().lower())
-            
+    # Automate compilé une fois par liste de compétences : une seule passe sur le texte
+    found_skills = get_skill_matcher(tuple(skills_keywords)).find_skills(text)
     return sorted(list(found_skills))
 
 
 def get_text_embedding(text: str):
-    """Génère un vecteur (embedding) pour un texte donné."""
-    if not text:
-        # Retourner un vecteur de zéros de la bonne dimension si le texte est vide
-        # Cela garantit que l'embedding a toujours la même forme.
-        return model_st.encode("") 
-    return model_st.encode(text)
+    """Génère un vecteur (embedding) pour un texte donné (servi par le cache si déjà calculé)."""
+    # Un texte vide donne aussi un vecteur de la bonne dimension (encode(""))
+    # Cela garantit que l'embedding a toujours la même forme.
+    text = text or ""
+    if embedding_cache is not None:
+        cached = embedding_cache.get(text)
+        if cached is not None:
+            return cached
+    embedding = get_sentence_model().encode(text)
+    if embedding_cache is not None:
+        embedding_cache.put(text, embedding)
+    return embedding
 
-def process_job_offer_text(title: str, description: str) -> dict:
+def get_text_embeddings(texts: list, batch_size: int = EMBEDDING_BATCH_SIZE):
     """
-    Traite le texte d'une offre d'emploi.
-    L'embedding principal ('embedding') est basé UNIQUEMENT sur le titre.
-    'combined_text_for_embedding' est aussi fourni pour compatibilité avec la BDD.
+    Génère les embeddings d'une liste de textes (matrice numpy, une ligne par texte).
+    Seuls les textes absents du cache sont encodés, une seule fois chacun,
+    et le modèle traite `batch_size` textes par passe au lieu d'une passe par texte.
     """
-    cleaned_title = clean_text(title)
-    cleaned_description = clean_text(description)
-    
-    # L'embedding utilisé pour la similarité est calculé SEULEMENT sur le titre nettoyé
-    title_embedding = get_text_embedding(cleaned_title)
-    
+    texts = [text or "" for text in texts]
+    if embedding_cache is None:
+        return get_sentence_model().encode(texts, batch_size=batch_size)
+
+    embeddings_by_text = embedding_cache.get_many(texts)
+    missing_texts = list(dict.fromkeys(text for text in texts if text not in embeddings_by_text))
+    if missing_texts:
+        new_embeddings = dict(zip(missing_texts, get_sentence_model().encode(missing_texts, batch_size=batch_size)))
+        embedding_cache.put_many(new_embeddings)
+        embeddings_by_text.update(new_embeddings)
+    return np.stack([embeddings_by_text[text] for text in texts])
+
+def _build_processed_offer(cleaned_title: str, cleaned_description: str, title_embedding) -> dict:
+    """Assemble le dictionnaire d'une offre traitée à partir des textes nettoyés et de l'embedding du titre."""
     # L'extraction de compétences peut toujours être faite sur la description pour information
     skills = extract_skills_simple(f"{cleaned_title}. {cleaned_description}")
     
@@ -82,6 +119,37 @@ def process_job_offer_text(title: str, description: str) -> dict:
         "embedding": title_embedding.tolist() # IMPORTANT: 'embedding' est l'embedding du TITRE
     }
 
+def process_job_offer_text(title: str, description: str) -> dict:
+    """
+    Traite le texte d'une offre d'emploi.
+    L'embedding principal ('embedding') est basé UNIQUEMENT sur le titre.
+    'combined_text_for_embedding' est aussi fourni pour compatibilité avec la BDD.
+    """
+    cleaned_title = clean_text(title)
+    cleaned_description = clean_text(description)
+    
+    # L'embedding utilisé pour la similarité est calculé SEULEMENT sur le titre nettoyé
+    title_embedding = get_text_embedding(cleaned_title)
+    
+    return _build_processed_offer(cleaned_title, cleaned_description, title_embedding)
+
+def process_job_offers_batch(offers_texts: list, batch_size: int = EMBEDDING_BATCH_SIZE) -> list:
+    """
+    Version groupée de process_job_offer_text pour l'ingestion en masse.
+    `offers_texts` est une liste de couples (titre, description) ; les titres nettoyés sont
+    encodés par lots de `batch_size`. Retourne les dictionnaires traités dans le même ordre.
+    """
+    if not offers_texts:
+        return []
+
+    cleaned_texts = [(clean_text(title), clean_text(description)) for title, description in offers_texts]
+    title_embeddings = get_text_embeddings([cleaned_title for cleaned_title, _ in cleaned_texts], batch_size=batch_size)
+
+    return [
+        _build_processed_offer(cleaned_title, cleaned_description, title_embedding)
+        for (cleaned_title, cleaned_description), title_embedding in zip(cleaned_texts, title_embeddings)
+    ]
+
 if __name__ == '__main__':
     sample_title = "Développeur Python Senior"
     sample_description = """